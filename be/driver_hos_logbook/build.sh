@@ -10,3 +10,6 @@ poetry install --no-root
 
 # Run migrations
 poetry run python manage.py migrate
+
+# Create the database cache table used by the map lookup caches
+poetry run python manage.py createcachetable
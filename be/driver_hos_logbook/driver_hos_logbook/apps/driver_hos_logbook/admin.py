@@ -1,10 +1,30 @@
 from django.contrib import admin
-from .models import DailyLog, ShippingDocument, Trip, LogEntry, RouteStop
+from .models import DailyLog, Driver, DriverDutyDay, DriverHOSState, ShippingDocument, Trip, LogEntry, RouteStop, TripCalculationJob
+
+
+@admin.register(Driver)
+class DriverAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'created_at']
+    search_fields = ['name']
+
+
+@admin.register(DriverHOSState)
+class DriverHOSStateAdmin(admin.ModelAdmin):
+    list_display = ['id', 'driver', 'as_of', 'cycle_hours', 'driving_since_rest', 'duty_since_rest']
+    search_fields = ['driver__name']
+
+
+@admin.register(DriverDutyDay)
+class DriverDutyDayAdmin(admin.ModelAdmin):
+    list_display = ['id', 'driver', 'date', 'on_duty_hours', 'cycle_restart']
+    list_filter = ['cycle_restart', 'date']
+    search_fields = ['driver__name']
+    date_hierarchy = 'date'
 
 
 @admin.register(DailyLog)
 class DailyLogAdmin(admin.ModelAdmin):
-    list_display = ['id', 'log_date', 'log_type', 'from_location', 'to_location', 'created_at']
+    list_display = ['id', 'log_date', 'log_type', 'trip', 'from_location', 'to_location', 'created_at']
     list_filter = ['log_type', 'log_date']
     search_fields = ['from_location', 'to_location', 'carrier_name']
     date_hierarchy = 'log_date'
@@ -19,11 +39,11 @@ class ShippingDocumentAdmin(admin.ModelAdmin):
 
 @admin.register(Trip)
 class TripAdmin(admin.ModelAdmin):
-    list_display = ['id', 'current_location', 'pickup_location', 'dropoff_location', 'current_cycle_used', 'total_distance', 'created_at']
+    list_display = ['id', 'driver', 'current_location', 'pickup_location', 'dropoff_location', 'current_cycle_used', 'total_distance', 'created_at']
     list_filter = ['created_at']
     search_fields = ['current_location', 'pickup_location', 'dropoff_location']
     date_hierarchy = 'created_at'
-    readonly_fields = ['route_geometry']
+    readonly_fields = ['route_geometry', 'route_geometry_compact']
 
 
 @admin.register(LogEntry)
@@ -41,3 +61,9 @@ class RouteStopAdmin(admin.ModelAdmin):
     search_fields = ['location', 'description']
     date_hierarchy = 'arrival_time'
 
+
+@admin.register(TripCalculationJob)
+class TripCalculationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'attempts', 'trip', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['payload', 'error']
@@ -5,3 +5,6 @@ class DriverHosLogbookConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'driver_hos_logbook.apps.driver_hos_logbook'
     label = 'driver_hos_logbook'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,228 @@
+import gc
+import math
+import platform
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+from django.db import transaction
+from django.test.utils import override_settings
+from . import utils
+from .hos import HOSSimulator, MAX_DRIVING_HOURS
+from .models import DutyStatus, Trip
+from .serializers import TripDetailSerializer, TripInputSerializer
+from .views import trip_detail_prefetches
+
+
+# name -> factory returning the zero-argument callable to time. Factories do
+# their setup outside the timed region.
+BENCHMARKS = {}
+
+# Allowed slowdown per compared metric (0.5 = 50% slower than the baseline).
+# Medians move by up to ~30% between runs on the same machine, so the gate
+# sits well above that; tail latencies are noisier still.
+DEFAULT_THRESHOLDS = {'median': 0.5, 'p99': 1.0}
+
+_START_TIME = datetime(2024, 1, 1, 8, tzinfo=timezone.utc)
+_LANE = {
+    'current_location': "Los Angeles, CA",
+    'pickup_location': "Phoenix, AZ",
+    'dropoff_location': "Jacksonville, FL",
+}
+
+
+def benchmark(name):
+    """
+    Registers a benchmark factory under ``name``.
+    """
+    def register(factory):
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+
+def select(patterns=None):
+    """
+    Benchmark names containing any of ``patterns`` (all of them by default).
+    """
+    return [name for name in BENCHMARKS if not patterns or any(pattern in name for pattern in patterns)]
+
+
+def run(names, *, min_time=0.5, min_repeat=5, max_repeat=1000, min_sample_time=0.001):
+    """
+    Times each benchmark until it has run ``min_time`` seconds (within the
+    repeat bounds) and returns {name: stats}. As with ``timeit``, calls too
+    fast to time on their own are batched so each sample takes at least
+    ``min_sample_time`` seconds, and garbage collection is paused. Batched
+    benchmarks report no tail percentiles (see ``summarize``).
+
+    Benchmarks run against the offline "local" map provider, and everything
+    they write to the database is rolled back.
+    """
+    results = {}
+    with override_settings(MAP_PROVIDER='local', MAP_PROVIDER_FALLBACK=None), transaction.atomic():
+        for name in names:
+            func = BENCHMARKS[name]()
+            # The warm-up call also calibrates the batch size
+            start = time.perf_counter_ns()
+            func()
+            number = max(1, int(min_sample_time * 1e9 // max(time.perf_counter_ns() - start, 1)))
+
+            samples = []
+            gc.collect()
+            gc.disable()
+            try:
+                deadline = time.perf_counter() + min_time
+                while len(samples) < max_repeat and (len(samples) < min_repeat or time.perf_counter() < deadline):
+                    start = time.perf_counter_ns()
+                    for _ in range(number):
+                        func()
+                    samples.append((time.perf_counter_ns() - start) / number)
+            finally:
+                gc.enable()
+            results[name] = {**summarize(samples, number=number), 'number': number}
+        transaction.set_rollback(True)
+    return results
+
+
+def summarize(samples_ns, *, number=1):
+    """
+    Per-call timing statistics, in milliseconds, for nanosecond samples
+    that each average ``number`` calls. Averaging hides slow calls, so p95
+    and p99 are None for batched samples.
+    """
+    samples = sorted(sample / 1_000_000 for sample in samples_ns)
+    return {
+        'repeat': len(samples),
+        'min': samples[0],
+        'median': statistics.median(samples),
+        'mean': statistics.fmean(samples),
+        'p95': percentile(samples, 95) if number == 1 else None,
+        'p99': percentile(samples, 99) if number == 1 else None,
+        'max': samples[-1],
+    }
+
+
+def percentile(sorted_samples, pct):
+    """
+    Nearest-rank percentile of an ascending list.
+    """
+    rank = max(1, math.ceil(pct / 100 * len(sorted_samples)))
+    return sorted_samples[rank - 1]
+
+
+def report(results):
+    """
+    The machine-readable results document written by ``run_benchmarks``.
+    """
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+        },
+        'benchmarks': results,
+    }
+
+
+def compare(results, baseline, *, thresholds=DEFAULT_THRESHOLDS):
+    """
+    Compares ``results`` with a baseline ``report()``. Returns one row per
+    benchmark and ``thresholds`` metric reported in both, with the relative
+    change and whether it exceeds that metric's threshold.
+    """
+    rows = []
+    for name, stats in results.items():
+        base = baseline.get('benchmarks', {}).get(name)
+        if base is None:
+            continue
+        for metric, max_regression in thresholds.items():
+            if not base.get(metric) or stats.get(metric) is None:
+                continue
+            change = stats[metric] / base[metric] - 1
+            rows.append({
+                'benchmark': name,
+                'metric': metric,
+                'baseline': base[metric],
+                'current': stats[metric],
+                'change': change,
+                'regressed': change > max_regression,
+            })
+    return rows
+
+
+def _driving_day_log_entries(count):
+    """
+    ``count`` back-to-back log entries cycling through a driving day.
+    """
+    pattern = [
+        (DutyStatus.ON_DUTY_NOT_DRIVING, 0.25),
+        (DutyStatus.DRIVING, 5.5),
+        (DutyStatus.OFF_DUTY, 0.5),
+        (DutyStatus.DRIVING, 5.5),
+        (DutyStatus.ON_DUTY_NOT_DRIVING, 0.25),
+        (DutyStatus.OFF_DUTY, 12.0),
+    ]
+    entries = []
+    current = _START_TIME
+    for i in range(count):
+        status, hours = pattern[i % len(pattern)]
+        end = current + timedelta(hours=hours)
+        entries.append({
+            'duty_status': status,
+            'start_time': current,
+            'end_time': end,
+            'location': "Road",
+            'notes': None,
+        })
+        current = end
+    return entries
+
+
+@benchmark('planning.calculate_route_with_hos')
+def _calculate_route():
+    return lambda: utils.calculate_route_with_hos(current_cycle_used=0, **_LANE)
+
+
+for _days in (1, 7, 30):
+    @benchmark(f'hos.simulator_drive[{_days}d]')
+    def _simulator_drive(days=_days):
+        def drive():
+            simulator = HOSSimulator(start_time=_START_TIME, cycle_hours=0)
+            simulator.drive(days * MAX_DRIVING_HOURS, "Road")
+            return simulator.log_entries(), simulator.stops()
+        return drive
+
+    @benchmark(f'hos.simulator_summary[{_days}d]')
+    def _simulator_summary(days=_days):
+        def drive():
+            simulator = HOSSimulator(start_time=_START_TIME, cycle_hours=0)
+            simulator.drive(days * MAX_DRIVING_HOURS, "Road")
+            return simulator.summary()
+        return drive
+
+
+for _count in (10, 100, 1_000, 10_000):
+    @benchmark(f'sheets.generate_daily_log_sheets[{_count}]')
+    def _daily_log_sheets(count=_count):
+        entries = _driving_day_log_entries(count)
+        return lambda: utils.generate_daily_log_sheets(entries, count * 25)
+
+
+@benchmark('persistence.trip_input_create')
+def _trip_input_create():
+    serializer = TripInputSerializer(data={**_LANE, 'current_cycle_used': 0})
+    serializer.is_valid(raise_exception=True)
+    return lambda: serializer.create(serializer.validated_data)
+
+
+@benchmark('rendering.trip_detail')
+def _trip_detail():
+    serializer = TripInputSerializer(data={**_LANE, 'current_cycle_used': 0})
+    serializer.is_valid(raise_exception=True)
+    trip = serializer.save()
+
+    def render():
+        instance = Trip.objects.prefetch_related(*trip_detail_prefetches()).get(pk=trip.pk)
+        return TripDetailSerializer(instance).data
+    return render
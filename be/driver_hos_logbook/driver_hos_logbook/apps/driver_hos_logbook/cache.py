@@ -0,0 +1,220 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from .metrics import REGISTRY
+
+
+_MISSING = object()
+_NEGATIVE = "__negative__"
+
+
+class LRUCache:
+    """
+    Thread-safe in-process LRU cache with per-entry TTL expiry.
+    """
+
+    def __init__(self, *, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                return default
+            value, expires_at = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MapCache:
+    """
+    Two-tier cache for map provider lookups.
+
+    Lookups hit the in-process LRU first, then the persistent Django cache
+    configured by ``backend`` (if any). ``None`` values are cached as
+    negative entries with their own, shorter TTL.
+    """
+
+    def __init__(self, *, namespace, maxsize, ttl, negative_ttl, backend=None):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = backend
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "local_hits": 0, "persistent_hits": 0, "negative_hits": 0}
+
+    def get(self, key):
+        """
+        Returns a ``(hit, value)`` tuple. ``value`` is ``None`` for negative hits.
+        """
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count("hits", "local_hits", negative=value == _NEGATIVE)
+            return True, _unwrap(value)
+
+        persistent = self._persistent()
+        if persistent is not None:
+            try:
+                value = persistent.get(self._persistent_key(key), _MISSING)
+            except Exception:
+                value = _MISSING
+            if value is not _MISSING:
+                self.local.set(key, value, ttl=self.negative_ttl if value == _NEGATIVE else None)
+                self._count("hits", "persistent_hits", negative=value == _NEGATIVE)
+                return True, _unwrap(value)
+
+        self._count("misses")
+        return False, None
+
+    def set(self, key, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        stored = value if value is not None else _NEGATIVE
+        self.local.set(key, stored, ttl=ttl)
+        persistent = self._persistent()
+        if persistent is not None:
+            try:
+                persistent.set(self._persistent_key(key), stored, timeout=ttl)
+            except Exception:
+                pass
+
+    def clear(self):
+        self.local.clear()
+        with self._lock:
+            for name in self._counters:
+                self._counters[name] = 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        stats["local_size"] = len(self.local)
+        return stats
+
+    def _count(self, *names, negative=False):
+        with self._lock:
+            for name in names:
+                self._counters[name] += 1
+            if negative:
+                self._counters["negative_hits"] += 1
+
+    def _persistent(self):
+        return caches[self.backend] if self.backend else None
+
+    def _persistent_key(self, key):
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+
+def _unwrap(value):
+    return None if value == _NEGATIVE else value
+
+
+def normalize_location(location_name):
+    """
+    Normalizes a free-form location name into a cache key.
+    "  Dallas ,TX " and "dallas, tx" map to the same key.
+    """
+    key = " ".join(str(location_name).lower().split())
+    key = re.sub(r"\s*,\s*", ", ", key)
+    return key.strip(" ,.")
+
+
+def route_cache_key(origin_coords, dest_coords, precision):
+    """
+    Builds a route cache key from (lat, lon) pairs rounded to ``precision``
+    decimal places, so nearby requests for the same lane share an entry.
+    """
+    parts = [f"{round(float(c), precision):.{precision}f}" for c in (*origin_coords, *dest_coords)]
+    return ",".join(parts)
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _get_cache(namespace, setting_name):
+    cache = _caches.get(namespace)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(namespace)
+            if cache is None:
+                config = getattr(settings, setting_name)
+                cache = MapCache(
+                    namespace=namespace,
+                    maxsize=config["MAXSIZE"],
+                    ttl=config["TTL"],
+                    negative_ttl=config["NEGATIVE_TTL"],
+                    backend=config.get("BACKEND"),
+                )
+                _caches[namespace] = cache
+    return cache
+
+
+def reset_caches():
+    """
+    Drops the cache instances so the next lookup re-reads settings.
+    """
+    with _caches_lock:
+        _caches.clear()
+
+
+def get_geocode_cache():
+    """
+    Returns the process-wide geocode cache, built from ``settings.GEOCODE_CACHE``.
+    """
+    return _get_cache("geocode", "GEOCODE_CACHE")
+
+
+def get_route_cache():
+    """
+    Returns the process-wide route segment cache, built from ``settings.ROUTE_CACHE``.
+    """
+    return _get_cache("route", "ROUTE_CACHE")
+
+
+@REGISTRY.collector
+def _collect_cache_stats():
+    stats = {namespace: cache.stats for namespace, cache in sorted(_caches.items())}
+    yield "hos_map_cache_lookups_total", "counter", "Map cache lookups by cache and result.", [
+        ({"cache": namespace, "result": result}, values[key])
+        for namespace, values in stats.items() for result, key in (("hit", "hits"), ("miss", "misses"))
+    ]
+    yield "hos_map_cache_tier_hits_total", "counter", "Map cache hits by cache and tier.", [
+        ({"cache": namespace, "tier": tier}, values[tier + "_hits"])
+        for namespace, values in stats.items() for tier in ("local", "persistent")
+    ]
+    yield "hos_map_cache_hit_ratio", "gauge", "Share of map cache lookups that hit.", [
+        ({"cache": namespace}, values["hit_ratio"]) for namespace, values in stats.items()
+    ]
+    yield "hos_map_cache_local_entries", "gauge", "Entries held in each in-process map cache.", [
+        ({"cache": namespace}, values["local_size"]) for namespace, values in stats.items()
+    ]
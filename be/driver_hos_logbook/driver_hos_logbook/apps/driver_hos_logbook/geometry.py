@@ -0,0 +1,217 @@
+import json
+import math
+
+
+EARTH_RADIUS_MILES = 3958.7613
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two (lat, lon) points, in miles.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def interpolate_line(start, end, *, step_miles):
+    """
+    Returns GeoJSON [lon, lat] coordinates from ``start`` to ``end`` (both
+    (lat, lon)), with a vertex roughly every ``step_miles``.
+    """
+    distance = haversine_miles(*start, *end)
+    steps = max(1, math.ceil(distance / step_miles))
+    return [
+        [
+            start[1] + (end[1] - start[1]) * i / steps,
+            start[0] + (end[0] - start[0]) * i / steps,
+        ]
+        for i in range(steps + 1)
+    ]
+
+
+METERS_PER_DEGREE = 111_320.0
+# Ground resolution of one 256px web-map tile pixel at zoom 0, at the equator
+METERS_PER_PIXEL_AT_ZOOM_0 = 156_543.03
+
+
+def encode_polyline(coordinates, precision=5):
+    """
+    Encodes GeoJSON [lon, lat] coordinates with the Google polyline algorithm.
+    """
+    factor = 10 ** precision
+    result = []
+    prev_lat = prev_lon = 0
+    for lon, lat in coordinates:
+        lat_i, lon_i = round(lat * factor), round(lon * factor)
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(result)
+
+
+def decode_polyline(encoded, precision=5):
+    """
+    Decodes a Google polyline into GeoJSON [lon, lat] coordinates.
+    """
+    factor = 10 ** precision
+    coordinates = []
+    index = lat = lon = 0
+    length = len(encoded)
+    while index < length:
+        deltas = []
+        for _ in range(2):
+            shift = value = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                value |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(value >> 1) if value & 1 else value >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        coordinates.append([lon / factor, lat / factor])
+    return coordinates
+
+
+def simplify_coordinates(coordinates, tolerance):
+    """
+    Douglas-Peucker simplification of [lon, lat] coordinates. ``tolerance``
+    is in degrees; points closer than that to the simplified line are dropped.
+    Uses an explicit stack, so long routes don't hit the recursion limit.
+    """
+    if tolerance <= 0 or len(coordinates) < 3:
+        return list(coordinates)
+
+    keep = [False] * len(coordinates)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(coordinates) - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = coordinates[first]
+        x2, y2 = coordinates[last]
+        dx, dy = x2 - x1, y2 - y1
+        segment_sq = dx * dx + dy * dy
+        max_dist_sq, index = 0.0, None
+        for i in range(first + 1, last):
+            px, py = coordinates[i]
+            if segment_sq == 0:
+                dist_sq = (px - x1) ** 2 + (py - y1) ** 2
+            else:
+                t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / segment_sq))
+                dist_sq = (px - x1 - t * dx) ** 2 + (py - y1 - t * dy) ** 2
+            if dist_sq > max_dist_sq:
+                max_dist_sq, index = dist_sq, i
+        if index is not None and max_dist_sq > tolerance_sq:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(coordinates, keep) if kept]
+
+
+def tolerance_from_params(*, tolerance_meters=None, zoom=None):
+    """
+    Converts a tolerance in meters, or a web-map zoom level (one pixel of
+    error), into degrees for ``simplify_coordinates``. Returns 0 for neither.
+    """
+    if tolerance_meters is not None:
+        return tolerance_meters / METERS_PER_DEGREE
+    if zoom is not None:
+        return METERS_PER_PIXEL_AT_ZOOM_0 / (2 ** zoom) / METERS_PER_DEGREE
+    return 0.0
+
+
+def compact_route_geometry(feature_collection, precision=5):
+    """
+    Packs a route FeatureCollection of LineStrings into encoded polylines.
+    """
+    return {
+        "format": "polyline",
+        "precision": precision,
+        "segments": [
+            {
+                "segment": feature["properties"].get("segment"),
+                "polyline": encode_polyline(feature["geometry"]["coordinates"], precision)
+            }
+            for feature in feature_collection.get("features", [])
+        ]
+    }
+
+
+def iter_route_features(compact, tolerance=0.0):
+    """
+    Lazily yields the GeoJSON features of ``compact_route_geometry`` output,
+    decoding (and optionally simplifying to ``tolerance`` degrees) one
+    segment at a time.
+    """
+    for segment in compact.get("segments", []):
+        coordinates = decode_polyline(segment["polyline"], compact.get("precision", 5))
+        yield {
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": simplify_coordinates(coordinates, tolerance)},
+            "properties": {"segment": segment["segment"]}
+        }
+
+
+def expand_route_geometry(compact, tolerance=0.0):
+    """
+    Rebuilds the route FeatureCollection from ``compact_route_geometry``
+    output, optionally simplified to ``tolerance`` degrees.
+    """
+    return {"type": "FeatureCollection", "features": list(iter_route_features(compact, tolerance))}
+
+
+def simplify_compact_geometry(compact, tolerance):
+    """
+    Simplifies encoded route geometry, keeping it encoded.
+    """
+    if not tolerance:
+        return compact
+    precision = compact.get("precision", 5)
+    return {
+        **compact,
+        "segments": [
+            {
+                **segment,
+                "polyline": encode_polyline(
+                    simplify_coordinates(decode_polyline(segment["polyline"], precision), tolerance),
+                    precision
+                )
+            }
+            for segment in compact.get("segments", [])
+        ]
+    }
+
+
+def iter_route_geometry_json(*, compact=None, feature_collection=None, encoding="geojson", tolerance=0.0):
+    """
+    Serializes route geometry as JSON text chunks, one feature (or encoded
+    segment) at a time, so large routes can be streamed without building the
+    whole document in memory. Reads ``compact`` when given, otherwise the
+    legacy ``feature_collection``.
+    """
+    if compact is None:
+        compact = compact_route_geometry(feature_collection or {})
+
+    if encoding == "polyline":
+        compact = simplify_compact_geometry(compact, tolerance)
+        header = {key: value for key, value in compact.items() if key != "segments"}
+        yield json.dumps(header)[:-1] + ', "segments": ['
+        items = (json.dumps(segment) for segment in compact["segments"])
+    else:
+        yield '{"type": "FeatureCollection", "features": ['
+        items = (json.dumps(feature) for feature in iter_route_features(compact, tolerance))
+
+    for i, item in enumerate(items):
+        yield f", {item}" if i else item
+    yield "]}"
+
@@ -0,0 +1,334 @@
+from datetime import timedelta, timezone
+from .models import DutyStatus, RouteStop
+
+
+MAX_DRIVING_HOURS = 11.0
+MAX_DUTY_WINDOW_HOURS = 14.0
+MAX_DRIVING_BEFORE_BREAK_HOURS = 8.0
+MAX_CYCLE_HOURS = 70
+DAILY_REST_HOURS = 10
+CYCLE_RESTART_HOURS = 34
+BREAK_HOURS = 0.5
+FUEL_INTERVAL_MILES = 1000
+FUELING_HOURS = 0.25
+AVERAGE_SPEED_MPH = 55  # Used for fuel estimation
+
+_ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def hours_to_microseconds(hours):
+    """
+    Converts hours to whole microseconds, rounding exactly like ``timedelta(hours=...)``.
+    """
+    return timedelta(hours=hours) // _ONE_MICROSECOND
+
+
+# The fixed-length entries are converted once instead of on every call
+_FIXED_DURATIONS = {
+    hours: hours_to_microseconds(hours)
+    for hours in (FUELING_HOURS, BREAK_HOURS, 1.0, DAILY_REST_HOURS, CYCLE_RESTART_HOURS)
+}
+_STOP_TYPES = tuple(RouteStop.StopType.values)
+
+
+class HOSSimulator:
+    """
+    Simulates a driver's duty day for route planning: appends duty-status
+    entries, and splits driving at the 8-hour break, 11-hour driving, 14-hour
+    window, fueling and 70-hour cycle limits.
+
+    Time is kept as integer microseconds since ``start_time`` and entries as
+    tuples; datetimes and dicts are only built by ``log_entries()`` and
+    ``stops()``. Hour counters use the same float arithmetic as the
+    original dict-based helpers (kept in the tests as the reference), so
+    results are identical.
+    """
+    __slots__ = (
+        "start_time",
+        "elapsed_us",
+        "driving_since_rest",
+        "duty_since_rest",
+        "driving_since_break",
+        "cycle_hours",
+        "miles_since_fuel",
+        "off_duty_before",
+        "driving_hours",
+        "on_duty_hours",
+        "_entries",
+        "_stops",
+    )
+
+    def __init__(self, *, start_time, cycle_hours):
+        # Kept in UTC, where adding elapsed time is exact across DST changes
+        self.start_time = start_time.astimezone(timezone.utc)
+        self.elapsed_us = 0
+        self.driving_since_rest = 0.0
+        self.duty_since_rest = 0.0
+        self.driving_since_break = 0.0
+        self.cycle_hours = float(cycle_hours)
+        self.miles_since_fuel = 0.0
+        # Hours off duty right before start_time, e.g. since a resumed snapshot
+        self.off_duty_before = 0.0
+        self.driving_hours = 0.0
+        self.on_duty_hours = 0.0
+        self._entries = []
+        self._stops = []
+
+    @classmethod
+    def resume(cls, snapshot, *, start_time, cycle_hours=None):
+        """
+        Starts from a ``snapshot()`` taken at the end of an earlier trip. The
+        trip starts no earlier than the snapshot, and the time in between
+        counts as off duty (kept in ``off_duty_before``, so the log sheets can
+        show a 34-hour restart taken in it). An explicit ``cycle_hours``
+        overrides the snapshot's cycle counter.
+        """
+        start_time = max(start_time, snapshot['as_of'])
+        simulator = cls(start_time=start_time, cycle_hours=snapshot['cycle_hours'])
+        simulator.driving_since_rest = snapshot['driving_since_rest']
+        simulator.duty_since_rest = snapshot['duty_since_rest']
+        simulator.driving_since_break = snapshot['driving_since_break']
+        simulator.miles_since_fuel = snapshot['miles_since_fuel']
+
+        off_duty_hours = (start_time - snapshot['as_of']).total_seconds() / 3600
+        simulator.off_duty_before = off_duty_hours
+        if off_duty_hours >= DAILY_REST_HOURS:
+            simulator.driving_since_rest = 0
+            simulator.duty_since_rest = 0
+            if off_duty_hours >= CYCLE_RESTART_HOURS:
+                simulator.cycle_hours = 0
+        if off_duty_hours >= BREAK_HOURS:
+            simulator.driving_since_break = 0
+
+        if cycle_hours is not None:
+            simulator.cycle_hours = float(cycle_hours)
+        return simulator
+
+    def snapshot(self):
+        """
+        The counters at the current time, in the shape ``resume`` takes.
+        """
+        return {
+            'as_of': self.current_time,
+            'cycle_hours': self.cycle_hours,
+            'driving_since_rest': self.driving_since_rest,
+            'duty_since_rest': self.duty_since_rest,
+            'driving_since_break': self.driving_since_break,
+            'miles_since_fuel': self.miles_since_fuel
+        }
+
+    @property
+    def current_time(self):
+        return self.start_time + timedelta(microseconds=self.elapsed_us)
+
+    def log(self, status, duration_hrs, location, notes=None):
+        """
+        Appends a duty-status entry and updates the HOS counters.
+        """
+        start = self.elapsed_us
+        duration_us = _FIXED_DURATIONS.get(duration_hrs)
+        if duration_us is None:
+            duration_us = hours_to_microseconds(duration_hrs)
+        self.elapsed_us = start + duration_us
+        self._entries.append((status, start, self.elapsed_us, location, notes))
+
+        if status == DutyStatus.DRIVING:
+            self.driving_hours += duration_hrs
+            self.on_duty_hours += duration_hrs
+            self.driving_since_rest += duration_hrs
+            self.driving_since_break += duration_hrs
+            self.duty_since_rest += duration_hrs
+            self.cycle_hours += duration_hrs
+            return
+
+        if status == DutyStatus.ON_DUTY_NOT_DRIVING:
+            self.on_duty_hours += duration_hrs
+            self.duty_since_rest += duration_hrs
+            self.cycle_hours += duration_hrs
+        elif duration_hrs >= DAILY_REST_HOURS:
+            self.driving_since_rest = 0
+            self.duty_since_rest = 0
+            if duration_hrs >= CYCLE_RESTART_HOURS:
+                self.cycle_hours = 0
+        if duration_hrs >= BREAK_HOURS:
+            self.driving_since_break = 0
+
+    def add_stop(self, stop_type, location, *, duration_minutes, description, latitude=None, longitude=None):
+        """
+        Records a route stop arriving at the current time.
+        """
+        coords = None if latitude is None and longitude is None else (latitude, longitude)
+        self._stops.append((
+            stop_type, location, coords, self.elapsed_us, duration_minutes, description,
+            self.driving_hours, len(self._entries)
+        ))
+
+    def drive(self, hours, location):
+        """
+        Drives for ``hours``, inserting the breaks, rests, fuel stops and
+        cycle restarts needed along the way. Each chunk runs straight to the
+        nearest limit, so the loop runs once per inserted stop.
+
+        The boundaries are not computed in closed form: the counters must
+        accumulate chunk by chunk to round like the reference implementation.
+        Instead the loop keeps the counters in locals and appends the entries
+        and stops directly, with the effects of ``log`` and ``add_stop``
+        inlined for the four fixed stops.
+        """
+        entries = self._entries
+        stops = self._stops
+        elapsed = self.elapsed_us
+        driving_since_rest = self.driving_since_rest
+        duty_since_rest = self.duty_since_rest
+        driving_since_break = self.driving_since_break
+        cycle_hours = self.cycle_hours
+        miles_since_fuel = self.miles_since_fuel
+        driving_hours = self.driving_hours
+        on_duty_hours = self.on_duty_hours
+
+        remaining = hours
+        while remaining > 0:
+            if cycle_hours >= MAX_CYCLE_HOURS:
+                stops.append((
+                    RouteStop.StopType.REST, location, None, elapsed,
+                    CYCLE_RESTART_HOURS * 60, "34-Hour Cycle Restart", driving_hours, len(entries)
+                ))
+                start = elapsed
+                elapsed += _FIXED_DURATIONS[CYCLE_RESTART_HOURS]
+                entries.append((DutyStatus.OFF_DUTY, start, elapsed, location, "34-Hour Restart"))
+                driving_since_rest = duty_since_rest = driving_since_break = cycle_hours = 0
+                continue
+
+            can_drive = min(
+                remaining,
+                MAX_DRIVING_HOURS - driving_since_rest,
+                MAX_DUTY_WINDOW_HOURS - duty_since_rest,
+                MAX_DRIVING_BEFORE_BREAK_HOURS - driving_since_break,
+                (FUEL_INTERVAL_MILES - miles_since_fuel) / AVERAGE_SPEED_MPH
+            )
+            if can_drive > 0:
+                duration_us = _FIXED_DURATIONS.get(can_drive)
+                if duration_us is None:
+                    duration_us = hours_to_microseconds(can_drive)
+                start = elapsed
+                elapsed += duration_us
+                entries.append((DutyStatus.DRIVING, start, elapsed, location, None))
+                driving_hours += can_drive
+                on_duty_hours += can_drive
+                driving_since_rest += can_drive
+                driving_since_break += can_drive
+                duty_since_rest += can_drive
+                cycle_hours += can_drive
+                remaining -= can_drive
+                miles_since_fuel += can_drive * AVERAGE_SPEED_MPH
+
+            if remaining <= 0:
+                break
+            if miles_since_fuel >= FUEL_INTERVAL_MILES:
+                stops.append((
+                    RouteStop.StopType.FUEL, location, None, elapsed,
+                    15, "Fueling Stop", driving_hours, len(entries)
+                ))
+                start = elapsed
+                elapsed += _FIXED_DURATIONS[FUELING_HOURS]
+                entries.append((DutyStatus.ON_DUTY_NOT_DRIVING, start, elapsed, location, "Fueling"))
+                on_duty_hours += FUELING_HOURS
+                duty_since_rest += FUELING_HOURS
+                cycle_hours += FUELING_HOURS
+                miles_since_fuel = 0
+            elif driving_since_break >= MAX_DRIVING_BEFORE_BREAK_HOURS:
+                stops.append((
+                    RouteStop.StopType.BREAK, location, None, elapsed,
+                    30, "30-Minute Rest Break", driving_hours, len(entries)
+                ))
+                start = elapsed
+                elapsed += _FIXED_DURATIONS[BREAK_HOURS]
+                entries.append((DutyStatus.OFF_DUTY, start, elapsed, location, "30-Min Break"))
+                driving_since_break = 0
+            elif driving_since_rest >= MAX_DRIVING_HOURS or duty_since_rest >= MAX_DUTY_WINDOW_HOURS:
+                stops.append((
+                    RouteStop.StopType.REST, location, None, elapsed,
+                    DAILY_REST_HOURS * 60, "10-Hour Daily Rest", driving_hours, len(entries)
+                ))
+                start = elapsed
+                elapsed += _FIXED_DURATIONS[DAILY_REST_HOURS]
+                entries.append((DutyStatus.OFF_DUTY, start, elapsed, location, "10-Hour Rest"))
+                driving_since_rest = duty_since_rest = driving_since_break = 0
+
+        self.elapsed_us = elapsed
+        self.driving_since_rest = driving_since_rest
+        self.duty_since_rest = duty_since_rest
+        self.driving_since_break = driving_since_break
+        self.cycle_hours = cycle_hours
+        self.miles_since_fuel = miles_since_fuel
+        self.driving_hours = driving_hours
+        self.on_duty_hours = on_duty_hours
+
+    def log_entries(self):
+        """
+        Returns the entries as dicts with aware datetimes.
+        """
+        to_datetime = self._datetime_converter()
+        return [
+            {
+                'duty_status': status,
+                'start_time': to_datetime(start),
+                'end_time': to_datetime(end),
+                'location': location,
+                'notes': notes
+            }
+            for status, start, end, location, notes in self._entries
+        ]
+
+    def stops(self):
+        """
+        Returns the stops as dicts, in the shape RouteStop is created from.
+        """
+        to_datetime = self._datetime_converter()
+        stops = []
+        for stop_type, location, coords, arrival, duration_minutes, description, _, _ in self._stops:
+            stop = {'stop_type': stop_type, 'location': location}
+            if coords is not None:
+                stop['latitude'], stop['longitude'] = coords
+            stop['arrival_time'] = to_datetime(arrival)
+            stop['duration_minutes'] = duration_minutes
+            stop['description'] = description
+            stops.append(stop)
+        return stops
+
+    def summary(self):
+        """
+        Trip totals, without building entries or stops: arrival at the last
+        stop, end time, driving and on-duty hours, and stop counts by type.
+        """
+        stop_counts = dict.fromkeys(_STOP_TYPES, 0)
+        for stop in self._stops:
+            stop_counts[stop[0]] += 1
+        arrival_us = self._stops[-1][3] if self._stops else self.elapsed_us
+        return {
+            'arrival_time': self.start_time + timedelta(microseconds=arrival_us),
+            'end_time': self.current_time,
+            'total_time_hours': self.elapsed_us / 3_600_000_000,
+            'driving_hours': self.driving_hours,
+            'on_duty_hours': self.on_duty_hours,
+            'stop_counts': stop_counts
+        }
+
+    def stop_progress(self):
+        """
+        For each stop: the trip's driving hours when it was reached, and the
+        index of the log entry that starts there.
+        """
+        return [(driving_hours, entry_index) for *_, driving_hours, entry_index in self._stops]
+
+    def _datetime_converter(self):
+        # Consecutive entries share boundaries, so each offset is converted once
+        start_time = self.start_time
+        converted = {}
+
+        def to_datetime(offset_us):
+            value = converted.get(offset_us)
+            if value is None:
+                value = converted[offset_us] = start_time + timedelta(microseconds=offset_us)
+            return value
+        return to_datetime
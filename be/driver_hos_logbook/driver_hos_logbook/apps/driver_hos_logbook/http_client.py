@@ -0,0 +1,68 @@
+import threading
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the shared, pooled session used for map provider requests.
+    Connections are kept alive and capped per host, and idempotent requests
+    are retried with jittered exponential backoff, per ``settings.MAP_HTTP``.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session(settings.MAP_HTTP)
+    return _session
+
+
+def get(url, **kwargs):
+    """
+    Issues a GET through the shared session, applying the configured timeouts.
+    """
+    config = settings.MAP_HTTP
+    kwargs.setdefault("timeout", (config["CONNECT_TIMEOUT"], config["READ_TIMEOUT"]))
+    return get_session().get(url, **kwargs)
+
+
+def reset_session():
+    """
+    Closes the shared session so the next request builds a fresh one.
+    """
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def _build_session(config):
+    retry = Retry(
+        total=config["RETRIES"],
+        connect=config["RETRIES"],
+        read=config["RETRIES"],
+        status=config["RETRIES"],
+        backoff_factor=config["BACKOFF_FACTOR"],
+        backoff_jitter=config["BACKOFF_JITTER"],
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config["POOL_CONNECTIONS"],
+        pool_maxsize=config["POOL_MAXSIZE"],
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
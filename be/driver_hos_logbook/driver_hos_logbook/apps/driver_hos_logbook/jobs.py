@@ -0,0 +1,126 @@
+import json
+import logging
+import time
+from datetime import timedelta
+from django.db import close_old_connections
+from django.db.models import F, Model
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from .models import TripCalculationJob
+
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_trip_calculation(validated_data):
+    """
+    Stores a pending calculation job for already-validated TripInputSerializer data.
+    """
+    payload = {}
+    for key, value in validated_data.items():
+        if isinstance(value, Model):
+            value = value.pk
+        if not isinstance(value, (str, int, float, bool, type(None))):
+            value = str(value)
+        payload[key] = value
+    return TripCalculationJob.objects.create(payload=payload)
+
+
+def claim_next_job():
+    """
+    Atomically moves the oldest pending job to RUNNING and returns it.
+    The conditional UPDATE makes claiming safe across concurrent workers
+    without relying on row locks. Returns None when the queue is empty.
+    """
+    while True:
+        job = (
+            TripCalculationJob.objects
+            .filter(status=TripCalculationJob.Status.PENDING)
+            .order_by('created_at')
+            .only('id')
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = TripCalculationJob.objects.filter(
+            pk=job.pk,
+            status=TripCalculationJob.Status.PENDING
+        ).update(
+            status=TripCalculationJob.Status.RUNNING,
+            started_at=timezone.now(),
+            attempts=F('attempts') + 1
+        )
+        if claimed:
+            return TripCalculationJob.objects.get(pk=job.pk)
+
+
+def run_job(job):
+    """
+    Runs the HOS calculation for a claimed job and records the outcome.
+    The job status endpoint is public, so a failed job only stores the
+    input errors or a generic message; the traceback goes to the log.
+    """
+    from .serializers import TripInputSerializer
+
+    try:
+        serializer = TripInputSerializer(data=job.payload)
+        serializer.is_valid(raise_exception=True)
+        trip = serializer.save()
+    except ValidationError as e:
+        job.status = TripCalculationJob.Status.FAILED
+        job.error = json.dumps(e.detail)
+    except Exception:
+        logger.exception("Trip calculation job failed", extra={"job_id": str(job.pk)})
+        job.status = TripCalculationJob.Status.FAILED
+        job.error = "Trip calculation failed"
+    else:
+        job.status = TripCalculationJob.Status.SUCCEEDED
+        job.trip = trip
+        job.error = ""
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'trip', 'error', 'finished_at', 'updated_at'])
+    return job
+
+
+def run_pending_jobs(*, limit=None):
+    """
+    Drains the queue (or at most ``limit`` jobs) and returns the number run.
+    """
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def requeue_stale_jobs(*, older_than, max_attempts):
+    """
+    Returns jobs stuck in RUNNING (e.g. after a worker crash) to the queue,
+    or fails them once they have used up ``max_attempts``.
+    """
+    cutoff = timezone.now() - older_than
+    stale = TripCalculationJob.objects.filter(
+        status=TripCalculationJob.Status.RUNNING,
+        started_at__lt=cutoff
+    )
+    failed = stale.filter(attempts__gte=max_attempts).update(
+        status=TripCalculationJob.Status.FAILED,
+        error="Worker did not finish the job",
+        finished_at=timezone.now()
+    )
+    requeued = stale.update(status=TripCalculationJob.Status.PENDING, started_at=None)
+    return requeued, failed
+
+
+def work_forever(*, poll_interval, stale_after, max_attempts):
+    """
+    Worker loop: runs pending jobs, sleeping ``poll_interval`` seconds when idle.
+    """
+    while True:
+        close_old_connections()
+        requeue_stale_jobs(older_than=timedelta(seconds=stale_after), max_attempts=max_attempts)
+        if not run_pending_jobs(limit=100):
+            time.sleep(poll_interval)
@@ -0,0 +1,271 @@
+import json
+import random
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, unquote, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+import requests
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+from .benchmarks import percentile
+from .middleware import QUERY_COUNT_HEADER
+from .providers import METERS_TO_MILES, LocalMapProvider
+
+
+class MapStubServer:
+    """
+    Local stand-in for Nominatim (``/search``) and OSRM (``/route`` and
+    ``/table``), answering from the ``LocalMapProvider`` gazetteer. Every
+    request waits ``latency`` plus up to ``jitter`` seconds, and fails with
+    a 503 at ``error_rate``, to mimic a slow or flaky public service.
+    """
+
+    def __init__(self, *, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        options = settings.MAP_PROVIDER_OPTIONS
+        self.provider = LocalMapProvider(
+            gazetteer_path=options["GAZETTEER_PATH"],
+            road_factor=options["ROAD_FACTOR"],
+            average_speed_mph=options["AVERAGE_SPEED_MPH"],
+            vertex_spacing_miles=options["VERTEX_SPACING_MILES"],
+        )
+        self.server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, body = stub.respond(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def respond(self, path):
+        """
+        Returns (status, JSON body) for a request path.
+        """
+        with self.random_lock:
+            delay = self.latency + self.random.uniform(0, self.jitter)
+            failed = self.random.random() < self.error_rate
+        time.sleep(delay)
+        if failed:
+            return 503, {"error": "Injected failure"}
+
+        url = urlsplit(path)
+        if url.path == "/search":
+            location = self.provider.geocode(parse_qs(url.query).get("q", [""])[0])
+            if location is None:
+                return 200, []
+            return 200, [{"lat": str(location["lat"]), "lon": str(location["lon"]), "display_name": location["display_name"]}]
+
+        service, _, waypoints = url.path.strip("/").partition("/v1/driving/")
+        coords_list = [
+            (float(lat), float(lon))
+            for lon, lat in (pair.split(",") for pair in unquote(waypoints).split(";"))
+        ] if waypoints else []
+        if len(coords_list) < 2:
+            return 400, {"code": "InvalidQuery"}
+        if service == "route":
+            return 200, self._route(coords_list)
+        if service == "table":
+            table = self.provider.table(coords_list)
+            return 200, {
+                "code": "Ok",
+                "durations": [[hours * 3600 for hours in row] for row in table["durations_hours"]],
+                "distances": [[miles / METERS_TO_MILES for miles in row] for row in table["distances_miles"]],
+            }
+        return 404, {"code": "InvalidService"}
+
+    def _route(self, coords_list):
+        # One overview line; each leg annotates its segments so the client can cut it
+        coordinates = []
+        legs = []
+        for leg in self.provider.route(coords_list):
+            line = leg["geometry"]["coordinates"]
+            coordinates.extend(line if not coordinates else line[1:])
+            segments = len(line) - 1
+            legs.append({
+                "distance": leg["distance_miles"] / METERS_TO_MILES,
+                "duration": leg["duration_hours"] * 3600,
+                "annotation": {
+                    "distance": [leg["distance_miles"] / METERS_TO_MILES / segments] * segments,
+                    "duration": [leg["duration_hours"] * 3600 / segments] * segments,
+                },
+            })
+        return {
+            "code": "Ok",
+            "routes": [{"geometry": {"type": "LineString", "coordinates": coordinates}, "legs": legs}],
+            "waypoints": [{"location": [lon, lat]} for lat, lon in coords_list],
+        }
+
+
+def map_cache_overrides(*, enabled):
+    """
+    Settings giving a run map caches of its own, without the persistent
+    tier so stub answers never reach the shared cache. When not
+    ``enabled`` they hold nothing, so every lookup pays the stub's latency.
+    Call ``cache.reset_caches()`` for them to take effect.
+    """
+    return {
+        name: {**getattr(settings, name), 'BACKEND': None, **({} if enabled else {'MAXSIZE': 0})}
+        for name in ('GEOCODE_CACHE', 'ROUTE_CACHE')
+    }
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _QuietWSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class AppServer:
+    """
+    Serves this Django project in-process on a thread-per-request WSGI
+    server bound to localhost.
+    """
+
+    def __init__(self):
+        self.server = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def start(self):
+        self.server = make_server(
+            "127.0.0.1", 0, get_wsgi_application(),
+            server_class=_ThreadingWSGIServer,
+            handler_class=_QuietWSGIRequestHandler
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def generate_load(base_url, *, locations, duration, concurrency, calculate_ratio, seed=None):
+    """
+    Drives mixed traffic at the app for ``duration`` seconds from
+    ``concurrency`` client threads. Each request is a trip calculation (at
+    ``calculate_ratio``, or while no trip exists yet) over a random lane of
+    ``locations``, or a detail fetch of a trip calculated earlier in the run.
+
+    Returns (samples, trip ids), where samples are
+    (endpoint, seconds, status, query count) tuples.
+    """
+    calculate_url = base_url + reverse('trip-calculate')
+    samples = []
+    trip_ids = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        rng = random.Random(None if seed is None else seed + index)
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            with lock:
+                known = list(trip_ids[-200:])
+            if not known or rng.random() < calculate_ratio:
+                current, pickup, dropoff = rng.sample(locations, 3)
+                endpoint = 'calculate'
+                send = lambda: session.post(calculate_url, json={
+                    'current_location': current,
+                    'pickup_location': pickup,
+                    'dropoff_location': dropoff,
+                    'current_cycle_used': rng.choice([0, 10, 25, 40, 60]),
+                })
+            else:
+                endpoint = 'detail'
+                url = base_url + reverse('trip-detail', kwargs={'pk': rng.choice(known)})
+                send = lambda: session.get(url)
+
+            start = time.perf_counter()
+            try:
+                response = send()
+            except requests.RequestException:
+                status, queries = None, None
+            else:
+                status = response.status_code
+                queries = response.headers.get(QUERY_COUNT_HEADER)
+                if endpoint == 'calculate' and status == 201:
+                    with lock:
+                        trip_ids.append(response.json()['id'])
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples.append((endpoint, elapsed, status, None if queries is None else int(queries)))
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, trip_ids
+
+
+def summarize_load(samples, *, duration):
+    """
+    Per-endpoint request counts, error counts, throughput, latency
+    percentiles (ms) and database queries per request.
+    """
+    by_endpoint = {}
+    for endpoint, elapsed, status, queries in samples:
+        by_endpoint.setdefault(endpoint, []).append((elapsed, status, queries))
+
+    report = {}
+    for endpoint, rows in sorted(by_endpoint.items()):
+        latencies = sorted(elapsed * 1000 for elapsed, _, _ in rows)
+        queries = [count for _, _, count in rows if count is not None]
+        report[endpoint] = {
+            'requests': len(rows),
+            'errors': sum(1 for _, status, _ in rows if status is None or status >= 400),
+            'throughput_rps': len(rows) / duration if duration else 0.0,
+            'latency_ms': {
+                'mean': statistics.fmean(latencies),
+                'p50': percentile(latencies, 50),
+                'p90': percentile(latencies, 90),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1],
+            },
+            'db_queries': {
+                'mean': statistics.fmean(queries) if queries else None,
+                'max': max(queries) if queries else None,
+            },
+        }
+    return report
@@ -0,0 +1,99 @@
+import json
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from driver_hos_logbook.apps.driver_hos_logbook import benchmarks
+
+
+# Timings only compare on the machine that made them, so each machine keeps its own (untracked) baseline
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the planning and log sheet micro-benchmarks and compares them with a stored baseline. "
+        "Exits with an error when a benchmark's median or p99 (unbatched benchmarks only) regresses past its threshold, "
+        "or when there is no baseline unless --allow-missing-baseline is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', '--filter', action='append', dest='patterns', help="Only run benchmarks whose name contains this (repeatable).")
+        parser.add_argument('--list', action='store_true', help="List the benchmarks and exit.")
+        parser.add_argument('--min-time', type=float, default=0.5, help="Seconds to spend timing each benchmark.")
+        parser.add_argument('--min-repeat', type=int, default=5, help="Minimum timed runs per benchmark.")
+        parser.add_argument('--max-repeat', type=int, default=1000, help="Maximum timed runs per benchmark.")
+        parser.add_argument('--output', help="Write the results as JSON to this file ('-' for stdout).")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline results to compare against.")
+        parser.add_argument(
+            '--max-regression', type=float, default=benchmarks.DEFAULT_THRESHOLDS['median'],
+            help="Allowed median slowdown before failing (0.5 = 50%%)."
+        )
+        parser.add_argument(
+            '--max-p99-regression', type=float, default=benchmarks.DEFAULT_THRESHOLDS['p99'],
+            help="Allowed p99 slowdown before failing."
+        )
+        parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline.")
+        parser.add_argument(
+            '--allow-missing-baseline', action='store_true',
+            help="Succeed without comparing when there is no baseline (e.g. a first local run)."
+        )
+
+    def handle(self, *args, **options):
+        names = benchmarks.select(options['patterns'])
+        if options['list']:
+            self.stdout.write("\n".join(names))
+            return
+        if not names:
+            raise CommandError("No benchmarks match the given filters.")
+
+        results = benchmarks.run(
+            names,
+            min_time=options['min_time'],
+            min_repeat=options['min_repeat'],
+            max_repeat=options['max_repeat']
+        )
+        document = benchmarks.report(results)
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(document, indent=2))
+        else:
+            self.stdout.write(f"{'benchmark':<48} {'runs':>6} {'median ms':>11} {'p99 ms':>11}")
+            for name, stats in results.items():
+                p99 = '-' if stats['p99'] is None else f"{stats['p99']:.3f}"
+                self.stdout.write(f"{name:<48} {stats['repeat']:>6} {stats['median']:>11.3f} {p99:>11}")
+            if options['output']:
+                Path(options['output']).write_text(json.dumps(document, indent=2) + "\n")
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline = {'meta': document['meta'], 'benchmarks': {}}
+            if baseline_path.exists():
+                # Only the benchmarks that ran are replaced
+                baseline['benchmarks'] = json.loads(baseline_path.read_text()).get('benchmarks', {})
+            baseline['benchmarks'].update(results)
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+            self.stderr.write(f"Saved baseline to {baseline_path}.")
+            return
+        if not baseline_path.exists():
+            # A gate with nothing to compare against would pass every run
+            message = f"No baseline at {baseline_path}; run with --save-baseline to create one."
+            if not options['allow_missing_baseline']:
+                raise CommandError(message)
+            self.stderr.write(message)
+            return
+
+        rows = benchmarks.compare(
+            results,
+            json.loads(baseline_path.read_text()),
+            thresholds={'median': options['max_regression'], 'p99': options['max_p99_regression']}
+        )
+        regressions = [row for row in rows if row['regressed']]
+        for row in regressions:
+            self.stderr.write(
+                f"REGRESSION {row['benchmark']} {row['metric']}: "
+                f"{row['baseline']:.3f} ms -> {row['current']:.3f} ms ({row['change']:+.0%})"
+            )
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark metric(s) regressed past their threshold.")
+        self.stderr.write(f"No regressions against {baseline_path} ({len(rows)} metric(s) compared).")
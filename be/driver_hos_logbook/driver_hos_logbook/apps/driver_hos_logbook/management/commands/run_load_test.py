@@ -0,0 +1,124 @@
+import json
+import time
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from driver_hos_logbook.apps.driver_hos_logbook import cache, http_client, loadtest, providers
+from driver_hos_logbook.apps.driver_hos_logbook.models import Trip
+
+
+class Command(BaseCommand):
+    help = (
+        "Serves the app in-process against local Nominatim/OSRM stand-ins and drives concurrent "
+        "trip calculations and detail fetches at it, reporting per-endpoint latency percentiles, "
+        "throughput and database queries per request."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to generate load for.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Concurrent client threads.")
+        parser.add_argument(
+            '--calculate-ratio', type=float, default=0.3,
+            help="Share of requests that calculate a new trip; the rest fetch trip details."
+        )
+        parser.add_argument('--provider-latency-ms', type=float, default=50, help="Base latency of each map provider call.")
+        parser.add_argument('--provider-jitter-ms', type=float, default=50, help="Extra random latency of up to this much.")
+        parser.add_argument('--provider-error-rate', type=float, default=0.0, help="Share of map provider calls that fail with a 503.")
+        parser.add_argument('--no-fallback', action='store_true', help="Surface provider failures instead of falling back to the local provider.")
+        parser.add_argument(
+            '--map-cache', action='store_true',
+            help="Cache map lookups in fresh in-process caches for the run (by default every lookup reaches the stub)."
+        )
+        parser.add_argument('--seed', type=int, help="Seed for the traffic mix and injected latencies and failures.")
+        parser.add_argument('--output', help="Write the report as JSON to this file ('-' for stdout).")
+        parser.add_argument('--keep-trips', action='store_true', help="Keep the trips created during the run.")
+
+    def handle(self, *args, **options):
+        if options['duration'] <= 0 or options['concurrency'] < 1:
+            raise CommandError("--duration must be positive and --concurrency at least 1.")
+        if not 0 <= options['calculate_ratio'] <= 1 or not 0 <= options['provider_error_rate'] <= 1:
+            raise CommandError("--calculate-ratio and --provider-error-rate must be between 0 and 1.")
+
+        stub = loadtest.MapStubServer(
+            latency=options['provider_latency_ms'] / 1000,
+            jitter=options['provider_jitter_ms'] / 1000,
+            error_rate=options['provider_error_rate'],
+            seed=options['seed']
+        ).start()
+        locations = [place["name"] for place in json.loads(Path(settings.MAP_PROVIDER_OPTIONS['GAZETTEER_PATH']).read_text())]
+        overrides = {
+            'MAP_PROVIDER': 'remote',
+            'MAP_PROVIDER_OPTIONS': {
+                **settings.MAP_PROVIDER_OPTIONS,
+                'NOMINATIM_URL': stub.url + '/search',
+                'OSRM_URL': stub.url,
+            },
+            **loadtest.map_cache_overrides(enabled=options['map_cache']),
+            'QUERY_COUNT_HEADER': True,
+            'DEBUG': False,
+            'ALLOWED_HOSTS': ['127.0.0.1'],
+        }
+        if options['no_fallback']:
+            overrides['MAP_PROVIDER_FALLBACK'] = None
+
+        trip_ids = []
+        app = None
+        try:
+            with override_settings(**overrides):
+                providers.reset_providers()
+                cache.reset_caches()
+                http_client.reset_session()
+                app = loadtest.AppServer().start()
+                self.stderr.write(
+                    f"Generating load for {options['duration']:g}s from {options['concurrency']} clients "
+                    f"(app {app.url}, map stub {stub.url})."
+                )
+                started = time.perf_counter()
+                samples, trip_ids = loadtest.generate_load(
+                    app.url,
+                    locations=locations,
+                    duration=options['duration'],
+                    concurrency=options['concurrency'],
+                    calculate_ratio=options['calculate_ratio'],
+                    seed=options['seed']
+                )
+                elapsed = time.perf_counter() - started
+        finally:
+            if app is not None:
+                app.stop()
+            stub.stop()
+            providers.reset_providers()
+            cache.reset_caches()
+            http_client.reset_session()
+            if trip_ids and not options['keep_trips']:
+                Trip.objects.filter(pk__in=trip_ids).delete()
+
+        document = {
+            'config': {
+                key: options[key] for key in (
+                    'duration', 'concurrency', 'calculate_ratio', 'provider_latency_ms',
+                    'provider_jitter_ms', 'provider_error_rate', 'no_fallback', 'map_cache', 'seed'
+                )
+            },
+            'elapsed_seconds': elapsed,
+            'endpoints': loadtest.summarize_load(samples, duration=elapsed),
+        }
+
+        if options['output'] == '-':
+            self.stdout.write(json.dumps(document, indent=2))
+            return
+        self.stdout.write(
+            f"{'endpoint':<12} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} "
+            f"{'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'queries':>8}"
+        )
+        for endpoint, stats in document['endpoints'].items():
+            latency = stats['latency_ms']
+            queries = stats['db_queries']['mean']
+            self.stdout.write(
+                f"{endpoint:<12} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput_rps']:>8.1f} "
+                f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} {latency['max']:>9.1f} "
+                f"{'-' if queries is None else f'{queries:.1f}':>8}"
+            )
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(document, indent=2) + "\n")
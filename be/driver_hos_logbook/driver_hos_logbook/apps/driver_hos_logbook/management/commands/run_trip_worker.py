@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from driver_hos_logbook.apps.driver_hos_logbook import jobs
+
+
+class Command(BaseCommand):
+    help = "Runs queued trip calculation jobs. Start one process per worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--stale-after', type=int, default=600, help="Seconds before a RUNNING job is considered abandoned.")
+        parser.add_argument('--max-attempts', type=int, default=3, help="Attempts before an abandoned job is marked failed.")
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = jobs.run_pending_jobs()
+            self.stdout.write(f"Processed {count} job(s).")
+            return
+
+        self.stdout.write("Trip calculation worker started.")
+        jobs.work_forever(
+            poll_interval=options['poll_interval'],
+            stale_after=options['stale_after'],
+            max_attempts=options['max_attempts'],
+        )
@@ -0,0 +1,259 @@
+import bisect
+import contextvars
+import json
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+
+# Upper bounds (seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Timings of the spans run on behalf of the current request, as (name, seconds)
+_request_spans = contextvars.ContextVar("request_spans", default=None)
+
+
+class Counter:
+    """
+    A monotonically increasing count per label combination.
+    """
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(str(labels[name]) for name in self.labelnames), 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name + "_total", dict(zip(self.labelnames, key)), value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram:
+    """
+    Observations bucketed by upper bound, with their count and sum, per
+    label combination.
+    """
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # Per-bucket counts (the last is +Inf), then the sum
+                series = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def count(self, **labels):
+        series = self._values.get(tuple(str(labels[name]) for name in self.labelnames))
+        return sum(series[:-1]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, list(series)) for key, series in self._values.items())
+        for key, series in values:
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), series):
+                cumulative += count
+                yield self.name + "_bucket", {**labels, "le": _format_value(bound)}, cumulative
+            yield self.name + "_count", labels, cumulative
+            yield self.name + "_sum", labels, series[-1]
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Registry:
+    """
+    The process's metrics, rendered in the Prometheus text exposition
+    format. Collectors are callables yielding (name, type, documentation,
+    [(labels, value)]) for values read at scrape time, e.g. cache stats.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, func):
+        self._collectors.append(func)
+        return func
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(_format_sample(name, labels, value) for name, labels, value in metric.samples())
+        for collect in self._collectors:
+            for name, metric_type, documentation, values in collect():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(_format_sample(name, labels, value) for labels, value in values)
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        for metric in self._metrics.values():
+            metric.clear()
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_sample(name, labels, value):
+    if not labels:
+        return f"{name} {_format_value(value)}"
+    pairs = ",".join(
+        '{}="{}"'.format(key, str(label).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, label in labels.items()
+    )
+    return f"{name}{{{pairs}}} {_format_value(value)}"
+
+
+REGISTRY = Registry()
+
+SPAN_SECONDS = REGISTRY.histogram(
+    "hos_span_duration_seconds",
+    "Time spent in each instrumented step of trip planning and persistence.",
+    ("span",)
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "hos_http_request_duration_seconds",
+    "HTTP request latency by view, method and status code.",
+    ("view", "method", "status")
+)
+PROVIDER_ERRORS = REGISTRY.counter(
+    "hos_map_provider_errors",
+    "Failed map provider calls by provider and operation.",
+    ("provider", "operation")
+)
+
+
+class span:
+    """
+    Times the enclosed block into ``SPAN_SECONDS`` under ``name`` and, inside
+    a request, into that request's structured log line.
+    """
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        SPAN_SECONDS.observe(elapsed, span=self.name)
+        spans = _request_spans.get()
+        if spans is not None:
+            spans.append((self.name, elapsed))
+
+
+def track_request_spans():
+    """
+    Starts collecting span timings for the current request. Returns the
+    token for ``finish_request_spans``.
+    """
+    return _request_spans.set([])
+
+
+def finish_request_spans(token):
+    """
+    Stops collecting for the request and returns its total milliseconds per span.
+    """
+    spans = _request_spans.get()
+    _request_spans.reset(token)
+    totals = {}
+    for name, elapsed in spans:
+        totals[name] = totals.get(name, 0.0) + elapsed * 1000
+    return {name: round(total, 3) for name, total in totals.items()}
+
+
+def propagate(func):
+    """
+    Wraps ``func`` so spans it runs on a pool thread count towards the
+    request that submitted it.
+    """
+    spans = _request_spans.get()
+    if spans is None:
+        return func
+
+    def run(*args, **kwargs):
+        token = _request_spans.set(spans)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _request_spans.reset(token)
+    return run
+
+
+# Attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line, with any ``extra`` fields
+    as top-level keys.
+    """
+
+    def format(self, record):
+        document = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                document[key] = value
+        if record.exc_info:
+            document["exception"] = self.formatException(record.exc_info)
+        return json.dumps(document, default=str)
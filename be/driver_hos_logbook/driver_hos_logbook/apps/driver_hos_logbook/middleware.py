@@ -0,0 +1,72 @@
+import logging
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from . import metrics
+
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+
+request_logger = logging.getLogger("driver_hos_logbook.requests")
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency in ``metrics.REQUEST_SECONDS`` and logs
+    one structured line per request with the time spent in each span.
+    Disabled with ``settings.METRICS_ENABLED``.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = metrics.track_request_spans()
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - start
+            spans = metrics.finish_request_spans(token)
+        match = request.resolver_match
+        view = match.view_name if match is not None else "unmatched"
+        metrics.REQUEST_SECONDS.observe(elapsed, view=view, method=request.method, status=response.status_code)
+        if request_logger.isEnabledFor(logging.INFO):
+            request_logger.info("request", extra={
+                "view": view,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "duration_ms": round(elapsed * 1000, 3),
+                "spans": spans,
+            })
+        return response
+
+
+class QueryCountMiddleware:
+    """
+    Reports how many database queries a request ran (on its own thread) in
+    an ``X-DB-Query-Count`` response header. Only installed when
+    ``settings.QUERY_COUNT_HEADER`` is on, e.g. for load tests.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_COUNT_HEADER:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        count = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal count
+            count += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        response[QUERY_COUNT_HEADER] = str(count)
+        return response
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("driver_hos_logbook", "0002_trip_calculation_job"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="dailylog",
+            options={"ordering": ["log_date"]},
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="log_entries_data",
+            field=models.JSONField(
+                default=list, help_text="Serialized log entries for this day"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="total_driving",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="total_off_duty",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="total_on_duty",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="total_sleeper",
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name="dailylog",
+            name="trip",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Trip this log sheet was generated for",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="daily_logs",
+                to="driver_hos_logbook.trip",
+            ),
+        ),
+    ]
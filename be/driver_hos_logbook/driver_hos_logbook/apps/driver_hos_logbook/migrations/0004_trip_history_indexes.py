@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("driver_hos_logbook", "0003_daily_log_sheets"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="trip_created_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["current_location", "-created_at"],
+                name="trip_current_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["pickup_location", "-created_at"],
+                name="trip_pickup_created_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="trip",
+            index=models.Index(
+                fields=["dropoff_location", "-created_at"],
+                name="trip_dropoff_created_idx",
+            ),
+        ),
+    ]
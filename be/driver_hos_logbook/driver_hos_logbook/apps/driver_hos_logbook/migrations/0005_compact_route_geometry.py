@@ -0,0 +1,109 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:43
+
+from django.db import migrations, models
+
+
+# The polyline codec is frozen here rather than imported from the app, so
+# this migration keeps behaving the same if the app's encoder changes.
+
+PRECISION = 5
+
+
+def encode_polyline(coordinates, precision=PRECISION):
+    factor = 10 ** precision
+    result = []
+    prev_lat = prev_lon = 0
+    for lon, lat in coordinates:
+        lat_i, lon_i = round(lat * factor), round(lon * factor)
+        for delta in (lat_i - prev_lat, lon_i - prev_lon):
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                result.append(chr((0x20 | (value & 0x1F)) + 63))
+                value >>= 5
+            result.append(chr(value + 63))
+        prev_lat, prev_lon = lat_i, lon_i
+    return "".join(result)
+
+
+def decode_polyline(encoded, precision=PRECISION):
+    factor = 10 ** precision
+    coordinates = []
+    index = lat = lon = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = value = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                value |= (byte & 0x1F) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(value >> 1) if value & 1 else value >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        coordinates.append([lon / factor, lat / factor])
+    return coordinates
+
+
+def compact_existing_geometry(apps, schema_editor):
+    Trip = apps.get_model("driver_hos_logbook", "Trip")
+    trips = Trip.objects.filter(route_geometry__isnull=False).only("id", "route_geometry")
+    for trip in trips.iterator(chunk_size=200):
+        trip.route_geometry_compact = {
+            "format": "polyline",
+            "precision": PRECISION,
+            "segments": [
+                {
+                    "segment": feature["properties"].get("segment"),
+                    "polyline": encode_polyline(feature["geometry"]["coordinates"])
+                }
+                for feature in trip.route_geometry.get("features", [])
+            ]
+        }
+        trip.route_geometry = None
+        trip.save(update_fields=["route_geometry", "route_geometry_compact"])
+
+
+def expand_compact_geometry(apps, schema_editor):
+    # Restores the FeatureCollection before route_geometry_compact is dropped
+    Trip = apps.get_model("driver_hos_logbook", "Trip")
+    trips = Trip.objects.filter(route_geometry__isnull=True, route_geometry_compact__isnull=False)
+    for trip in trips.only("id", "route_geometry_compact").iterator(chunk_size=200):
+        compact = trip.route_geometry_compact
+        trip.route_geometry = {
+            "type": "FeatureCollection",
+            "features": [
+                {
+                    "type": "Feature",
+                    "geometry": {
+                        "type": "LineString",
+                        "coordinates": decode_polyline(segment["polyline"], compact.get("precision", PRECISION))
+                    },
+                    "properties": {"segment": segment["segment"]}
+                }
+                for segment in compact.get("segments", [])
+            ]
+        }
+        trip.save(update_fields=["route_geometry"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("driver_hos_logbook", "0004_trip_history_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="route_geometry_compact",
+            field=models.JSONField(
+                blank=True,
+                help_text="Route geometry as encoded polylines per segment",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(compact_existing_geometry, expand_compact_geometry),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("driver_hos_logbook", "0005_compact_route_geometry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Driver",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("name", models.CharField(max_length=255)),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+        migrations.AddField(
+            model_name="trip",
+            name="driver",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="trips",
+                to="driver_hos_logbook.driver",
+            ),
+        ),
+        migrations.CreateModel(
+            name="DriverDutyDay",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("date", models.DateField()),
+                ("on_duty_hours", models.FloatField(default=0)),
+                (
+                    "cycle_restart",
+                    models.BooleanField(
+                        default=False,
+                        help_text="A 34-hour restart was completed on or before this day's first on-duty time",
+                    ),
+                ),
+                (
+                    "driver",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="duty_days",
+                        to="driver_hos_logbook.driver",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["date"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("driver", "date"), name="driver_duty_day_unique"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:51
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("driver_hos_logbook", "0006_driver_duty_days"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DriverHOSState",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "as_of",
+                    models.DateTimeField(
+                        help_text="When the counters were taken (end of the latest trip)"
+                    ),
+                ),
+                (
+                    "cycle_hours",
+                    models.FloatField(
+                        default=0,
+                        help_text="Hours used in the current 70-hour/8-day cycle",
+                    ),
+                ),
+                (
+                    "driving_since_rest",
+                    models.FloatField(
+                        default=0, help_text="Driving hours since the last 10-hour rest"
+                    ),
+                ),
+                (
+                    "duty_since_rest",
+                    models.FloatField(
+                        default=0, help_text="On-duty hours since the last 10-hour rest"
+                    ),
+                ),
+                (
+                    "driving_since_break",
+                    models.FloatField(
+                        default=0,
+                        help_text="Driving hours since the last 30-minute break",
+                    ),
+                ),
+                ("miles_since_fuel", models.FloatField(default=0)),
+                (
+                    "driver",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="hos_state",
+                        to="driver_hos_logbook.driver",
+                    ),
+                ),
+            ],
+            options={
+                "abstract": False,
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("driver_hos_logbook", "0007_driver_hos_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="departure_time",
+            field=models.DateTimeField(
+                blank=True, help_text="When the planned trip starts", null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="trip",
+            name="home_terminal_timezone",
+            field=models.CharField(
+                blank=True,
+                help_text="IANA time zone the trip's log sheet days follow; blank for the server time zone",
+                max_length=64,
+            ),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:03
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # 0001_initial froze a single UUID as these primary keys' default while the
+    # models use uuid.uuid4. The columns don't change (SQLite rebuilds the tables).
+
+    dependencies = [
+        ("driver_hos_logbook", "0008_trip_departure_timezone"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="dailylog",
+            name="id",
+            field=models.UUIDField(
+                default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name="logentry",
+            name="id",
+            field=models.UUIDField(
+                default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name="routestop",
+            name="id",
+            field=models.UUIDField(
+                default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name="shippingdocument",
+            name="id",
+            field=models.UUIDField(
+                default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+        migrations.AlterField(
+            model_name="trip",
+            name="id",
+            field=models.UUIDField(
+                default=uuid.uuid4, editable=False, primary_key=True, serialize=False
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("driver_hos_logbook", "0009_fix_model_id_defaults"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="trip",
+            name="hos_state",
+            field=models.JSONField(
+                blank=True,
+                help_text="The driver's HOS counters at the end of the trip, restored if a later trip is deleted",
+                null=True,
+            ),
+        ),
+    ]
@@ -10,11 +10,87 @@ class DutyStatus(models.TextChoices):
     ON_DUTY_NOT_DRIVING = 'ON_DUTY_NOT_DRIVING', _('On Duty (Not Driving)')
 
 
+class Driver(BaseModel):
+    name = models.CharField(max_length=255)
+
+    def __str__(self):
+        return self.name
+
+
+class DriverHOSState(BaseModel):
+    """
+    Snapshot of a driver's HOS counters at the end of their latest planned
+    trip, so the next plan can resume from it without reading log history.
+    """
+    driver = models.OneToOneField(
+        Driver,
+        on_delete=models.CASCADE,
+        related_name='hos_state'
+    )
+    as_of = models.DateTimeField(help_text=_("When the counters were taken (end of the latest trip)"))
+    cycle_hours = models.FloatField(default=0, help_text=_("Hours used in the current 70-hour/8-day cycle"))
+    driving_since_rest = models.FloatField(default=0, help_text=_("Driving hours since the last 10-hour rest"))
+    duty_since_rest = models.FloatField(default=0, help_text=_("On-duty hours since the last 10-hour rest"))
+    driving_since_break = models.FloatField(default=0, help_text=_("Driving hours since the last 30-minute break"))
+    miles_since_fuel = models.FloatField(default=0)
+
+    SNAPSHOT_FIELDS = [
+        'as_of',
+        'cycle_hours',
+        'driving_since_rest',
+        'duty_since_rest',
+        'driving_since_break',
+        'miles_since_fuel',
+    ]
+
+    def __str__(self):
+        return f"HOS state of {self.driver} as of {self.as_of}"
+
+    def to_snapshot(self):
+        return {field: getattr(self, field) for field in self.SNAPSHOT_FIELDS}
+
+
+class DriverDutyDay(BaseModel):
+    """
+    A driver's on-duty hours per calendar day, summed over all their trips.
+    Maintained incrementally as trips are saved, so the 70-hour/8-day recap
+    reads at most eight rows instead of the driver's log history.
+    """
+    driver = models.ForeignKey(
+        Driver,
+        on_delete=models.CASCADE,
+        related_name='duty_days'
+    )
+    date = models.DateField()
+    on_duty_hours = models.FloatField(default=0)
+    cycle_restart = models.BooleanField(
+        default=False,
+        help_text=_("A 34-hour restart was completed on or before this day's first on-duty time")
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['driver', 'date'], name='driver_duty_day_unique'),
+        ]
+        ordering = ['date']
+
+    def __str__(self):
+        return f"{self.driver} on {self.date}: {self.on_duty_hours}h"
+
+
 class DailyLog(BaseModel):
     class LogType(models.TextChoices):
         ORIGINAL = 'ORIGINAL', _('Original')
         DUPLICATE = 'DUPLICATE', _('Duplicate')
 
+    trip = models.ForeignKey(
+        'Trip',
+        on_delete=models.CASCADE,
+        related_name='daily_logs',
+        null=True,
+        blank=True,
+        help_text=_("Trip this log sheet was generated for")
+    )
     log_date = models.DateField()
     log_type = models.CharField(
         max_length=20, 
@@ -41,12 +117,24 @@ class DailyLog(BaseModel):
     main_office_address = models.TextField(blank=True)
     home_terminal_address = models.TextField(blank=True)
     
+    # Grid totals (hours per duty status)
+    total_off_duty = models.FloatField(default=0)
+    total_sleeper = models.FloatField(default=0)
+    total_driving = models.FloatField(default=0)
+    total_on_duty = models.FloatField(default=0)
+    
     # Remarks
     remarks = models.TextField(blank=True)
     
     # Recap Data (can be calculated but also stored for audit purposes)
     recap_data = models.JSONField(default=dict, help_text=_("Daily recap calculations"))
 
+    # Log entries for this day (split at midnight), as rendered on the sheet
+    log_entries_data = models.JSONField(default=list, help_text=_("Serialized log entries for this day"))
+
+    class Meta:
+        ordering = ['log_date']
+
     def __str__(self):
         return f"Daily Log for {self.log_date}"
 
@@ -73,6 +161,13 @@ class Trip(BaseModel):
         null=True,
         blank=True
     )
+    driver = models.ForeignKey(
+        Driver,
+        on_delete=models.SET_NULL,
+        related_name='trips',
+        null=True,
+        blank=True
+    )
     current_location = models.CharField(max_length=255)
     current_lat = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     current_lon = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
@@ -90,6 +185,12 @@ class Trip(BaseModel):
         decimal_places=2, 
         help_text=_("Hours used in the current 70-hour/8-day cycle")
     )
+    departure_time = models.DateTimeField(null=True, blank=True, help_text=_("When the planned trip starts"))
+    home_terminal_timezone = models.CharField(
+        max_length=64,
+        blank=True,
+        help_text=_("IANA time zone the trip's log sheet days follow; blank for the server time zone")
+    )
     total_distance = models.DecimalField(
         max_digits=10, 
         decimal_places=2, 
@@ -97,6 +198,26 @@ class Trip(BaseModel):
         help_text=_("Total calculated distance in miles")
     )
     route_geometry = models.JSONField(null=True, blank=True, help_text=_("OSRM route geometry coordinates"))
+    route_geometry_compact = models.JSONField(
+        null=True,
+        blank=True,
+        help_text=_("Route geometry as encoded polylines per segment")
+    )
+    hos_state = models.JSONField(
+        null=True,
+        blank=True,
+        help_text=_("The driver's HOS counters at the end of the trip, restored if a later trip is deleted")
+    )
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the trip history, newest first
+            models.Index(fields=['-created_at', '-id'], name='trip_created_id_idx'),
+            # Location filters, each still ordered by recency
+            models.Index(fields=['current_location', '-created_at'], name='trip_current_created_idx'),
+            models.Index(fields=['pickup_location', '-created_at'], name='trip_pickup_created_idx'),
+            models.Index(fields=['dropoff_location', '-created_at'], name='trip_dropoff_created_idx'),
+        ]
 
     def __str__(self):
         return f"Trip from {self.current_location} to {self.dropoff_location}"
@@ -159,3 +280,38 @@ class RouteStop(BaseModel):
 
     def __str__(self):
         return f"{self.stop_type} at {self.location}"
+
+
+class TripCalculationJob(BaseModel):
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', _('Pending')
+        RUNNING = 'RUNNING', _('Running')
+        SUCCEEDED = 'SUCCEEDED', _('Succeeded')
+        FAILED = 'FAILED', _('Failed')
+
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING
+    )
+    payload = models.JSONField(help_text=_("Validated TripInputSerializer data"))
+    trip = models.ForeignKey(
+        Trip,
+        on_delete=models.SET_NULL,
+        related_name='calculation_jobs',
+        null=True,
+        blank=True
+    )
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='tripjob_status_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Trip calculation job {self.id} ({self.status})"
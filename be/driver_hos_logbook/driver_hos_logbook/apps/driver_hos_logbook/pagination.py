@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class TripCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), served by trip_created_id_idx,
+    so page cost stays flat regardless of how many trips exist.
+    """
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
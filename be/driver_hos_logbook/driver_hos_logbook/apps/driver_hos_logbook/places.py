@@ -0,0 +1,74 @@
+import json
+import math
+import threading
+from django.conf import settings
+from .geometry import haversine_miles
+
+
+# Upper bound on miles per degree of latitude or longitude
+MILES_PER_DEGREE = 69.2
+
+
+class GridIndex:
+    """
+    Nearest-point lookups over a fixed set of {"name", "lat", "lon"} places,
+    bucketed into a grid of ``cell_degrees`` cells so a query only scans the
+    cells within its radius.
+    """
+
+    def __init__(self, places, *, cell_degrees):
+        self.cell_degrees = cell_degrees
+        self.cells = {}
+        for place in places:
+            self.cells.setdefault(self._cell(place["lat"], place["lon"]), []).append(place)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees)
+
+    def nearest(self, lat, lon, *, radius_miles):
+        """
+        Returns (place, distance_miles) for the closest place within
+        ``radius_miles``, or (None, None).
+        """
+        row, col = self._cell(lat, lon)
+        lat_cells = math.ceil(radius_miles / MILES_PER_DEGREE / self.cell_degrees)
+        # Longitude degrees shrink towards the poles, so widen the search
+        lon_scale = max(math.cos(math.radians(min(abs(lat) + lat_cells * self.cell_degrees, 89.0))), 0.01)
+        lon_cells = math.ceil(radius_miles / (MILES_PER_DEGREE * lon_scale) / self.cell_degrees)
+
+        best, best_distance = None, radius_miles
+        for r in range(row - lat_cells, row + lat_cells + 1):
+            for c in range(col - lon_cells, col + lon_cells + 1):
+                for place in self.cells.get((r, c), ()):
+                    distance = haversine_miles(lat, lon, place["lat"], place["lon"])
+                    if distance <= best_distance:
+                        best, best_distance = place, distance
+        return (best, best_distance) if best is not None else (None, None)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_place_index():
+    """
+    Returns the index of places that label en-route stops, loading
+    ``settings.EN_ROUTE_PLACES['PATH']`` on first use.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                config = settings.EN_ROUTE_PLACES
+                with open(config["PATH"]) as f:
+                    _index = GridIndex(json.load(f), cell_degrees=config["CELL_DEGREES"])
+    return _index
+
+
+def reset_place_index():
+    """
+    Drops the loaded index so the next lookup re-reads settings.
+    """
+    global _index
+    with _index_lock:
+        _index = None
@@ -0,0 +1,315 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+from django.conf import settings
+from django.utils.module_loading import import_string
+from . import http_client
+from .cache import normalize_location
+from .geometry import haversine_miles, interpolate_line
+
+
+METERS_TO_MILES = 0.000621371
+
+STATE_ABBREVIATIONS = {
+    "alabama": "al", "alaska": "ak", "arizona": "az", "arkansas": "ar", "california": "ca",
+    "colorado": "co", "connecticut": "ct", "delaware": "de", "district of columbia": "dc",
+    "florida": "fl", "georgia": "ga", "hawaii": "hi", "idaho": "id", "illinois": "il",
+    "indiana": "in", "iowa": "ia", "kansas": "ks", "kentucky": "ky", "louisiana": "la",
+    "maine": "me", "maryland": "md", "massachusetts": "ma", "michigan": "mi", "minnesota": "mn",
+    "mississippi": "ms", "missouri": "mo", "montana": "mt", "nebraska": "ne", "nevada": "nv",
+    "new hampshire": "nh", "new jersey": "nj", "new mexico": "nm", "new york": "ny",
+    "north carolina": "nc", "north dakota": "nd", "ohio": "oh", "oklahoma": "ok", "oregon": "or",
+    "pennsylvania": "pa", "rhode island": "ri", "south carolina": "sc", "south dakota": "sd",
+    "tennessee": "tn", "texas": "tx", "utah": "ut", "vermont": "vt", "virginia": "va",
+    "washington": "wa", "west virginia": "wv", "wisconsin": "wi", "wyoming": "wy",
+}
+
+
+class MapProvider(ABC):
+    """
+    Interface for geocoding and routing backends.
+
+    The methods return ``None`` for a definitive "not found" and raise on
+    transport errors, so callers can tell which answers are safe to cache.
+    """
+    name = None
+    cacheable = True
+
+    @abstractmethod
+    def geocode(self, location_name):
+        """
+        Returns {"lat", "lon", "display_name"} for the location, or None.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def route(self, coords_list):
+        """
+        Routes through [(lat, lon), ...] and returns one
+        {"distance_miles", "duration_hours", "geometry"} dict per leg, or None.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def table(self, coords_list):
+        """
+        Returns {"durations_hours", "distances_miles"}: square matrices of
+        travel between every pair of [(lat, lon), ...], or None. Entries
+        may be None where there is no route.
+        """
+        raise NotImplementedError
+
+
+class RemoteMapProvider(MapProvider):
+    """
+    Nominatim geocoding and OSRM routing over HTTP.
+    """
+    name = "remote"
+
+    def __init__(self, *, nominatim_url, osrm_url, user_agent):
+        self.nominatim_url = nominatim_url
+        self.osrm_url = osrm_url.rstrip("/")
+        self.user_agent = user_agent
+
+    def geocode(self, location_name):
+        params = {
+            "q": location_name,
+            "format": "json",
+            "limit": 1
+        }
+        headers = {
+            "User-Agent": self.user_agent
+        }
+        response = http_client.get(self.nominatim_url, params=params, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+        if not data:
+            return None
+        return {
+            "lat": float(data[0]["lat"]),
+            "lon": float(data[0]["lon"]),
+            "display_name": data[0]["display_name"]
+        }
+
+    def route(self, coords_list):
+        # OSRM expects {lon},{lat}
+        waypoints = ";".join(f"{lon},{lat}" for lat, lon in coords_list)
+        url = f"{self.osrm_url}/route/v1/driving/{waypoints}"
+        params = {
+            "overview": "full",
+            "geometries": "geojson",
+            # Per-segment distances let us cut the overview geometry per leg,
+            # and durations place the truck along it by time
+            "annotations": "duration,distance"
+        }
+        response = http_client.get(url, params=params)
+        response.raise_for_status()
+        data = response.json()
+        if data["code"] != "Ok":
+            return None
+        route = data["routes"][0]
+        leg_geometries = split_route_geometry(
+            coordinates=route["geometry"]["coordinates"],
+            legs=route["legs"],
+            waypoints=data.get("waypoints", [])
+        )
+        return [
+            {
+                "distance_miles": leg["distance"] * METERS_TO_MILES,
+                "duration_hours": leg["duration"] / 3600,
+                "geometry": _leg_geometry(coordinates, leg.get("annotation", {}).get("duration"))
+            }
+            for leg, coordinates in zip(route["legs"], leg_geometries)
+        ]
+
+    def table(self, coords_list):
+        waypoints = ";".join(f"{lon},{lat}" for lat, lon in coords_list)
+        url = f"{self.osrm_url}/table/v1/driving/{waypoints}"
+        response = http_client.get(url, params={"annotations": "duration,distance"})
+        response.raise_for_status()
+        data = response.json()
+        if data["code"] != "Ok":
+            return None
+        return {
+            "durations_hours": [
+                [None if value is None else value / 3600 for value in row]
+                for row in data["durations"]
+            ],
+            "distances_miles": [
+                [None if value is None else value * METERS_TO_MILES for value in row]
+                for row in data["distances"]
+            ]
+        }
+
+
+class LocalMapProvider(MapProvider):
+    """
+    Network-free stand-in: geocodes against a bundled gazetteer and routes
+    along great-circle lines, scaled by a road-factor multiplier.
+    """
+    name = "local"
+    # Answers are computed in microseconds and may be approximate,
+    # so they are kept out of the shared caches.
+    cacheable = False
+
+    def __init__(self, *, gazetteer_path, road_factor, average_speed_mph, vertex_spacing_miles):
+        self.road_factor = road_factor
+        self.average_speed_mph = average_speed_mph
+        self.vertex_spacing_miles = vertex_spacing_miles
+        self.places = {}
+        self.places_by_city = {}
+        with open(gazetteer_path) as f:
+            for place in json.load(f):
+                key = normalize_location(place["name"])
+                self.places[key] = place
+                self.places_by_city.setdefault(key.split(",")[0], []).append(place)
+
+    def geocode(self, location_name):
+        key = normalize_location(location_name)
+        parts = [part.strip() for part in key.split(",")]
+        candidates = [key]
+        if len(parts) >= 2:
+            state = STATE_ABBREVIATIONS.get(parts[1], parts[1])
+            candidates.append(f"{parts[0]}, {state}")
+
+        place = next((self.places[c] for c in candidates if c in self.places), None)
+        if place is None:
+            matches = self.places_by_city.get(parts[0], [])
+            place = matches[0] if len(matches) == 1 else None
+        if place is None:
+            return None
+        return {
+            "lat": place["lat"],
+            "lon": place["lon"],
+            "display_name": place["name"]
+        }
+
+    def route(self, coords_list):
+        legs = []
+        for start, end in zip(coords_list, coords_list[1:]):
+            distance = haversine_miles(*start, *end) * self.road_factor
+            legs.append({
+                "distance_miles": distance,
+                "duration_hours": distance / self.average_speed_mph,
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": interpolate_line(start, end, step_miles=self.vertex_spacing_miles)
+                }
+            })
+        return legs
+
+    def table(self, coords_list):
+        distances = [
+            [haversine_miles(*start, *end) * self.road_factor for end in coords_list]
+            for start in coords_list
+        ]
+        return {
+            "durations_hours": [[distance / self.average_speed_mph for distance in row] for row in distances],
+            "distances_miles": distances
+        }
+
+
+def _leg_geometry(coordinates, durations):
+    """
+    A leg's GeoJSON LineString. When the provider's per-segment durations
+    (seconds) line up with the coordinates, they are kept as a
+    ``segment_hours`` foreign member for ``RouteIndex``.
+    """
+    geometry = {"type": "LineString", "coordinates": coordinates}
+    if durations and len(durations) == len(coordinates) - 1:
+        geometry["segment_hours"] = [duration / 3600 for duration in durations]
+    return geometry
+
+
+def split_route_geometry(*, coordinates, legs, waypoints):
+    """
+    Splits an OSRM overview geometry into one coordinate list per leg.
+
+    Each leg's distance annotation has one entry per geometry segment, so
+    the legs can be cut by count. If the counts don't line up (e.g. the
+    provider simplified the overview), cut at the coordinate closest to
+    each snapped intermediate waypoint instead.
+    """
+    if len(legs) == 1:
+        return [coordinates]
+
+    counts = [len(leg.get("annotation", {}).get("distance", [])) for leg in legs]
+    if all(counts) and sum(counts) + 1 == len(coordinates):
+        cuts = []
+        offset = 0
+        for count in counts[:-1]:
+            offset += count
+            cuts.append(offset)
+    else:
+        cuts = []
+        start = 0
+        for waypoint in waypoints[1:-1]:
+            lon, lat = waypoint["location"]
+            nearest = min(
+                range(start, len(coordinates)),
+                key=lambda i: (coordinates[i][0] - lon) ** 2 + (coordinates[i][1] - lat) ** 2
+            )
+            cuts.append(nearest)
+            start = nearest
+
+    bounds = [0, *cuts, len(coordinates) - 1]
+    return [coordinates[bounds[i]:bounds[i + 1] + 1] for i in range(len(legs))]
+
+
+PROVIDERS = {
+    "remote": lambda: RemoteMapProvider(
+        nominatim_url=settings.MAP_PROVIDER_OPTIONS["NOMINATIM_URL"],
+        osrm_url=settings.MAP_PROVIDER_OPTIONS["OSRM_URL"],
+        user_agent=settings.MAP_PROVIDER_OPTIONS["USER_AGENT"],
+    ),
+    "local": lambda: LocalMapProvider(
+        gazetteer_path=settings.MAP_PROVIDER_OPTIONS["GAZETTEER_PATH"],
+        road_factor=settings.MAP_PROVIDER_OPTIONS["ROAD_FACTOR"],
+        average_speed_mph=settings.MAP_PROVIDER_OPTIONS["AVERAGE_SPEED_MPH"],
+        vertex_spacing_miles=settings.MAP_PROVIDER_OPTIONS["VERTEX_SPACING_MILES"],
+    ),
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def load_provider(name):
+    """
+    Returns the provider registered under ``name`` ("remote", "local"), or
+    instantiates a MapProvider subclass given by dotted path.
+    """
+    provider = _providers.get(name)
+    if provider is None:
+        with _providers_lock:
+            provider = _providers.get(name)
+            if provider is None:
+                factory = PROVIDERS.get(name) or import_string(name)
+                provider = factory()
+                _providers[name] = provider
+    return provider
+
+
+def get_map_provider():
+    """
+    Returns the provider selected by ``settings.MAP_PROVIDER``.
+    """
+    return load_provider(settings.MAP_PROVIDER)
+
+
+def get_fallback_provider():
+    """
+    Returns the provider used when the primary one fails, if configured.
+    """
+    name = settings.MAP_PROVIDER_FALLBACK
+    if not name or name == settings.MAP_PROVIDER:
+        return None
+    return load_provider(name)
+
+
+def reset_providers():
+    """
+    Drops provider instances so the next lookup re-reads settings.
+    """
+    with _providers_lock:
+        _providers.clear()
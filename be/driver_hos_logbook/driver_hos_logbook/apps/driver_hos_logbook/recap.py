@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+from django.db.models import F, Max
+from django.utils import timezone
+from .models import DailyLog, DriverDutyDay, DriverHOSState, Trip
+
+
+CYCLE_LIMIT_HOURS = 70.0
+CYCLE_DAYS = 8
+
+
+def daily_recap(date, duty_days):
+    """
+    70-hour/8-day recap for ``date``. ``duty_days`` maps dates to
+    ``(on_duty_hours, cycle_restart)``; only the eight days ending at
+    ``date`` are read, and days before a 34-hour restart don't count.
+    """
+    hours_by_day = []
+    for offset in range(CYCLE_DAYS):
+        hours, cycle_restart = duty_days.get(date - timedelta(days=offset), (0.0, False))
+        hours_by_day.append(hours)
+        if cycle_restart:
+            break
+    last_7_days = sum(hours_by_day[:CYCLE_DAYS - 1])
+    return {
+        'on_duty_today': round(hours_by_day[0], 2),
+        'total_last_7_days': round(last_7_days, 2),
+        'total_last_8_days': round(sum(hours_by_day), 2),
+        'available_tomorrow': round(max(0.0, CYCLE_LIMIT_HOURS - last_7_days), 2)
+    }
+
+
+def load_duty_history(driver, *, since):
+    """
+    Returns the driver's recorded duty days from ``since`` on, in the
+    mapping shape ``daily_recap`` reads.
+    """
+    return {
+        date: (hours, cycle_restart)
+        for date, hours, cycle_restart in DriverDutyDay.objects.filter(
+            driver=driver,
+            date__gte=since - timedelta(days=CYCLE_DAYS - 1)
+        ).values_list('date', 'on_duty_hours', 'cycle_restart')
+    }
+
+
+def record_duty_days(driver, daily_sheets):
+    """
+    Adds a trip's per-day on-duty hours to the driver's running totals.
+    Increments happen in the database, so concurrent trips for the same
+    driver can't overwrite each other's hours.
+    """
+    days = {}
+    for sheet in daily_sheets:
+        hours, cycle_restart = days.get(sheet['date'], (0.0, False))
+        days[sheet['date']] = (
+            hours + sheet['total_driving'] + sheet['total_on_duty'],
+            cycle_restart or sheet.get('cycle_restart', False)
+        )
+    if not days:
+        return
+
+    DriverDutyDay.objects.bulk_create(
+        [DriverDutyDay(driver=driver, date=date) for date in days],
+        ignore_conflicts=True
+    )
+    for date, (hours, cycle_restart) in days.items():
+        changes = {'on_duty_hours': F('on_duty_hours') + hours, 'updated_at': timezone.now()}
+        if cycle_restart:
+            changes['cycle_restart'] = True
+        DriverDutyDay.objects.filter(driver=driver, date=date).update(**changes)
+
+
+def release_duty_days(trip):
+    """
+    Subtracts a deleted trip's per-day on-duty hours, read from its stored
+    log sheets, from the driver's running totals. Days that no other trip
+    of the driver was logged on are removed outright, along with any
+    34-hour restart only this trip recorded.
+    """
+    if trip.driver_id is None:
+        return
+    days = {}
+    for date, driving, on_duty in DailyLog.objects.filter(trip=trip).values_list(
+        'log_date', 'total_driving', 'total_on_duty'
+    ):
+        days[date] = days.get(date, 0.0) + driving + on_duty
+    if not days:
+        return
+
+    duty_days = DriverDutyDay.objects.filter(driver_id=trip.driver_id)
+    shared = set(
+        DailyLog.objects.filter(trip__driver_id=trip.driver_id, log_date__in=days)
+        .exclude(trip=trip)
+        .values_list('log_date', flat=True)
+    )
+    duty_days.filter(date__in=set(days) - shared).delete()
+    for date in shared:
+        duty_days.filter(date=date).update(
+            on_duty_hours=F('on_duty_hours') - days[date],
+            updated_at=timezone.now()
+        )
+
+
+def release_hos_state(trip):
+    """
+    Rolls the driver's HOS snapshot back if a deleted trip wrote it: to the
+    snapshot stored with their latest remaining trip, or removes it when
+    there is none (or that trip predates stored snapshots).
+    """
+    if trip.driver_id is None or trip.hos_state is None:
+        return
+    state = DriverHOSState.objects.filter(
+        driver_id=trip.driver_id,
+        as_of=datetime.fromisoformat(trip.hos_state['as_of'])
+    )
+    if not state.exists():
+        # Already replaced by a trip ending later
+        return
+
+    previous = (
+        Trip.objects.filter(driver_id=trip.driver_id)
+        .exclude(pk=trip.pk)
+        .annotate(ended=Max('log_entries__end_time'))
+        .order_by(F('ended').desc(nulls_last=True))
+        .values_list('hos_state', flat=True)
+        .first()
+    )
+    if previous is None:
+        state.delete()
+        return
+    state.update(
+        updated_at=timezone.now(),
+        **{**previous, 'as_of': datetime.fromisoformat(previous['as_of'])}
+    )
@@ -0,0 +1,104 @@
+import numpy as np
+from .geometry import EARTH_RADIUS_MILES
+
+
+class RouteIndex:
+    """
+    Along-route lookups over a route's geometry. Cumulative great-circle
+    distances are computed once, so every position or mileage lookup is a
+    binary search rather than a walk over the coordinates.
+
+    ``legs`` are the route's consecutive ([lon, lat] coordinates, driving
+    hours, routed miles[, segment hours]) lines. A leg's driving time is
+    spread over its geometry by the provider's per-segment durations when
+    given (so slow stretches take longer), otherwise evenly by distance.
+    Its routed miles are spread over the geometry by distance.
+    """
+
+    def __init__(self, legs):
+        lons, lats, profiles = [], [], []
+        for coordinates, leg_hours, leg_miles, *segment_hours in legs:
+            points = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+            lons.append(points[:, 0])
+            lats.append(points[:, 1])
+            profiles.append((len(points), leg_hours, leg_miles, segment_hours[0] if segment_hours else None))
+
+        self.lons = np.concatenate(lons)
+        self.lats = np.concatenate(lats)
+        self.cumulative = np.concatenate(([0.0], np.cumsum(self._segment_miles(self.lons, self.lats))))
+
+        # Time and routed-mile breakpoints at every vertex. Consecutive legs
+        # meet at the same time and mileage, so gaps between leg geometries
+        # are never interpolated.
+        hours, miles = [], []
+        offset, hours_before, miles_before = 0, 0.0, 0.0
+        for count, leg_hours, leg_miles, segment_hours in profiles:
+            along = self.cumulative[offset:offset + count] - self.cumulative[offset]
+            share = along / along[-1] if along[-1] > 0 else np.linspace(0.0, 1.0, count)
+            time_share = share
+            if segment_hours is not None and len(segment_hours) == count - 1 and sum(segment_hours) > 0:
+                time_share = np.concatenate(([0.0], np.cumsum(segment_hours))) / sum(segment_hours)
+            hours.append(hours_before + time_share * leg_hours)
+            miles.append(miles_before + share * leg_miles)
+            offset += count
+            hours_before += leg_hours
+            miles_before += leg_miles
+        self._hours = np.concatenate(hours)
+        self._miles = np.concatenate(miles)
+
+    @staticmethod
+    def _segment_miles(lons, lats):
+        phi = np.radians(lats)
+        d_phi = np.diff(phi)
+        d_lambda = np.radians(np.diff(lons))
+        a = np.sin(d_phi / 2) ** 2 + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(d_lambda / 2) ** 2
+        return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    @property
+    def length(self):
+        """
+        Great-circle length of the geometry, in miles.
+        """
+        return float(self.cumulative[-1])
+
+    def positions_at(self, distances):
+        """
+        (lats, lons) arrays for points ``distances`` miles along the
+        geometry. Distances beyond either end are clamped.
+        """
+        distances = np.clip(np.asarray(distances, dtype=float), 0.0, self.cumulative[-1])
+        if len(self.cumulative) == 1:
+            return np.full(distances.shape, self.lats[0]), np.full(distances.shape, self.lons[0])
+        i = np.clip(np.searchsorted(self.cumulative, distances), 1, len(self.cumulative) - 1)
+        start, end = self.cumulative[i - 1], self.cumulative[i]
+        span = end - start
+        t = np.divide(distances - start, span, out=np.zeros_like(distances), where=span > 0)
+        lats = self.lats[i - 1] + (self.lats[i] - self.lats[i - 1]) * t
+        lons = self.lons[i - 1] + (self.lons[i] - self.lons[i - 1]) * t
+        return lats, lons
+
+    def position_at(self, distance):
+        """
+        (lat, lon) of the point ``distance`` miles along the geometry.
+        """
+        lats, lons = self.positions_at([distance])
+        return float(lats[0]), float(lons[0])
+
+    def distance_at_hours(self, hours):
+        """
+        Miles along the geometry after ``hours`` of driving.
+        """
+        return np.interp(hours, self._hours, self.cumulative)
+
+    def position_at_hours(self, hours):
+        """
+        (lat, lon) of the truck after ``hours`` of driving.
+        """
+        return self.position_at(float(self.distance_at_hours(hours)))
+
+    def miles_at_hours(self, hours):
+        """
+        Routed miles covered after ``hours`` of driving, read off the
+        geometry at the truck's position.
+        """
+        return np.interp(hours, self._hours, self._miles)
@@ -1,7 +1,13 @@
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from django.conf import settings
 from django.db import transaction
-from .models import Trip, LogEntry, RouteStop
-from . import utils
+from django.db.models import Q
+from django.utils import timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from .models import DailyLog, Driver, DriverHOSState, Trip, LogEntry, RouteStop, TripCalculationJob
+from . import metrics, recap, utils
+from .geometry import compact_route_geometry, tolerance_from_params
 
 
 class TripInputSerializer(serializers.Serializer):
@@ -12,67 +18,408 @@ class TripInputSerializer(serializers.Serializer):
         max_digits=5, 
         decimal_places=2, 
         min_value=0, 
-        max_value=70
+        max_value=70,
+        required=False,
+        help_text="Required unless a driver is given; defaults to the driver's tracked cycle hours"
+    )
+    driver = serializers.PrimaryKeyRelatedField(
+        queryset=Driver.objects.all(),
+        required=False,
+        allow_null=True
+    )
+    departure_time = serializers.DateTimeField(
+        required=False,
+        help_text="When the trip starts; defaults to 08:00 today in the home terminal time zone"
+    )
+    home_terminal_timezone = serializers.CharField(
+        max_length=64,
+        required=False,
+        help_text="IANA time zone (e.g. America/New_York) whose midnights split the log sheets; "
+                  "defaults to the server time zone"
     )
 
+    def validate_home_terminal_timezone(self, value):
+        try:
+            ZoneInfo(value)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise serializers.ValidationError(f"Unknown time zone '{value}'.")
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('current_cycle_used') is None and attrs.get('driver') is None:
+            raise serializers.ValidationError({'current_cycle_used': 'This field is required.'})
+        return attrs
+
     def create(self, validated_data):
         # 1. Perform HOS calculation
-        result = utils.calculate_route_with_hos(
+        result = self.calculate(validated_data)
+        
+        # 2. Persist the results in a transaction
+        trip, log_entries, route_stops, daily_logs = self.build_instances(validated_data, result)
+        with metrics.span('db.persist'), transaction.atomic():
+            trip.save(force_insert=True)
+            LogEntry.objects.bulk_create(log_entries)
+            RouteStop.objects.bulk_create(route_stops)
+            DailyLog.objects.bulk_create(daily_logs)
+            if trip.driver is not None:
+                recap.record_duty_days(trip.driver, result['daily_logs'])
+                TripInputSerializer.save_hos_state(trip.driver, result['hos_state'])
+            
+        return trip
+
+    @staticmethod
+    def calculate(validated_data):
+        return utils.calculate_route_with_hos(
             current_location=validated_data['current_location'],
             pickup_location=validated_data['pickup_location'],
             dropoff_location=validated_data['dropoff_location'],
-            current_cycle_used=validated_data['current_cycle_used']
+            current_cycle_used=validated_data.get('current_cycle_used'),
+            **TripInputSerializer.departure(validated_data),
+            **TripInputSerializer.load_driver_state(validated_data)
+        )
+
+    @staticmethod
+    def departure(validated_data):
+        """
+        The ``departure_time`` and ``home_timezone`` planning arguments.
+        """
+        name = validated_data.get('home_terminal_timezone')
+        return {
+            'departure_time': validated_data.get('departure_time'),
+            'home_timezone': ZoneInfo(name) if name else None
+        }
+
+    @staticmethod
+    def departure_date(validated_data):
+        """
+        The date the trip departs in its home terminal time zone, i.e. the
+        date of its first log sheet.
+        """
+        departure = TripInputSerializer.departure(validated_data)
+        start = departure['departure_time'] or utils.default_start_time(departure['home_timezone'])
+        return timezone.localtime(start, departure['home_timezone']).date()
+
+    @staticmethod
+    def load_driver_state(validated_data):
+        """
+        The ``hos_state`` and ``duty_history`` planning starts from.
+        """
+        driver = validated_data.get('driver')
+        if driver is None:
+            return {'hos_state': None, 'duty_history': None}
+        return {
+            'hos_state': TripInputSerializer.load_hos_state(driver),
+            'duty_history': recap.load_duty_history(driver, since=TripInputSerializer.departure_date(validated_data))
+        }
+
+    @staticmethod
+    def load_hos_state(driver):
+        """
+        Returns the driver's HOS snapshot, or None before their first trip.
+        """
+        state = DriverHOSState.objects.filter(driver=driver).first()
+        return state.to_snapshot() if state is not None else None
+
+    @staticmethod
+    def save_hos_state(driver, snapshot):
+        """
+        Stores the HOS counters at the end of a trip as the driver's snapshot.
+        A trip ending before the stored snapshot doesn't replace it.
+        """
+        updated = DriverHOSState.objects.filter(driver=driver, as_of__lte=snapshot['as_of']).update(
+            updated_at=timezone.now(),
+            **snapshot
+        )
+        if not updated:
+            DriverHOSState.objects.get_or_create(driver=driver, defaults=snapshot)
+
+    @staticmethod
+    def build_instances(validated_data, result):
+        """
+        Builds the unsaved Trip and its LogEntry/RouteStop/DailyLog rows from a calculation result.
+        """
+        current_cycle_used = validated_data.get('current_cycle_used')
+        if current_cycle_used is None:
+            current_cycle_used = round(result['route_summary']['start_cycle_hours'], 2)
+        # Kept with the trip so the driver's snapshot can be rolled back to it
+        hos_state = result.get('hos_state')
+        if hos_state is not None:
+            hos_state = {**hos_state, 'as_of': hos_state['as_of'].isoformat()}
+        trip = Trip(
+            driver=validated_data.get('driver'),
+            current_location=validated_data['current_location'],
+            current_lat=result['route_summary']['current_coords']['lat'],
+            current_lon=result['route_summary']['current_coords']['lon'],
+            pickup_location=validated_data['pickup_location'],
+            pickup_lat=result['route_summary']['pickup_coords']['lat'],
+            pickup_lon=result['route_summary']['pickup_coords']['lon'],
+            dropoff_location=validated_data['dropoff_location'],
+            dropoff_lat=result['route_summary']['dropoff_coords']['lat'],
+            dropoff_lon=result['route_summary']['dropoff_coords']['lon'],
+            current_cycle_used=current_cycle_used,
+            departure_time=result['route_summary']['start_time'],
+            home_terminal_timezone=validated_data.get('home_terminal_timezone', ''),
+            total_distance=result['route_summary']['total_distance'],
+            route_geometry_compact=compact_route_geometry(result['route_summary']['route_geometry']),
+            hos_state=hos_state
         )
         
-        # 2. Persist the results in a transaction
-        with transaction.atomic():
-            # Create the Trip
-            trip = Trip.objects.create(
+        log_entries = [
+            LogEntry(
+                trip=trip,
+                duty_status=entry['duty_status'],
+                start_time=entry['start_time'],
+                end_time=entry['end_time'],
+                location=entry['location'],
+                notes=entry.get('notes')
+            )
+            for entry in result['log_entries']
+        ]
+        
+        route_stops = [
+            RouteStop(
+                trip=trip,
+                stop_type=stop['stop_type'],
+                location=stop['location'],
+                latitude=stop.get('latitude'),
+                longitude=stop.get('longitude'),
+                arrival_time=stop['arrival_time'],
+                duration_minutes=stop['duration_minutes'],
+                description=stop.get('description')
+            )
+            for stop in result['stops']
+        ]
+
+        # Sheet entries are stored with the home terminal's UTC offset
+        home_timezone = TripInputSerializer.departure(validated_data)['home_timezone']
+        daily_logs = []
+        for sheet in result['daily_logs']:
+            day_entries = sheet['log_entries']
+            daily_logs.append(DailyLog(
+                trip=trip,
+                log_date=sheet['date'],
+                from_location=day_entries[0]['location'] if day_entries else '',
+                to_location=day_entries[-1]['location'] if day_entries else '',
+                total_miles_driving_today=sheet['total_miles_driving'],
+                total_mileage_today=sheet['total_mileage_today'],
+                total_off_duty=sheet['total_off_duty'],
+                total_sleeper=sheet['total_sleeper'],
+                total_driving=sheet['total_driving'],
+                total_on_duty=sheet['total_on_duty'],
+                remarks=sheet['remarks'],
+                recap_data=sheet['recap'],
+                log_entries_data=TripInputSerializer.serialize_sheet_entries(day_entries, home_timezone)
+            ))
+        return trip, log_entries, route_stops, daily_logs
+
+    @staticmethod
+    def serialize_sheet_entries(entries, home_timezone):
+        if home_timezone is None:
+            return LogEntrySerializer(entries, many=True).data
+        with timezone.override(home_timezone):
+            return LogEntrySerializer(entries, many=True).data
+
+
+class TripStopInputSerializer(serializers.Serializer):
+    STOP_TYPES = [RouteStop.StopType.PICKUP, RouteStop.StopType.DROPOFF]
+
+    location = serializers.CharField(max_length=255)
+    stop_type = serializers.ChoiceField(choices=STOP_TYPES)
+    shipment = serializers.CharField(
+        max_length=100,
+        required=False,
+        allow_blank=True,
+        help_text="Links a dropoff to the pickup(s) it must follow; a dropoff without one follows every pickup"
+    )
+
+
+class MultiStopTripInputSerializer(TripInputSerializer):
+    """
+    Plans a trip through several pickups and dropoffs, optionally choosing
+    the visiting order. The saved trip's pickup is the first pickup visited
+    and its dropoff the last stop.
+    """
+    pickup_location = None
+    dropoff_location = None
+    stops = TripStopInputSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=settings.MULTI_STOP_MAX_STOPS
+    )
+    optimize = serializers.BooleanField(default=True, help_text="Choose the stop order to minimize driving time")
+
+    def validate_stops(self, stops):
+        stop_types = {stop['stop_type'] for stop in stops}
+        if stop_types != {RouteStop.StopType.PICKUP, RouteStop.StopType.DROPOFF}:
+            raise serializers.ValidationError('At least one pickup and one dropoff are required.')
+        picked_up = {stop.get('shipment') for stop in stops if stop['stop_type'] == RouteStop.StopType.PICKUP}
+        for stop in stops:
+            if stop['stop_type'] == RouteStop.StopType.DROPOFF and stop.get('shipment') and stop['shipment'] not in picked_up:
+                raise serializers.ValidationError(f"Shipment '{stop['shipment']}' is dropped off but never picked up.")
+        return stops
+
+    @staticmethod
+    def calculate(validated_data):
+        try:
+            return utils.calculate_multi_stop_route_with_hos(
                 current_location=validated_data['current_location'],
-                current_lat=result['route_summary']['current_coords']['lat'],
-                current_lon=result['route_summary']['current_coords']['lon'],
-                pickup_location=validated_data['pickup_location'],
-                pickup_lat=result['route_summary']['pickup_coords']['lat'],
-                pickup_lon=result['route_summary']['pickup_coords']['lon'],
-                dropoff_location=validated_data['dropoff_location'],
-                dropoff_lat=result['route_summary']['dropoff_coords']['lat'],
-                dropoff_lon=result['route_summary']['dropoff_coords']['lon'],
-                current_cycle_used=validated_data['current_cycle_used'],
-                total_distance=result['route_summary']['total_distance'],
-                route_geometry=result['route_summary']['route_geometry']
+                stops=validated_data['stops'],
+                current_cycle_used=validated_data.get('current_cycle_used'),
+                optimize=validated_data['optimize'],
+                **TripInputSerializer.departure(validated_data),
+                **TripInputSerializer.load_driver_state(validated_data)
             )
-            
-            # Create Log Entries
-            log_entries = [
-                LogEntry(
-                    trip=trip,
-                    duty_status=entry['duty_status'],
-                    start_time=entry['start_time'],
-                    end_time=entry['end_time'],
-                    location=entry['location'],
-                    notes=entry.get('notes')
-                )
-                for entry in result['log_entries']
-            ]
+        except ValueError as e:
+            raise serializers.ValidationError({'stops': [str(e)]})
+
+    @staticmethod
+    def build_instances(validated_data, result):
+        ordered = [validated_data['stops'][i] for i in result['stop_order']]
+        return TripInputSerializer.build_instances({
+            **validated_data,
+            'pickup_location': next(stop['location'] for stop in ordered if stop['stop_type'] == RouteStop.StopType.PICKUP),
+            'dropoff_location': ordered[-1]['location']
+        }, result)
+
+
+class TripScenarioInputSerializer(serializers.Serializer):
+    """
+    What-if comparison of one lane across start times and cycle values.
+    Nothing is persisted.
+    """
+    current_location = serializers.CharField(max_length=255)
+    pickup_location = serializers.CharField(max_length=255)
+    dropoff_location = serializers.CharField(max_length=255)
+    start_times = serializers.ListField(
+        child=serializers.DateTimeField(),
+        required=False,
+        allow_empty=False,
+        help_text="Defaults to 08:00 today"
+    )
+    cycle_values = serializers.ListField(
+        child=serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=70),
+        allow_empty=False,
+        help_text="Hours already used in the current 70-hour/8-day cycle"
+    )
+
+    def validate(self, attrs):
+        variants = len(attrs.get('start_times', [None])) * len(attrs['cycle_values'])
+        if variants > settings.TRIP_SCENARIO_MAX_VARIANTS:
+            raise serializers.ValidationError(
+                f"{variants} scenarios requested; at most {settings.TRIP_SCENARIO_MAX_VARIANTS} are allowed."
+            )
+        return attrs
+
+    def compare(self):
+        data = self.validated_data
+        return utils.compare_trip_scenarios(
+            current_location=data['current_location'],
+            pickup_location=data['pickup_location'],
+            dropoff_location=data['dropoff_location'],
+            start_times=data.get('start_times') or [utils.default_start_time()],
+            cycle_values=data['cycle_values']
+        )
+
+
+class TripScenarioSerializer(serializers.Serializer):
+    start_time = serializers.DateTimeField()
+    current_cycle_used = serializers.DecimalField(max_digits=5, decimal_places=2)
+    arrival_time = serializers.DateTimeField(help_text="Arrival at the dropoff")
+    end_time = serializers.DateTimeField(help_text="End of the post-trip inspection")
+    total_time_hours = serializers.FloatField()
+    driving_hours = serializers.FloatField()
+    on_duty_hours = serializers.FloatField(help_text="Driving plus on-duty (not driving) hours")
+    rest_stops = serializers.IntegerField(help_text="10-hour rests and 34-hour restarts")
+    breaks = serializers.IntegerField()
+    fuel_stops = serializers.IntegerField()
+
+
+class TripScenarioComparisonSerializer(serializers.Serializer):
+    route = serializers.DictField(help_text="Total distance and driving hours of the lane")
+    scenarios = TripScenarioSerializer(many=True)
+
+
+class TripBatchInputSerializer(serializers.Serializer):
+    """
+    Plans and saves many trips in one request. Items are validated and
+    planned independently, except that one driver's trips follow each other
+    in batch order; failures are reported per item by index.
+    """
+    trips = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=settings.TRIP_BATCH_MAX_SIZE
+    )
+
+    def create(self, validated_data):
+        items = validated_data['trips']
+        results = [None] * len(items)
+
+        # 1. Validate every item on its own so one bad row doesn't sink the batch
+        valid = []
+        for index, item in enumerate(items):
+            item_serializer = TripInputSerializer(data=item)
+            if item_serializer.is_valid():
+                valid.append((index, item_serializer.validated_data))
+            else:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': item_serializer.errors}
+
+        # 2. Plan all valid trips (shared geocoding, parallel HOS simulation).
+        # A driver's trips are planned in batch order, each from where the
+        # previous one left them.
+        drivers = {data['driver'].pk: data['driver'] for _, data in valid if data.get('driver') is not None}
+        # Read from the earliest departure of each driver's trips
+        departures = {}
+        for _, data in valid:
+            if data.get('driver') is not None:
+                date = TripInputSerializer.departure_date(data)
+                departures[data['driver'].pk] = min(date, departures.get(data['driver'].pk, date))
+        histories = {pk: recap.load_duty_history(driver, since=departures[pk]) for pk, driver in drivers.items()}
+        hos_states = {
+            state.driver_id: state.to_snapshot()
+            for state in DriverHOSState.objects.filter(driver__in=drivers)
+        } if drivers else {}
+        calculations = utils.calculate_routes_with_hos_batch([
+            {
+                'current_location': data['current_location'],
+                'pickup_location': data['pickup_location'],
+                'dropoff_location': data['dropoff_location'],
+                'current_cycle_used': data.get('current_cycle_used'),
+                'duty_history': histories.get(data['driver'].pk) if data.get('driver') else None,
+                'hos_state': hos_states.get(data['driver'].pk) if data.get('driver') else None,
+                **TripInputSerializer.departure(data)
+            }
+            for _, data in valid
+        ], chains=[
+            [position for position, (_, data) in enumerate(valid) if data.get('driver') == driver]
+            for driver in drivers.values()
+        ])
+
+        # 3. Persist everything with one bulk insert per table
+        trips, log_entries, route_stops, daily_logs, driver_results = [], [], [], [], []
+        for (index, data), result in zip(valid, calculations):
+            if isinstance(result, Exception):
+                results[index] = {'index': index, 'status': 'failed', 'errors': {'detail': str(result)}}
+                continue
+            trip, trip_log_entries, trip_route_stops, trip_daily_logs = TripInputSerializer.build_instances(data, result)
+            trips.append(trip)
+            if trip.driver is not None:
+                driver_results.append((trip.driver, result))
+            log_entries.extend(trip_log_entries)
+            route_stops.extend(trip_route_stops)
+            daily_logs.extend(trip_daily_logs)
+            results[index] = {'index': index, 'status': 'created', 'id': trip.id}
+
+        with metrics.span('db.persist'), transaction.atomic():
+            Trip.objects.bulk_create(trips)
             LogEntry.objects.bulk_create(log_entries)
-            
-            # Create Route Stops
-            route_stops = [
-                RouteStop(
-                    trip=trip,
-                    stop_type=stop['stop_type'],
-                    location=stop['location'],
-                    latitude=stop.get('latitude'),
-                    longitude=stop.get('longitude'),
-                    arrival_time=stop['arrival_time'],
-                    duration_minutes=stop['duration_minutes'],
-                    description=stop.get('description')
-                )
-                for stop in result['stops']
-            ]
             RouteStop.objects.bulk_create(route_stops)
-            
-        return trip
+            DailyLog.objects.bulk_create(daily_logs)
+            for driver, result in driver_results:
+                recap.record_duty_days(driver, result['daily_logs'])
+                TripInputSerializer.save_hos_state(driver, result['hos_state'])
+
+        return {'created': len(trips), 'failed': len(items) - len(trips), 'results': results}
 
 
 class LogEntrySerializer(serializers.ModelSerializer):
@@ -123,6 +470,65 @@ class DailyLogSheetSerializer(serializers.Serializer):
     recap = serializers.DictField(required=False, help_text="HOS Recap data")
 
 
+class DailyLogSerializer(serializers.ModelSerializer):
+    """
+    Renders a stored DailyLog in the same shape as DailyLogSheetSerializer.
+    """
+    date = serializers.DateField(source='log_date')
+    total_miles_driving = serializers.DecimalField(source='total_miles_driving_today', max_digits=10, decimal_places=2)
+    log_entries = serializers.JSONField(source='log_entries_data')
+    recap = serializers.DictField(source='recap_data', help_text="HOS Recap data")
+
+    class Meta:
+        model = DailyLog
+        fields = [
+            'date',
+            'total_miles_driving',
+            'total_mileage_today',
+            'total_off_duty',
+            'total_sleeper',
+            'total_driving',
+            'total_on_duty',
+            'log_entries',
+            'remarks',
+            'recap'
+        ]
+
+
+class TripListFilterSerializer(serializers.Serializer):
+    """
+    Query parameters accepted by the trip history list. Every filter maps
+    onto an index: the date range onto (created_at, id), and each location
+    onto its (location, created_at) index.
+    """
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    current_location = serializers.CharField(required=False, max_length=255)
+    pickup_location = serializers.CharField(required=False, max_length=255)
+    dropoff_location = serializers.CharField(required=False, max_length=255)
+    location = serializers.CharField(
+        required=False,
+        max_length=255,
+        help_text="Matches current, pickup or dropoff location exactly"
+    )
+
+    def filter_queryset(self, queryset):
+        data = self.validated_data
+        if 'created_after' in data:
+            queryset = queryset.filter(created_at__gte=data['created_after'])
+        if 'created_before' in data:
+            queryset = queryset.filter(created_at__lt=data['created_before'])
+        for field in ('current_location', 'pickup_location', 'dropoff_location'):
+            if field in data:
+                queryset = queryset.filter(**{field: data[field]})
+        if 'location' in data:
+            location = data['location']
+            queryset = queryset.filter(
+                Q(current_location=location) | Q(pickup_location=location) | Q(dropoff_location=location)
+            )
+        return queryset
+
+
 class TripListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Trip
@@ -136,15 +542,36 @@ class TripListSerializer(serializers.ModelSerializer):
         ]
 
 
+class RouteGeometryParamsSerializer(serializers.Serializer):
+    """
+    Query parameters of the geometry endpoint: the ``encoding`` (GeoJSON or
+    encoded polylines) and optional simplification, as a ``tolerance`` in
+    meters or the web-map ``zoom`` level it will be drawn at.
+    """
+    ENCODINGS = ('geojson', 'polyline')
+
+    encoding = serializers.ChoiceField(choices=ENCODINGS, required=False, default='geojson')
+    tolerance = serializers.FloatField(required=False, min_value=0)
+    zoom = serializers.IntegerField(required=False, min_value=0, max_value=22)
+
+    def get_tolerance(self):
+        return tolerance_from_params(
+            tolerance_meters=self.validated_data.get('tolerance'),
+            zoom=self.validated_data.get('zoom')
+        )
+
+
 class TripDetailSerializer(serializers.ModelSerializer):
     log_entries = LogEntrySerializer(many=True, read_only=True)
     stops = RouteStopSerializer(many=True, read_only=True)
     daily_logs = serializers.SerializerMethodField()
+    route_geometry_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Trip
         fields = [
             'id', 
+            'driver',
             'current_location',
             'current_lat',
             'current_lon',
@@ -155,25 +582,59 @@ class TripDetailSerializer(serializers.ModelSerializer):
             'dropoff_lat',
             'dropoff_lon',
             'current_cycle_used', 
+            'departure_time',
+            'home_terminal_timezone',
             'log_entries', 
             'stops', 
             'daily_logs',
-            'route_geometry',
+            'route_geometry_url',
             'created_at'
         ]
 
+    def get_route_geometry_url(self, obj):
+        # The geometry is served (and cached) separately; see TripViewSet.geometry
+        return reverse('trip-geometry', kwargs={'pk': obj.pk}, request=self.context.get('request'))
+
     def get_daily_logs(self, obj):
+        daily_logs = list(obj.daily_logs.all())
+        if daily_logs:
+            return DailyLogSerializer(daily_logs, many=True).data
+
+        # Trips saved before log sheets were materialized: rebuild them from the entries
         from .utils import generate_daily_log_sheets
         import dateutil.parser
         
-        # We need to re-hydrate the log entries for the utility
-        # In a real app, we might store the daily logs or compute them more efficiently
         log_entries_data = LogEntrySerializer(obj.log_entries.all(), many=True).data
         for entry in log_entries_data:
             entry['start_time'] = dateutil.parser.parse(entry['start_time'])
             entry['end_time'] = dateutil.parser.parse(entry['end_time'])
             
         return DailyLogSheetSerializer(
-            generate_daily_log_sheets(log_entries_data, obj.total_distance),
+            generate_daily_log_sheets(
+                log_entries_data, obj.total_distance,
+                tz=ZoneInfo(obj.home_terminal_timezone) if obj.home_terminal_timezone else None
+            ),
             many=True
         ).data
+
+
+class TripCalculationJobSerializer(serializers.ModelSerializer):
+    trip = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TripCalculationJob
+        fields = [
+            'id',
+            'status',
+            'error',
+            'attempts',
+            'trip',
+            'created_at',
+            'started_at',
+            'finished_at'
+        ]
+
+    def get_trip(self, obj):
+        if obj.status != TripCalculationJob.Status.SUCCEEDED or obj.trip is None:
+            return None
+        return TripDetailSerializer(obj.trip, context=self.context).data
@@ -0,0 +1,11 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from . import recap
+from .models import Trip
+
+
+@receiver(pre_delete, sender=Trip)
+def release_trip_duty_days(sender, instance, **kwargs):
+    # Runs before the trip's log sheets and entries are cascaded away
+    recap.release_duty_days(instance)
+    recap.release_hos_state(instance)
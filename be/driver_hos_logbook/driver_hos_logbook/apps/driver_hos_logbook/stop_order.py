@@ -0,0 +1,72 @@
+def route_cost(matrix, route):
+    """
+    Total cost of visiting ``route`` (node indices) in order, without returning.
+    """
+    return sum(matrix[a][b] for a, b in zip(route, route[1:]))
+
+
+def is_feasible(route, precedence):
+    """
+    Whether every node in ``route`` comes after all of its predecessors.
+    ``precedence`` maps a node to the set of nodes that must be visited first.
+    """
+    position = {node: i for i, node in enumerate(route)}
+    return all(
+        position[before] < position[node]
+        for node, predecessors in precedence.items()
+        for before in predecessors
+    )
+
+
+def plan_stop_order(matrix, *, precedence, start=0):
+    """
+    Orders the nodes of a (possibly asymmetric) cost matrix into an open
+    path from ``start``, visiting each node after its predecessors.
+
+    Builds a tour by nearest insertion, then improves it with 2-opt moves
+    that keep precedence. Returns the node order, excluding ``start``.
+    """
+    route = _nearest_insertion(matrix, precedence=precedence, start=start)
+    return _two_opt(matrix, route, precedence=precedence)[1:]
+
+
+def _nearest_insertion(matrix, *, precedence, start):
+    route = [start]
+    remaining = set(range(len(matrix))) - {start}
+    while remaining:
+        inserted = set(route)
+        candidates = [node for node in remaining if precedence.get(node, set()) <= inserted]
+        if not candidates:
+            raise ValueError("Stop precedence constraints are circular")
+        # The candidate closest to any node already on the route...
+        node = min(candidates, key=lambda c: (min(min(matrix[r][c], matrix[c][r]) for r in route), c))
+
+        # ...goes where it adds the least cost, after all of its predecessors
+        earliest = 1 + max((route.index(p) for p in precedence.get(node, ())), default=0)
+        best_position, best_delta = None, None
+        for i in range(earliest, len(route) + 1):
+            delta = matrix[route[i - 1]][node]
+            if i < len(route):
+                delta += matrix[node][route[i]] - matrix[route[i - 1]][route[i]]
+            if best_delta is None or delta < best_delta:
+                best_position, best_delta = i, delta
+        route.insert(best_position, node)
+        remaining.remove(node)
+    return route
+
+
+def _two_opt(matrix, route, *, precedence, max_passes=50):
+    # Costs are recomputed per move because reversing a segment of an
+    # asymmetric matrix changes the cost of every edge inside it
+    best_cost = route_cost(matrix, route)
+    for _ in range(max_passes):
+        improved = False
+        for i in range(1, len(route) - 1):
+            for j in range(i + 1, len(route)):
+                candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                cost = route_cost(matrix, candidate)
+                if cost < best_cost - 1e-9 and is_feasible(candidate, precedence):
+                    route, best_cost, improved = candidate, cost, True
+        if not improved:
+            break
+    return route
@@ -1,9 +1,33 @@
-from django.test import TestCase
+import io
+import json
+import logging
+import random
+import tempfile
+import threading
+import requests
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
-from unittest.mock import patch
+from django.utils.dateparse import parse_date, parse_datetime
+from unittest.mock import MagicMock, patch
+from zoneinfo import ZoneInfo
 from django.urls import reverse
 from rest_framework.test import APIClient
-from .models import DailyLog, Trip
+from . import benchmarks, geometry, hos, http_client, jobs, loadtest, metrics, places, providers, recap, route_index, stop_order, utils
+from .cache import get_geocode_cache, get_route_cache, reset_caches, route_cache_key
+from .models import DailyLog, Driver, DriverDutyDay, DriverHOSState, DutyStatus, RouteStop, Trip, TripCalculationJob
+
+
+def setUpModule():
+    # Keep the per-request log lines out of the test output
+    logging.getLogger('driver_hos_logbook.requests').setLevel(logging.WARNING)
+
 
 class TripViewSetTests(TestCase):
     def setUp(self):
@@ -22,8 +46,8 @@ class TripViewSetTests(TestCase):
         url = reverse('trip-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['current_location'], "Los Angeles, CA")
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['current_location'], "Los Angeles, CA")
 
     @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.calculate_route_with_hos')
     def test_calculate_trip(self, mock_calculate):
@@ -57,3 +81,1678 @@ class TripViewSetTests(TestCase):
         
         self.assertEqual(response.status_code, 201)
         self.assertEqual(Trip.objects.count(), 2) # 1 from setUp, 1 from this POST
+
+
+@override_settings(MAP_PROVIDER_FALLBACK=None)
+class GeocodeCacheTests(TestCase):
+    def setUp(self):
+        get_geocode_cache().clear()
+
+    def _mock_response(self, payload):
+        response = MagicMock()
+        response.json.return_value = payload
+        return response
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_repeated_lookups_hit_cache(self, mock_get):
+        mock_get.return_value = self._mock_response(
+            [{"lat": "32.7767", "lon": "-96.7970", "display_name": "Dallas, Texas"}]
+        )
+
+        first = utils.geocode_location("Dallas, TX")
+        second = utils.geocode_location("  dallas ,tx ")
+
+        self.assertEqual(first, second)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(get_geocode_cache().stats['hits'], 1)
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_misses_are_negatively_cached(self, mock_get):
+        mock_get.return_value = self._mock_response([])
+
+        self.assertIsNone(utils.geocode_location("Nowhere, ZZ"))
+        self.assertIsNone(utils.geocode_location("Nowhere, ZZ"))
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_persistent_tier_survives_local_eviction(self, mock_get):
+        mock_get.return_value = self._mock_response(
+            [{"lat": "33.4484", "lon": "-112.0740", "display_name": "Phoenix, Arizona"}]
+        )
+
+        utils.geocode_location("Phoenix, AZ")
+        get_geocode_cache().local.clear()
+        result = utils.geocode_location("Phoenix, AZ")
+
+        self.assertEqual(result["lat"], 33.4484)
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(get_geocode_cache().stats['persistent_hits'], 1)
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_transient_errors_are_not_cached(self, mock_get):
+        mock_get.side_effect = ConnectionError("boom")
+        self.assertIsNone(utils.geocode_location("Dallas, TX"))
+
+        mock_get.side_effect = None
+        mock_get.return_value = self._mock_response(
+            [{"lat": "32.7767", "lon": "-96.7970", "display_name": "Dallas, Texas"}]
+        )
+        self.assertIsNotNone(utils.geocode_location("Dallas, TX"))
+        self.assertEqual(mock_get.call_count, 2)
+
+
+@override_settings(MAP_PROVIDER_FALLBACK=None)
+class RouteCacheTests(TestCase):
+    def setUp(self):
+        get_route_cache().clear()
+
+    def _mock_response(self, payload):
+        response = MagicMock()
+        response.json.return_value = payload
+        return response
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_nearby_coordinates_share_cached_route(self, mock_get):
+        mock_get.return_value = self._mock_response({
+            "code": "Ok",
+            "routes": [{
+                "distance": 1609.344,
+                "duration": 3600,
+                "geometry": {"type": "LineString", "coordinates": [[-112.07, 33.44], [-96.79, 32.77]]},
+                "legs": [{"distance": 1609.344, "duration": 3600}]
+            }]
+        })
+
+        first = utils.get_route_data((33.44840, -112.07400), (32.77670, -96.79700))
+        second = utils.get_route_data((33.448401, -112.074003), (32.776698, -96.797001))
+
+        self.assertEqual(first, second)
+        self.assertAlmostEqual(second["distance_miles"], 1.0, places=3)
+        self.assertEqual(mock_get.call_count, 1)
+
+    def test_cache_key_uses_configured_precision(self):
+        self.assertEqual(route_cache_key((33.44841, -112.07), (32.7, -96.7), 2), "33.45,-112.07,32.70,-96.70")
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_routing_errors_are_not_cached(self, mock_get):
+        mock_get.side_effect = ConnectionError("boom")
+        self.assertIsNone(utils.get_route_data((33.4, -112.0), (32.7, -96.7)))
+        self.assertIsNone(utils.get_route_data((33.4, -112.0), (32.7, -96.7)))
+        self.assertEqual(mock_get.call_count, 2)
+
+
+@override_settings(ROUTING_MODE='per_segment')
+class ConcurrentLookupTests(TestCase):
+    GEOCODES = {
+        "Los Angeles, CA": {"lat": 34.05, "lon": -118.24},
+        "Phoenix, AZ": {"lat": 33.44, "lon": -112.07},
+        "Dallas, TX": {"lat": 32.77, "lon": -96.79},
+    }
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.get_route_data')
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.geocode_location')
+    def test_geocodes_run_concurrently(self, mock_geocode, mock_route):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def geocode(name):
+            # Only passes if all three lookups are in flight at once
+            barrier.wait()
+            return self.GEOCODES[name]
+
+        mock_geocode.side_effect = geocode
+        mock_route.return_value = {"distance_miles": 100.0, "duration_hours": 2.0, "geometry": None}
+
+        result = utils.calculate_route_with_hos("Los Angeles, CA", "Phoenix, AZ", "Dallas, TX", 0)
+
+        self.assertEqual(result['route_summary']['total_distance'], 200.0)
+        mock_route.assert_any_call((34.05, -118.24), (33.44, -112.07))
+        mock_route.assert_any_call((33.44, -112.07), (32.77, -96.79))
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.get_route_data', return_value=None)
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.geocode_location', return_value=None)
+    def test_fallbacks_are_preserved(self, mock_geocode, mock_route):
+        result = utils.calculate_route_with_hos("A", "B", "C", 0)
+
+        summary = result['route_summary']
+        self.assertEqual(summary['current_coords'], {"lat": 34.0522, "lon": -118.2437})
+        self.assertEqual(summary['pickup_coords'], {"lat": 33.4484, "lon": -112.0740})
+        self.assertEqual(summary['dropoff_coords'], {"lat": 32.7767, "lon": -96.7970})
+        self.assertEqual(summary['total_distance'], 1200.0)
+        self.assertEqual(summary['route_geometry']['features'], [])
+
+
+@override_settings(MAP_HTTP={
+    'CONNECT_TIMEOUT': 1,
+    'READ_TIMEOUT': 1,
+    'RETRIES': 2,
+    'BACKOFF_FACTOR': 0,
+    'BACKOFF_JITTER': 0,
+    'POOL_CONNECTIONS': 1,
+    'POOL_MAXSIZE': 2,
+})
+class MapHttpClientTests(TestCase):
+    def setUp(self):
+        http_client.reset_session()
+        self.addCleanup(http_client.reset_session)
+
+    def _serve(self, statuses):
+        """Starts a local server answering with the given status codes in turn."""
+        statuses = list(statuses)
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(statuses.pop(0) if len(statuses) > 1 else statuses[0])
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", "2")
+                self.end_headers()
+                self.wfile.write(b"[]")
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_port}/"
+
+    def test_transient_errors_are_retried(self):
+        url = self._serve([503, 502, 200])
+        response = http_client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_session_is_shared_and_pooled(self):
+        session = http_client.get_session()
+        adapter = session.get_adapter("https://nominatim.openstreetmap.org/search")
+
+        self.assertIs(http_client.get_session(), session)
+        self.assertEqual(adapter._pool_maxsize, 2)
+        self.assertEqual(adapter.max_retries.total, 2)
+
+
+class MultiLegRoutingTests(TestCase):
+    OSRM_RESPONSE = {
+        "code": "Ok",
+        "routes": [{
+            "distance": 3000.0,
+            "duration": 7200.0,
+            "geometry": {"type": "LineString", "coordinates": [[-118.0, 34.0], [-115.0, 33.8], [-112.0, 33.4], [-104.0, 33.0], [-96.0, 32.7]]},
+            "legs": [
+                {"distance": 1000.0, "duration": 3600.0, "annotation": {"distance": [500.0, 500.0]}},
+                {"distance": 2000.0, "duration": 3600.0, "annotation": {"distance": [1000.0, 1000.0], "duration": [2700.0, 900.0]}},
+            ]
+        }],
+        "waypoints": [{"location": [-118.0, 34.0]}, {"location": [-112.0, 33.4]}, {"location": [-96.0, 32.7]}]
+    }
+    COORDS = [(34.0, -118.0), (33.4, -112.0), (32.7, -96.0)]
+
+    def setUp(self):
+        get_route_cache().clear()
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_all_legs_fetched_in_one_request(self, mock_get):
+        mock_get.return_value = MagicMock(json=MagicMock(return_value=self.OSRM_RESPONSE))
+
+        legs = utils.get_multi_leg_route_data(self.COORDS)
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn("-118.0,34.0;-112.0,33.4;-96.0,32.7", mock_get.call_args[0][0])
+        self.assertEqual(len(legs), 2)
+        self.assertEqual(legs[0]["geometry"]["coordinates"], [[-118.0, 34.0], [-115.0, 33.8], [-112.0, 33.4]])
+        self.assertEqual(legs[1]["geometry"]["coordinates"], [[-112.0, 33.4], [-104.0, 33.0], [-96.0, 32.7]])
+        self.assertAlmostEqual(legs[1]["duration_hours"], 1.0)
+        self.assertEqual(legs[1]["geometry"]["segment_hours"], [0.75, 0.25])
+        self.assertNotIn("segment_hours", legs[0]["geometry"])
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_legs_are_shared_with_segment_cache(self, mock_get):
+        mock_get.return_value = MagicMock(json=MagicMock(return_value=self.OSRM_RESPONSE))
+
+        utils.get_multi_leg_route_data(self.COORDS)
+        utils.get_multi_leg_route_data(self.COORDS)
+        segment = utils.get_route_data(self.COORDS[1], self.COORDS[2])
+
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertAlmostEqual(segment["distance_miles"], 2000.0 * 0.000621371)
+
+    def test_split_falls_back_to_nearest_waypoint(self):
+        route = self.OSRM_RESPONSE["routes"][0]
+        legs = [{"distance": 1.0, "duration": 1.0}, {"distance": 1.0, "duration": 1.0}]
+
+        split = providers.split_route_geometry(
+            coordinates=route["geometry"]["coordinates"],
+            legs=legs,
+            waypoints=self.OSRM_RESPONSE["waypoints"]
+        )
+
+        self.assertEqual([len(part) for part in split], [3, 3])
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.get_multi_leg_route_data', return_value=None)
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.geocode_location', return_value=None)
+    def test_failed_request_uses_fallback_distances(self, mock_geocode, mock_route):
+        result = utils.calculate_route_with_hos("A", "B", "C", 0)
+
+        self.assertEqual(mock_route.call_count, 1)
+        self.assertEqual(result['route_summary']['total_distance'], 1200.0)
+
+
+class LocalMapProviderTests(TestCase):
+    def setUp(self):
+        self.provider = providers.load_provider("local")
+
+    def test_gazetteer_lookup_accepts_state_names(self):
+        self.assertEqual(self.provider.geocode("Dallas, TX")["lat"], 32.7767)
+        self.assertEqual(self.provider.geocode("dallas, texas")["lon"], -96.797)
+        self.assertEqual(self.provider.geocode("Phoenix")["display_name"], "Phoenix, AZ")
+        self.assertIsNone(self.provider.geocode("Atlantis"))
+
+    def test_route_applies_road_factor(self):
+        start, end = (33.4484, -112.0740), (32.7767, -96.7970)
+        leg, = self.provider.route([start, end])
+
+        crow_flies = geometry.haversine_miles(*start, *end)
+        self.assertAlmostEqual(leg["distance_miles"], crow_flies * 1.2)
+        self.assertAlmostEqual(leg["duration_hours"], leg["distance_miles"] / 55)
+        self.assertEqual(leg["geometry"]["coordinates"][0], [start[1], start[0]])
+        self.assertEqual(leg["geometry"]["coordinates"][-1], [end[1], end[0]])
+
+    @override_settings(MAP_PROVIDER='local')
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_local_provider_plans_without_network(self, mock_get):
+        result = utils.calculate_route_with_hos("Los Angeles, CA", "Phoenix, AZ", "Dallas, TX", 0)
+
+        mock_get.assert_not_called()
+        self.assertEqual(len(result['route_summary']['route_geometry']['features']), 2)
+        self.assertGreater(result['route_summary']['total_distance'], 1000)
+
+    @override_settings(MAP_PROVIDER_FALLBACK='local')
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_falls_back_to_local_provider_uncached(self, mock_get):
+        get_geocode_cache().clear()
+        mock_get.side_effect = ConnectionError("timeout")
+
+        self.assertEqual(utils.geocode_location("Dallas, TX")["lat"], 32.7767)
+        self.assertEqual(get_geocode_cache().stats['local_size'], 0)
+
+    def test_partial_provider_fails_to_load(self):
+        class GeocodeOnlyProvider(providers.MapProvider):
+            def geocode(self, location_name):
+                return None
+
+        with patch.dict(providers.PROVIDERS, {'geocode-only': GeocodeOnlyProvider}):
+            with self.assertRaises(TypeError):
+                providers.load_provider('geocode-only')
+
+
+class TripCalculationJobTests(TestCase):
+    PAYLOAD = {
+        "current_location": "Los Angeles, CA",
+        "pickup_location": "Phoenix, AZ",
+        "dropoff_location": "Dallas, TX",
+        "current_cycle_used": 10.0
+    }
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_calculate_async_enqueues_job(self):
+        response = self.client.post(reverse('trip-calculate-async'), self.PAYLOAD, format='json')
+
+        self.assertEqual(response.status_code, 202)
+        job = TripCalculationJob.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, TripCalculationJob.Status.PENDING)
+        self.assertEqual(job.payload['current_cycle_used'], "10.00")
+        self.assertTrue(response['Location'].endswith(f"/trip-jobs/{job.id}/"))
+        self.assertEqual(Trip.objects.count(), 0)
+
+    def test_calculate_async_validates_input(self):
+        response = self.client.post(reverse('trip-calculate-async'), {"current_location": "X"}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(TripCalculationJob.objects.exists())
+
+    @override_settings(MAP_PROVIDER='local')
+    def test_worker_runs_job_and_status_returns_trip(self):
+        response = self.client.post(reverse('trip-calculate-async'), self.PAYLOAD, format='json')
+        job_url = response['Location']
+
+        self.assertEqual(jobs.run_pending_jobs(), 1)
+
+        status_response = self.client.get(job_url)
+        self.assertEqual(status_response.data['status'], TripCalculationJob.Status.SUCCEEDED)
+        self.assertEqual(status_response.data['attempts'], 1)
+        self.assertEqual(status_response.data['trip']['pickup_location'], "Phoenix, AZ")
+        self.assertTrue(status_response.data['trip']['log_entries'])
+
+    def test_failed_jobs_record_error(self):
+        job = TripCalculationJob.objects.create(payload={"current_location": "X"})
+
+        jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, TripCalculationJob.Status.FAILED)
+        self.assertIn("pickup_location", job.error)
+
+    @override_settings(MAP_PROVIDER='local')
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.calculate_route_with_hos')
+    def test_failed_jobs_hide_internal_errors(self, mock_calculate):
+        mock_calculate.side_effect = RuntimeError("secret /srv/app/utils.py detail")
+        job = TripCalculationJob.objects.create(payload=self.PAYLOAD)
+
+        with self.assertLogs('driver_hos_logbook.apps.driver_hos_logbook.jobs', level='ERROR') as logs:
+            jobs.run_pending_jobs()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, TripCalculationJob.Status.FAILED)
+        self.assertEqual(job.error, "Trip calculation failed")
+        self.assertIn("secret", logs.output[0])
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = TripCalculationJob.objects.create(
+            payload=self.PAYLOAD,
+            status=TripCalculationJob.Status.RUNNING,
+            started_at=timezone.now() - timezone.timedelta(hours=1),
+            attempts=1
+        )
+
+        requeued, failed = jobs.requeue_stale_jobs(older_than=timezone.timedelta(minutes=10), max_attempts=3)
+
+        job.refresh_from_db()
+        self.assertEqual((requeued, failed), (1, 0))
+        self.assertEqual(job.status, TripCalculationJob.Status.PENDING)
+
+
+@override_settings(MAP_PROVIDER='local')
+class TripBatchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def _trip(self, current="Los Angeles, CA", pickup="Phoenix, AZ", dropoff="Dallas, TX", cycle=10):
+        return {
+            "current_location": current,
+            "pickup_location": pickup,
+            "dropoff_location": dropoff,
+            "current_cycle_used": cycle
+        }
+
+    def test_batch_creates_all_trips(self):
+        payload = {"trips": [self._trip(), self._trip(pickup="Tucson, AZ"), self._trip(dropoff="Houston, TX")]}
+
+        with self.assertNumQueries(6):  # savepoint + 4 bulk inserts + release
+            response = self.client.post(reverse('trip-calculate-batch'), payload, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(Trip.objects.count(), 3)
+        created = Trip.objects.get(pk=response.data['results'][1]['id'])
+        self.assertEqual(created.pickup_location, "Tucson, AZ")
+        self.assertTrue(created.log_entries.exists())
+        self.assertTrue(created.stops.exists())
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.utils.geocode_location', wraps=utils.geocode_location)
+    def test_locations_are_geocoded_once_per_batch(self, mock_geocode):
+        payload = {"trips": [self._trip() for _ in range(5)]}
+
+        self.client.post(reverse('trip-calculate-batch'), payload, format='json')
+
+        # Every call counts, not only the up-front ones
+        looked_up = [
+            call.kwargs['location_name'] if 'location_name' in call.kwargs else call.args[0]
+            for call in mock_geocode.call_args_list
+        ]
+        self.assertCountEqual(looked_up, ["Los Angeles, CA", "Phoenix, AZ", "Dallas, TX"])
+
+    def test_driver_trips_follow_each_other(self):
+        driver = Driver.objects.create(name="Pat Doe")
+        payload = {"trips": [
+            {**self._trip(), "driver": str(driver.pk)},
+            {**self._trip(current="Dallas, TX", pickup="Houston, TX", dropoff="Atlanta, GA"), "driver": str(driver.pk)}
+        ]}
+
+        response = self.client.post(reverse('trip-calculate-batch'), payload, format='json')
+
+        first, second = (Trip.objects.get(pk=item['id']) for item in response.data['results'])
+        first_end = first.log_entries.order_by('end_time').last().end_time
+        self.assertEqual(second.log_entries.order_by('start_time').first().start_time, first_end)
+        state = DriverHOSState.objects.get(driver=driver)
+        self.assertEqual(state.as_of, second.log_entries.order_by('end_time').last().end_time)
+        # Both trips' hours are in the driver's duty days
+        self.assertAlmostEqual(
+            sum(DriverDutyDay.objects.filter(driver=driver).values_list('on_duty_hours', flat=True)),
+            sum(log.total_driving + log.total_on_duty for log in DailyLog.objects.filter(trip__driver=driver)),
+            places=2
+        )
+
+    def test_reports_errors_per_item(self):
+        payload = {"trips": [self._trip(), self._trip(cycle=99), {"pickup_location": "Phoenix, AZ"}]}
+
+        response = self.client.post(reverse('trip-calculate-batch'), payload, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        statuses = [item['status'] for item in response.data['results']]
+        self.assertEqual(statuses, ['created', 'invalid', 'invalid'])
+        self.assertIn('current_cycle_used', response.data['results'][1]['errors'])
+        self.assertEqual(Trip.objects.count(), 1)
+
+    def test_rejects_empty_batch(self):
+        response = self.client.post(reverse('trip-calculate-batch'), {"trips": []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyLogSheetTests(TestCase):
+    def entries(self):
+        def at(day, hour):
+            return timezone.make_aware(timezone.datetime(2024, 1, day, hour))
+        return [
+            {'duty_status': DutyStatus.ON_DUTY_NOT_DRIVING, 'start_time': at(1, 20), 'end_time': at(1, 21), 'location': "A", 'notes': None},
+            {'duty_status': DutyStatus.DRIVING, 'start_time': at(1, 21), 'end_time': at(2, 3), 'location': "A", 'notes': None},
+            {'duty_status': DutyStatus.OFF_DUTY, 'start_time': at(2, 3), 'end_time': at(2, 13), 'location': "B", 'notes': None},
+            {'duty_status': DutyStatus.DRIVING, 'start_time': at(2, 13), 'end_time': at(2, 15), 'location': "B", 'notes': None},
+        ]
+
+    def test_sheets_split_at_midnight_and_share_mileage_by_driving_time(self):
+        first, second = utils.generate_daily_log_sheets(self.entries(), 400)
+
+        self.assertEqual((first['total_on_duty'], first['total_driving'], first['total_mileage_today']), (1.0, 3.0, 150.0))
+        self.assertEqual((second['total_off_duty'], second['total_driving'], second['total_mileage_today']), (10.0, 5.0, 250.0))
+        self.assertEqual([e['duration_hours'] for e in first['log_entries']], [1.0, 3.0])
+        self.assertEqual(second['log_entries'][0]['start_time'].hour, 0)
+        self.assertEqual(second['remarks'], "Day 2 of trip")
+        # The rolling recap includes the first day's 4 hours
+        self.assertEqual(second['recap']['total_last_8_days'], 9.0)
+        self.assertEqual(second['recap']['available_tomorrow'], 61.0)
+
+    def test_sheets_stream_lazily(self):
+        consumed = []
+
+        def entries():
+            for entry in self.entries():
+                consumed.append(entry)
+                yield entry
+
+        sheets = utils.iter_daily_log_sheets(entries(), 400, total_driving_hours=8)
+        first = next(sheets)
+
+        self.assertEqual(first['total_mileage_today'], 150.0)
+        self.assertEqual(len(consumed), 2)
+        self.assertEqual(len(list(sheets)), 1)
+
+
+class DriverRecapTests(TestCase):
+    def test_recap_covers_eight_days_and_stops_at_restart(self):
+        today = timezone.now().date()
+        duty_days = {today - timezone.timedelta(days=offset): (10.0, False) for offset in range(10)}
+
+        self.assertEqual(recap.daily_recap(today, duty_days), {
+            'on_duty_today': 10.0,
+            'total_last_7_days': 70.0,
+            'total_last_8_days': 80.0,
+            'available_tomorrow': 0.0
+        })
+
+        duty_days[today - timezone.timedelta(days=2)] = (4.0, True)
+        self.assertEqual(recap.daily_recap(today, duty_days)['total_last_8_days'], 24.0)
+        self.assertEqual(recap.daily_recap(today, duty_days)['available_tomorrow'], 46.0)
+
+    @override_settings(MAP_PROVIDER='local')
+    def test_trips_accumulate_per_driver_duty_days(self):
+        driver = Driver.objects.create(name="Pat Doe")
+        other = Driver.objects.create(name="Sam Roe")
+        client = APIClient()
+
+        def calculate(driver):
+            response = client.post(reverse('trip-calculate'), {
+                "current_location": "Los Angeles, CA",
+                "pickup_location": "Phoenix, AZ",
+                "dropoff_location": "Dallas, TX",
+                "current_cycle_used": 0,
+                "driver": str(driver.pk)
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+            return response.data['daily_logs']
+
+        first = calculate(driver)
+        calculate(other)
+        second = calculate(driver)
+
+        # The second trip resumes on the day the first one ended and counts its hours
+        last_day = first[-1]
+        last_day_hours = last_day['total_driving'] + last_day['total_on_duty']
+        second_day_hours = second[0]['total_driving'] + second[0]['total_on_duty']
+        self.assertEqual(second[0]['date'], last_day['date'])
+        self.assertEqual(last_day['recap']['on_duty_today'], round(last_day_hours, 2))
+        self.assertAlmostEqual(second[0]['recap']['on_duty_today'], last_day_hours + second_day_hours, places=1)
+        self.assertLess(second[-1]['recap']['available_tomorrow'], first[-1]['recap']['available_tomorrow'])
+
+        rows = DriverDutyDay.objects.filter(driver=driver)
+        self.assertEqual(rows.count(), len(first) + len(second) - 1)
+        self.assertAlmostEqual(rows.get(date=last_day['date']).on_duty_hours, last_day_hours + second_day_hours, places=2)
+        self.assertEqual(Trip.objects.filter(driver=driver).count(), 2)
+
+    @override_settings(MAP_PROVIDER='local')
+    def test_history_is_read_back_from_the_departure_date(self):
+        driver = Driver.objects.create(name="Pat Doe")
+        chicago = ZoneInfo('America/Chicago')
+        departure = timezone.localtime(timezone=chicago).replace(hour=8, minute=0, second=0, microsecond=0) - timedelta(days=5)
+        # Within the departure's 8-day recap, but more than 8 days before today
+        DriverDutyDay.objects.create(driver=driver, date=departure.date() - timedelta(days=6), on_duty_hours=10.0)
+
+        response = APIClient().post(reverse('trip-calculate'), {
+            "current_location": "Los Angeles, CA",
+            "pickup_location": "Phoenix, AZ",
+            "dropoff_location": "Dallas, TX",
+            "current_cycle_used": 0,
+            "driver": str(driver.pk),
+            "departure_time": departure.isoformat(),
+            "home_terminal_timezone": "America/Chicago"
+        }, format='json')
+
+        first = response.data['daily_logs'][0]
+        self.assertEqual(parse_date(first['date']), departure.date())
+        self.assertAlmostEqual(first['recap']['total_last_8_days'], 10.0 + first['total_driving'] + first['total_on_duty'], places=1)
+
+    @override_settings(TIME_ZONE='America/Chicago')
+    def test_default_start_is_eight_utc_without_home_timezone(self):
+        start = utils.default_start_time()
+        self.assertEqual(start.utcoffset(), timedelta(0))
+        self.assertEqual((start.date(), start.hour, start.minute), (timezone.now().date(), 8, 0))
+
+        chicago = utils.default_start_time(ZoneInfo('America/Chicago'))
+        self.assertEqual(chicago.tzinfo, ZoneInfo('America/Chicago'))
+        self.assertEqual(chicago.hour, 8)
+
+    @override_settings(MAP_PROVIDER='local')
+    def test_deleting_trips_releases_their_duty_hours(self):
+        driver = Driver.objects.create(name="Pat Doe")
+        client = APIClient()
+        trip_ids = []
+        for _ in range(2):
+            response = client.post(reverse('trip-calculate'), {
+                "current_location": "Los Angeles, CA",
+                "pickup_location": "Phoenix, AZ",
+                "dropoff_location": "Dallas, TX",
+                "current_cycle_used": 0,
+                "driver": str(driver.pk)
+            }, format='json')
+            trip_ids.append(response.data['id'])
+
+        response = client.delete(reverse('trip-detail', kwargs={'pk': trip_ids[0]}))
+        self.assertEqual(response.status_code, 204)
+
+        remaining = {}
+        for log in DailyLog.objects.filter(trip_id=trip_ids[1]):
+            remaining[log.log_date] = remaining.get(log.log_date, 0.0) + log.total_driving + log.total_on_duty
+        rows = dict(DriverDutyDay.objects.filter(driver=driver).values_list('date', 'on_duty_hours'))
+        self.assertEqual(set(rows), set(remaining))
+        for date, hours in remaining.items():
+            self.assertAlmostEqual(rows[date], hours, places=6)
+
+        Trip.objects.get(pk=trip_ids[1]).delete()
+        self.assertFalse(DriverDutyDay.objects.filter(driver=driver).exists())
+
+
+@override_settings(MAP_PROVIDER='local')
+class DriverHOSStateTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.driver = Driver.objects.create(name="Pat Doe")
+
+    def calculate(self, **extra):
+        return self.client.post(reverse('trip-calculate'), {
+            "current_location": "Los Angeles, CA",
+            "pickup_location": "Phoenix, AZ",
+            "dropoff_location": "Dallas, TX",
+            **extra
+        }, format='json')
+
+    def test_trip_save_updates_snapshot_and_seeds_next_plan(self):
+        first = self.calculate(driver=str(self.driver.pk), current_cycle_used=20)
+        state = DriverHOSState.objects.get(driver=self.driver)
+        first_end = max(parse_datetime(entry['end_time']) for entry in first.data['log_entries'])
+
+        self.assertGreater(state.cycle_hours, 20)
+        self.assertEqual(state.as_of, first_end)
+
+        # No cycle hours given: they come from the snapshot, with no log history read
+        with CaptureQueriesContext(connection) as queries:
+            second = self.calculate(driver=str(self.driver.pk))
+        self.assertEqual(second.status_code, 201)
+        log_reads = [q for q in queries if q['sql'].startswith('SELECT') and 'driver_hos_logbook_logentry' in q['sql']]
+        self.assertEqual(len(log_reads), 1)  # Rendering the new trip's own entries
+        self.assertEqual(float(second.data['current_cycle_used']), round(state.cycle_hours, 2))
+        self.assertEqual(parse_datetime(second.data['log_entries'][0]['start_time']), first_end)
+
+    def test_cycle_hours_required_without_driver(self):
+        response = self.calculate()
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('current_cycle_used', response.data)
+
+    def test_resume_counts_the_gap_as_off_duty(self):
+        as_of = timezone.now()
+        snapshot = {
+            'as_of': as_of,
+            'cycle_hours': 60.0,
+            'driving_since_rest': 9.0,
+            'duty_since_rest': 12.0,
+            'driving_since_break': 5.0,
+            'miles_since_fuel': 300.0
+        }
+
+        soon = hos.HOSSimulator.resume(snapshot, start_time=as_of - timezone.timedelta(hours=1))
+        self.assertEqual(soon.start_time, as_of)
+        self.assertEqual((soon.driving_since_rest, soon.driving_since_break), (9.0, 5.0))
+
+        rested = hos.HOSSimulator.resume(snapshot, start_time=as_of + timezone.timedelta(hours=11))
+        self.assertEqual((rested.driving_since_rest, rested.duty_since_rest, rested.cycle_hours), (0, 0, 60.0))
+
+        restarted = hos.HOSSimulator.resume(snapshot, start_time=as_of + timezone.timedelta(hours=34), cycle_hours=5)
+        self.assertEqual(restarted.cycle_hours, 5.0)
+        self.assertEqual(restarted.miles_since_fuel, 300.0)
+        self.assertEqual(restarted.off_duty_before, 34.0)
+
+    def test_restart_between_trips_is_recorded(self):
+        self.calculate(driver=str(self.driver.pk), current_cycle_used=60)
+        state = DriverHOSState.objects.get(driver=self.driver)
+
+        second = self.calculate(
+            driver=str(self.driver.pk),
+            departure_time=(state.as_of + timezone.timedelta(hours=40)).isoformat()
+        )
+
+        self.assertEqual(float(second.data['current_cycle_used']), 0.0)
+        first_day = parse_date(second.data['daily_logs'][0]['date'])
+        self.assertTrue(DriverDutyDay.objects.get(driver=self.driver, date=first_day).cycle_restart)
+
+    def test_deleting_trips_rolls_the_snapshot_back(self):
+        first = self.calculate(driver=str(self.driver.pk), current_cycle_used=20)
+        first_state = DriverHOSState.objects.get(driver=self.driver).to_snapshot()
+        second = self.calculate(driver=str(self.driver.pk))
+        second_state = DriverHOSState.objects.get(driver=self.driver).to_snapshot()
+        self.assertGreater(second_state['as_of'], first_state['as_of'])
+
+        Trip.objects.get(pk=second.data['id']).delete()
+        self.assertEqual(DriverHOSState.objects.get(driver=self.driver).to_snapshot(), first_state)
+
+        # A trip that didn't write the snapshot leaves it alone
+        third = self.calculate(driver=str(self.driver.pk))
+        third_state = DriverHOSState.objects.get(driver=self.driver).to_snapshot()
+        Trip.objects.get(pk=first.data['id']).delete()
+        self.assertEqual(DriverHOSState.objects.get(driver=self.driver).to_snapshot(), third_state)
+
+        Trip.objects.get(pk=third.data['id']).delete()
+        self.assertFalse(DriverHOSState.objects.filter(driver=self.driver).exists())
+
+
+@override_settings(MAP_PROVIDER='local')
+class DailyLogPersistenceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        response = self.client.post(reverse('trip-calculate'), {
+            "current_location": "Los Angeles, CA",
+            "pickup_location": "Phoenix, AZ",
+            "dropoff_location": "Jacksonville, FL",
+            "current_cycle_used": 20
+        }, format='json')
+        self.trip = Trip.objects.get(pk=response.data['id'])
+
+    def test_sheets_are_materialized_on_create(self):
+        daily_logs = list(self.trip.daily_logs.all())
+
+        self.assertGreater(len(daily_logs), 1)
+        self.assertEqual(daily_logs[0].from_location, "Los Angeles, CA")
+        self.assertEqual(daily_logs[-1].to_location, "Jacksonville, FL")
+        self.assertEqual(daily_logs[0].remarks, "Day 1 of trip")
+        for log in daily_logs:
+            grid = log.total_off_duty + log.total_sleeper + log.total_driving + log.total_on_duty
+            self.assertLessEqual(grid, 24.01)
+
+    def test_detail_reads_stored_sheets(self):
+        url = reverse('trip-detail', kwargs={'pk': self.trip.pk})
+
+        with patch('driver_hos_logbook.apps.driver_hos_logbook.utils.generate_daily_log_sheets') as mock_generate:
+            sheets = self.client.get(url).data['daily_logs']
+
+        mock_generate.assert_not_called()
+        stored = list(self.trip.daily_logs.all())
+        self.assertEqual([sheet['date'] for sheet in sheets], [log.log_date.isoformat() for log in stored])
+        self.assertEqual(sheets[0]['log_entries'][0]['notes'], "Pre-trip inspection")
+        self.assertEqual(sheets[0]['recap'], stored[0].recap_data)
+
+    def test_trips_without_stored_sheets_are_recomputed(self):
+        self.trip.daily_logs.all().delete()
+
+        response = self.client.get(reverse('trip-detail', kwargs={'pk': self.trip.pk}))
+
+        self.assertTrue(response.data['daily_logs'])
+        self.assertEqual(response.data['daily_logs'][0]['remarks'], "Day 1 of trip")
+
+
+@override_settings(MAP_PROVIDER='local')
+class TripQueryCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        for dropoff in ("Dallas, TX", "Jacksonville, FL", "Seattle, WA"):
+            self.client.post(reverse('trip-calculate'), {
+                "current_location": "Los Angeles, CA",
+                "pickup_location": "Phoenix, AZ",
+                "dropoff_location": dropoff,
+                "current_cycle_used": 0
+            }, format='json')
+        self.trip = Trip.objects.get(dropoff_location="Jacksonville, FL")
+
+    def test_retrieve_prefetches_relations(self):
+        # trip + log entries + stops + daily logs
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('trip-detail', kwargs={'pk': self.trip.pk}))
+
+        self.assertTrue(response.data['log_entries'])
+        self.assertTrue(response.data['stops'])
+        self.assertTrue(response.data['daily_logs'])
+
+    def test_retrieve_legacy_trip_recomputes_from_prefetched_entries(self):
+        self.trip.daily_logs.all().delete()
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('trip-detail', kwargs={'pk': self.trip.pk}))
+
+        self.assertTrue(response.data['daily_logs'])
+
+    def test_list_is_one_query_without_geometry(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('trip-list'))
+
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('route_geometry', queries[0]['sql'])
+
+    def test_job_status_prefetches_trip_relations(self):
+        job = TripCalculationJob.objects.create(
+            payload={}, status=TripCalculationJob.Status.SUCCEEDED, trip=self.trip
+        )
+
+        # job + trip (joined), then log entries + stops + daily logs
+        with self.assertNumQueries(4):
+            self.client.get(reverse('trip-job-detail', kwargs={'pk': job.pk}))
+
+
+class TripHistoryPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        base = timezone.now()
+        self.trips = []
+        for i in range(5):
+            trip = Trip.objects.create(
+                current_location="Los Angeles, CA",
+                pickup_location="Phoenix, AZ" if i % 2 else "Tucson, AZ",
+                dropoff_location="Dallas, TX",
+                current_cycle_used=0
+            )
+            # Two trips share a timestamp to exercise the id tie-breaker
+            Trip.objects.filter(pk=trip.pk).update(created_at=base - timezone.timedelta(days=min(i, 3)))
+            self.trips.append(trip)
+
+    def _walk(self, url):
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_cursor_pages_cover_every_trip_once(self):
+        seen = self._walk(reverse('trip-list') + '?page_size=2')
+
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(len(set(seen)), 5)
+        self.assertNotIn('count', self.client.get(reverse('trip-list')).data)
+
+    def test_filters_by_date_range(self):
+        since = (timezone.now() - timezone.timedelta(days=1, hours=12)).isoformat()
+        response = self.client.get(reverse('trip-list'), {'created_after': since})
+
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_filters_by_location(self):
+        pickup = self.client.get(reverse('trip-list'), {'pickup_location': 'Tucson, AZ'})
+        anywhere = self.client.get(reverse('trip-list'), {'location': 'Phoenix, AZ'})
+
+        self.assertEqual(len(pickup.data['results']), 3)
+        self.assertEqual(len(anywhere.data['results']), 2)
+
+    def test_rejects_invalid_filters(self):
+        response = self.client.get(reverse('trip-list'), {'created_after': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class RouteGeometryTests(TestCase):
+    # Example from the polyline algorithm reference
+    COORDINATES = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+    ENCODED = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+    def test_polyline_round_trip(self):
+        self.assertEqual(geometry.encode_polyline(self.COORDINATES), self.ENCODED)
+        self.assertEqual(geometry.decode_polyline(self.ENCODED), self.COORDINATES)
+
+    def test_douglas_peucker_drops_collinear_points(self):
+        line = [[0.0, 0.0], [1.0, 0.001], [2.0, 0.0], [3.0, 1.0]]
+
+        self.assertEqual(geometry.simplify_coordinates(line, 0.01), [[0.0, 0.0], [2.0, 0.0], [3.0, 1.0]])
+        self.assertEqual(geometry.simplify_coordinates(line, 0), line)
+
+    @override_settings(MAP_PROVIDER='local')
+    def test_trip_stores_compact_geometry_and_simplifies_on_read(self):
+        client = APIClient()
+        response = client.post(reverse('trip-calculate'), {
+            "current_location": "Los Angeles, CA",
+            "pickup_location": "Phoenix, AZ",
+            "dropoff_location": "Dallas, TX",
+            "current_cycle_used": 0
+        }, format='json')
+        trip = Trip.objects.get(pk=response.data['id'])
+        url = reverse('trip-geometry', kwargs={'pk': trip.pk})
+
+        self.assertIsNone(trip.route_geometry)
+        self.assertEqual(trip.route_geometry_compact['format'], 'polyline')
+        self.assertNotIn('route_geometry', response.data)
+        self.assertTrue(response.data['route_geometry_url'].endswith(url))
+
+        def fetch(params=None):
+            response = client.get(url, params or {})
+            return json.loads(b''.join(response.streaming_content))
+
+        full = fetch()
+        coarse = fetch({'zoom': 3})
+        full_points = sum(len(f['geometry']['coordinates']) for f in full['features'])
+        coarse_points = sum(len(f['geometry']['coordinates']) for f in coarse['features'])
+        self.assertEqual([f['properties']['segment'] for f in full['features']], ['to_pickup', 'to_dropoff'])
+        self.assertLess(coarse_points, full_points)
+        self.assertEqual(fetch({'encoding': 'polyline'}), trip.route_geometry_compact)
+
+        self.assertEqual(client.get(url, {'tolerance': -1}).status_code, 400)
+        self.assertEqual(client.get(url, {'encoding': 'wkt'}).status_code, 400)
+
+    def test_geometry_endpoint_serves_legacy_trips_with_strong_etag(self):
+        trip = Trip.objects.create(
+            current_location="Los Angeles, CA",
+            pickup_location="Phoenix, AZ",
+            dropoff_location="Dallas, TX",
+            current_cycle_used=0,
+            route_geometry={"type": "FeatureCollection", "features": [{
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": self.COORDINATES},
+                "properties": {"segment": "to_pickup"}
+            }]}
+        )
+        client = APIClient()
+        url = reverse('trip-geometry', kwargs={'pk': trip.pk})
+
+        response = client.get(url)
+        etag = response['ETag']
+        body = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertFalse(etag.startswith('W/'))
+        self.assertEqual(body['features'][0]['geometry']['coordinates'], self.COORDINATES)
+
+        with self.assertNumQueries(1):
+            cached = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], etag)
+
+        self.assertNotEqual(client.get(url, {'zoom': 3})['ETag'], etag)
+
+
+def _add_hos_log_entry(
+    *, 
+    state, 
+    status, 
+    duration_hrs, 
+    location, 
+    notes=None
+):
+    """
+    Adds a log entry and updates HOS state.
+
+    The planner's original dict-based helper, kept here as the reference
+    implementation of ``HOSSimulator.log``.
+    """
+    start_time = state['current_time']
+    end_time = start_time + timedelta(hours=duration_hrs)
+    
+    state['log_entries'].append({
+        'duty_status': status,
+        'start_time': start_time,
+        'end_time': end_time,
+        'location': location,
+        'notes': notes
+    })
+    
+    if status == DutyStatus.DRIVING:
+        state['cumulative_driving_since_last_10hr_rest'] += duration_hrs
+        state['cumulative_driving_since_last_30min_break'] += duration_hrs
+        state['cumulative_duty_since_last_10hr_rest'] += duration_hrs
+        state['cumulative_cycle_hours'] += duration_hrs
+    elif status == DutyStatus.ON_DUTY_NOT_DRIVING:
+        state['cumulative_duty_since_last_10hr_rest'] += duration_hrs
+        state['cumulative_cycle_hours'] += duration_hrs
+    
+    if (status in [DutyStatus.OFF_DUTY, DutyStatus.SLEEPER_BERTH]) and duration_hrs >= 10:
+        state['cumulative_driving_since_last_10hr_rest'] = 0
+        state['cumulative_duty_since_last_10hr_rest'] = 0
+        state['cumulative_driving_since_last_30min_break'] = 0
+        if duration_hrs >= 34:
+            state['cumulative_cycle_hours'] = 0
+    
+    if (status in [DutyStatus.OFF_DUTY, DutyStatus.SLEEPER_BERTH, DutyStatus.ON_DUTY_NOT_DRIVING]) and duration_hrs >= 0.5:
+        state['cumulative_driving_since_last_30min_break'] = 0
+
+    state['current_time'] = end_time
+
+
+def _insert_hos_breaks(
+    *, 
+    state, 
+    needed_driving_hrs, 
+    location, 
+    stops
+):
+    """
+    Checks for HOS violations and inserts necessary breaks during driving.
+
+    The planner's original helper, kept here as the reference
+    implementation of ``HOSSimulator.drive``.
+    """
+    remaining_to_drive = needed_driving_hrs
+    avg_speed = 55 # Used for fuel estimation
+    
+    while remaining_to_drive > 0:
+        # Requirement: 70hrs/8days rule
+        if state['cumulative_cycle_hours'] >= 70:
+            stops.append({
+                'stop_type': RouteStop.StopType.REST,
+                'location': location,
+                'arrival_time': state['current_time'],
+                'duration_minutes': 34 * 60,
+                'description': '34-Hour Cycle Restart'
+            })
+            _add_hos_log_entry(
+                state=state, 
+                status=DutyStatus.OFF_DUTY, 
+                duration_hrs=34, 
+                location=location, 
+                notes="34-Hour Restart"
+            )
+            continue
+
+        avail_driving = 11.0 - state['cumulative_driving_since_last_10hr_rest']
+        avail_duty = 14.0 - state['cumulative_duty_since_last_10hr_rest']
+        avail_before_break = 8.0 - state['cumulative_driving_since_last_30min_break']
+        
+        can_drive = min(remaining_to_drive, avail_driving, avail_duty, avail_before_break)
+        
+        # Requirement: Fueling at least once every 1,000 miles
+        miles_to_fuel = 1000 - state['miles_since_last_fuel']
+        hours_to_fuel = miles_to_fuel / avg_speed
+        can_drive = min(can_drive, hours_to_fuel)
+
+        if can_drive > 0:
+            _add_hos_log_entry(
+                state=state, 
+                status=DutyStatus.DRIVING, 
+                duration_hrs=can_drive, 
+                location=location
+            )
+            remaining_to_drive -= can_drive
+            state['miles_since_last_fuel'] += (can_drive * avg_speed)
+        
+        if remaining_to_drive > 0:
+            if state['miles_since_last_fuel'] >= 1000:
+                stops.append({
+                    'stop_type': RouteStop.StopType.FUEL,
+                    'location': location,
+                    'arrival_time': state['current_time'],
+                    'duration_minutes': 15,
+                    'description': 'Fueling Stop'
+                })
+                _add_hos_log_entry(
+                    state=state, 
+                    status=DutyStatus.ON_DUTY_NOT_DRIVING, 
+                    duration_hrs=0.25, 
+                    location=location, 
+                    notes="Fueling"
+                )
+                state['miles_since_last_fuel'] = 0
+            elif state['cumulative_driving_since_last_30min_break'] >= 8:
+                stops.append({
+                    'stop_type': RouteStop.StopType.BREAK,
+                    'location': location,
+                    'arrival_time': state['current_time'],
+                    'duration_minutes': 30,
+                    'description': '30-Minute Rest Break'
+                })
+                _add_hos_log_entry(
+                    state=state, 
+                    status=DutyStatus.OFF_DUTY, 
+                    duration_hrs=0.5, 
+                    location=location, 
+                    notes="30-Min Break"
+                )
+            elif state['cumulative_driving_since_last_10hr_rest'] >= 11 or state['cumulative_duty_since_last_10hr_rest'] >= 14:
+                stops.append({
+                    'stop_type': RouteStop.StopType.REST,
+                    'location': location,
+                    'arrival_time': state['current_time'],
+                    'duration_minutes': 10 * 60,
+                    'description': '10-Hour Daily Rest'
+                })
+                _add_hos_log_entry(
+                    state=state, 
+                    status=DutyStatus.OFF_DUTY, 
+                    duration_hrs=10, 
+                    location=location, 
+                    notes="10-Hour Rest"
+                )
+
+
+class HOSSimulatorEquivalenceTests(TestCase):
+    STATUSES = [
+        DutyStatus.OFF_DUTY,
+        DutyStatus.SLEEPER_BERTH,
+        DutyStatus.DRIVING,
+        DutyStatus.ON_DUTY_NOT_DRIVING,
+    ]
+
+    def random_plan(self, rng):
+        """
+        A random mix of fixed entries and driving legs, biased towards the
+        durations at which the HOS rules change behaviour.
+        """
+        plan = []
+        for _ in range(rng.randint(1, 12)):
+            if rng.random() < 0.5:
+                plan.append(('drive', rng.choice([0.0, 0.25, 8.0, 11.0, rng.uniform(0, 60)]), None))
+            else:
+                duration = rng.choice([0.25, 0.5, 1.0, 10, 34, rng.uniform(0, 40)])
+                plan.append(('log', duration, rng.choice(self.STATUSES)))
+        return plan
+
+    def test_simulator_matches_reference_implementation(self):
+        rng = random.Random(20240601)
+        start_time = timezone.now().replace(hour=8, minute=0, second=0, microsecond=0)
+
+        for case in range(500):
+            cycle_hours = rng.choice([0, 69.75, 70, rng.uniform(0, 70)])
+            plan = self.random_plan(rng)
+
+            state = {
+                "current_time": start_time,
+                "cumulative_driving_since_last_10hr_rest": 0.0,
+                "cumulative_duty_since_last_10hr_rest": 0.0,
+                "cumulative_driving_since_last_30min_break": 0.0,
+                "cumulative_cycle_hours": float(cycle_hours),
+                "miles_since_last_fuel": 0.0,
+                "log_entries": [],
+            }
+            stops = []
+            simulator = hos.HOSSimulator(start_time=start_time, cycle_hours=cycle_hours)
+            for kind, hours, status in plan:
+                if kind == 'drive':
+                    _insert_hos_breaks(state=state, needed_driving_hrs=hours, location="Road", stops=stops)
+                    simulator.drive(hours, "Road")
+                else:
+                    _add_hos_log_entry(state=state, status=status, duration_hrs=hours, location="Yard", notes="Note")
+                    simulator.log(status, hours, "Yard", "Note")
+
+            with self.subTest(case=case, cycle_hours=cycle_hours, plan=plan):
+                self.assertEqual(simulator.log_entries(), state['log_entries'])
+                self.assertEqual(simulator.stops(), stops)
+                self.assertEqual(simulator.current_time, state['current_time'])
+                self.assertEqual(simulator.cycle_hours, state['cumulative_cycle_hours'])
+
+
+class MultiStopPlanningTests(TestCase):
+    def test_stop_order_respects_precedence_and_shortens_route(self):
+        # Start at 0 on a line; stops at 1..4. Dropoff at 1 needs the pickup at 4 first.
+        points = [0, 3, 1, 4, 2]
+        matrix = [[abs(a - b) for b in points] for a in points]
+
+        self.assertEqual(stop_order.plan_stop_order(matrix, precedence={}), [2, 4, 1, 3])
+        order = stop_order.plan_stop_order(matrix, precedence={2: {3}})
+        self.assertLess(order.index(3), order.index(2))
+        self.assertEqual(stop_order.route_cost(matrix, [0] + order), 4 + 3)
+
+    @override_settings(MAP_PROVIDER_FALLBACK=None)
+    def test_unroutable_pairs_are_estimated_from_settings(self):
+        start, end = (33.4484, -112.0740), (32.7767, -96.7970)
+        options = {"ROAD_FACTOR": 1.5, "AVERAGE_SPEED_MPH": 50}
+        with patch('driver_hos_logbook.apps.driver_hos_logbook.utils.get_map_provider') as mock_provider, \
+                self.settings(MAP_PROVIDER_OPTIONS=options):
+            mock_provider.return_value.table.side_effect = requests.ConnectionError("down")
+            table = utils.get_travel_time_matrix([start, end])
+
+        miles = geometry.haversine_miles(*start, *end) * 1.5
+        self.assertAlmostEqual(table["distances_miles"][0][1], miles)
+        self.assertAlmostEqual(table["durations_hours"][0][1], miles / 50)
+
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_osrm_table_is_converted_to_hours_and_miles(self, mock_get):
+        mock_get.return_value = MagicMock(json=MagicMock(return_value={
+            "code": "Ok",
+            "durations": [[0, 3600], [7200, None]],
+            "distances": [[0, 1609.344], [3218.688, None]]
+        }))
+        provider = providers.RemoteMapProvider(nominatim_url="http://geo", osrm_url="http://osrm/", user_agent="test")
+
+        table = provider.table([(34.0, -118.0), (33.4, -112.0)])
+
+        self.assertIn("/table/v1/driving/-118.0,34.0;-112.0,33.4", mock_get.call_args[0][0])
+        self.assertEqual(table["durations_hours"], [[0, 1.0], [2.0, None]])
+        self.assertAlmostEqual(table["distances_miles"][1][0], 2.0, places=4)
+
+    @override_settings(MAP_PROVIDER='local')
+    def test_calculate_multi_stop_orders_and_persists_stops(self):
+        stops = [
+            {"location": "Houston, TX", "stop_type": "DROPOFF", "shipment": "A"},
+            {"location": "Phoenix, AZ", "stop_type": "PICKUP", "shipment": "A"},
+            {"location": "El Paso, TX", "stop_type": "PICKUP", "shipment": "B"},
+            {"location": "Dallas, TX", "stop_type": "DROPOFF", "shipment": "B"},
+        ]
+        with patch.object(providers.LocalMapProvider, 'table', autospec=True, side_effect=providers.LocalMapProvider.table) as mock_table:
+            response = APIClient().post(reverse('trip-calculate-multi-stop'), {
+                "current_location": "Los Angeles, CA",
+                "current_cycle_used": 0,
+                "stops": stops
+            }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(mock_table.call_count, 1)
+        visited = [
+            stop['location'] for stop in response.data['stops']
+            if stop['stop_type'] in (RouteStop.StopType.PICKUP, RouteStop.StopType.DROPOFF)
+        ]
+        self.assertEqual(visited, ["Phoenix, AZ", "El Paso, TX", "Dallas, TX", "Houston, TX"])
+
+        trip = Trip.objects.get(pk=response.data['id'])
+        self.assertEqual((trip.pickup_location, trip.dropoff_location), ("Phoenix, AZ", "Houston, TX"))
+        segments = [segment['segment'] for segment in trip.route_geometry_compact['segments']]
+        self.assertEqual(segments, ["to_stop_1", "to_stop_2", "to_stop_3", "to_stop_4"])
+
+    @override_settings(MAP_PROVIDER='local')
+    def test_untagged_dropoff_follows_every_pickup(self):
+        response = APIClient().post(reverse('trip-calculate-multi-stop'), {
+            "current_location": "Los Angeles, CA",
+            "current_cycle_used": 0,
+            "stops": [
+                {"location": "Phoenix, AZ", "stop_type": "DROPOFF"},
+                {"location": "Dallas, TX", "stop_type": "PICKUP", "shipment": "A"},
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        visited = [
+            stop['location'] for stop in response.data['stops']
+            if stop['stop_type'] in (RouteStop.StopType.PICKUP, RouteStop.StopType.DROPOFF)
+        ]
+        self.assertEqual(visited, ["Dallas, TX", "Phoenix, AZ"])
+
+    @override_settings(MAP_PROVIDER='local')
+    def test_calculate_multi_stop_rejects_bad_stops(self):
+        client = APIClient()
+        url = reverse('trip-calculate-multi-stop')
+
+        orphan = client.post(url, {
+            "current_location": "Los Angeles, CA",
+            "current_cycle_used": 0,
+            "stops": [
+                {"location": "Phoenix, AZ", "stop_type": "PICKUP", "shipment": "A"},
+                {"location": "Dallas, TX", "stop_type": "DROPOFF", "shipment": "B"},
+            ]
+        }, format='json')
+        unknown = client.post(url, {
+            "current_location": "Los Angeles, CA",
+            "current_cycle_used": 0,
+            "stops": [
+                {"location": "Phoenix, AZ", "stop_type": "PICKUP"},
+                {"location": "Atlantis", "stop_type": "DROPOFF"},
+            ]
+        }, format='json')
+
+        self.assertEqual(orphan.status_code, 400)
+        self.assertEqual(unknown.status_code, 400)
+        self.assertIn("Atlantis", unknown.data['stops'][0])
+        self.assertEqual(Trip.objects.count(), 0)
+
+
+@override_settings(MAP_PROVIDER='local')
+class EnRouteStopPlacementTests(TestCase):
+    def test_grid_index_finds_nearest_place_within_radius(self):
+        index = places.GridIndex([
+            {"name": "A", "lat": 35.0, "lon": -100.0},
+            {"name": "B", "lat": 35.3, "lon": -100.0},
+            {"name": "C", "lat": 40.0, "lon": -90.0},
+        ], cell_degrees=0.25)
+
+        place, distance = index.nearest(35.2, -100.0, radius_miles=30)
+        self.assertEqual(place["name"], "B")
+        self.assertAlmostEqual(distance, geometry.haversine_miles(35.2, -100.0, 35.3, -100.0))
+        self.assertEqual(index.nearest(37.5, -95.0, radius_miles=30), (None, None))
+
+    def test_rest_and_fuel_stops_are_placed_along_route(self):
+        result = utils.calculate_route_with_hos("Los Angeles, CA", "Phoenix, AZ", "Jacksonville, FL", 0)
+
+        en_route = [
+            stop for stop in result['stops']
+            if stop['stop_type'] in (RouteStop.StopType.FUEL, RouteStop.StopType.BREAK, RouteStop.StopType.REST)
+        ]
+        self.assertTrue(any(stop['stop_type'] == RouteStop.StopType.FUEL for stop in en_route))
+        self.assertTrue(all('latitude' in stop and 'longitude' in stop for stop in en_route))
+        self.assertTrue(any(stop['location'].startswith("Near ") for stop in en_route))
+        # Labelled stops stay where the driver stops, not at the place they're named after
+        with open(settings.EN_ROUTE_PLACES['PATH']) as f:
+            place_coords = {(place['lat'], place['lon']) for place in json.load(f)}
+        self.assertFalse(any((stop['latitude'], stop['longitude']) in place_coords for stop in en_route))
+
+        # Stops are ordered west to east, between Phoenix and Jacksonville
+        longitudes = [stop['longitude'] for stop in en_route]
+        self.assertEqual(longitudes, sorted(longitudes))
+        self.assertTrue(-112.5 < longitudes[0] and longitudes[-1] < -81.0)
+
+        # Log entries taken at a labelled stop carry its label
+        locations = {entry['location'] for entry in result['log_entries']}
+        for stop in en_route:
+            self.assertIn(stop['location'], locations)
+
+
+class RouteIndexTests(TestCase):
+    def setUp(self):
+        # Two legs: 1 degree north in 2 hours (70 routed miles), then 1 degree east in 1 hour (50 miles)
+        self.index = route_index.RouteIndex([
+            ([[-100.0, 35.0], [-100.0, 35.5], [-100.0, 36.0]], 2.0, 70.0),
+            ([[-100.0, 36.0], [-99.0, 36.0]], 1.0, 50.0),
+        ])
+
+    def test_positions_are_interpolated_along_geometry(self):
+        first_leg = geometry.haversine_miles(35.0, -100.0, 36.0, -100.0)
+        self.assertAlmostEqual(self.index.length, first_leg + geometry.haversine_miles(36.0, -100.0, 36.0, -99.0))
+
+        lat, lon = self.index.position_at(first_leg * 0.25)
+        self.assertAlmostEqual(lat, 35.25)
+        self.assertEqual(self.index.position_at(self.index.length + 10), (36.0, -99.0))
+        lats, lons = self.index.positions_at([0, first_leg])
+        self.assertEqual((list(lats), list(lons)), ([35.0, 36.0], [-100.0, -100.0]))
+
+    def test_driving_hours_map_onto_each_leg(self):
+        self.assertAlmostEqual(self.index.position_at_hours(1.0)[0], 35.5)
+        lat, lon = self.index.position_at_hours(2.5)
+        self.assertAlmostEqual(lon, -99.5, places=2)
+        self.assertAlmostEqual(float(self.index.miles_at_hours(1.0)), 35.0)
+        self.assertAlmostEqual(float(self.index.miles_at_hours(2.5)), 95.0)
+        self.assertAlmostEqual(float(self.index.miles_at_hours(10)), 120.0)
+
+    def test_segment_durations_place_the_truck_within_a_leg(self):
+        # The first half of the leg is slow: 1.5 of its 2 hours
+        index = route_index.RouteIndex([([[-100.0, 35.0], [-100.0, 35.5], [-100.0, 36.0]], 2.0, 70.0, [1.5, 0.5])])
+
+        self.assertAlmostEqual(index.position_at_hours(1.5)[0], 35.5)
+        self.assertAlmostEqual(float(index.miles_at_hours(1.5)), 35.0)
+        self.assertAlmostEqual(float(index.miles_at_hours(0.75)), 17.5)
+        self.assertAlmostEqual(float(index.miles_at_hours(1.75)), 52.5)
+
+    def test_daily_mileage_follows_route_legs(self):
+        start = timezone.make_aware(timezone.datetime(2024, 1, 1, 22, 0))
+        entries = [{
+            'duty_status': DutyStatus.DRIVING,
+            'start_time': start,
+            'end_time': start + timezone.timedelta(hours=3),
+            'location': "En route",
+            'notes': None
+        }]
+
+        sheets = utils.generate_daily_log_sheets(entries, 120, route_index=self.index)
+
+        # Two hours before midnight cover the whole first leg; the hour after is the second leg
+        self.assertEqual([sheet['total_mileage_today'] for sheet in sheets], [70.0, 50.0])
+        heuristic = utils.generate_daily_log_sheets(entries, 120)
+        self.assertEqual([sheet['total_mileage_today'] for sheet in heuristic], [80.0, 40.0])
+
+
+@override_settings(MAP_PROVIDER='local', TRIP_SCENARIO_WORKERS=2)
+class TripScenarioTests(TestCase):
+    def test_scenarios_route_once_and_match_full_planning(self):
+        start = utils.default_start_time()
+        tomorrow = start + timezone.timedelta(days=1)
+        with patch.object(providers.LocalMapProvider, 'route', autospec=True, side_effect=providers.LocalMapProvider.route) as mock_route:
+            response = APIClient().post(reverse('trip-scenarios'), {
+                "current_location": "Los Angeles, CA",
+                "pickup_location": "Phoenix, AZ",
+                "dropoff_location": "Chicago, IL",
+                "start_times": [start.isoformat(), tomorrow.isoformat()],
+                "cycle_values": [0, 30, 65]
+            }, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_route.call_count, 1)
+        self.assertEqual(Trip.objects.count(), 0)
+        rows = response.data['scenarios']
+        self.assertEqual(
+            [(parse_datetime(row['start_time']), float(row['current_cycle_used'])) for row in rows],
+            [(start, 0.0), (start, 30.0), (start, 65.0), (tomorrow, 0.0), (tomorrow, 30.0), (tomorrow, 65.0)]
+        )
+        # A nearly spent cycle forces a 34-hour restart
+        self.assertGreaterEqual(
+            parse_datetime(rows[2]['arrival_time']) - parse_datetime(rows[0]['arrival_time']),
+            timezone.timedelta(hours=24)
+        )
+
+        full = utils.calculate_route_with_hos("Los Angeles, CA", "Phoenix, AZ", "Chicago, IL", 30)
+        row = rows[1]
+        self.assertEqual(parse_datetime(row['arrival_time']), full['stops'][-1]['arrival_time'])
+        self.assertEqual(parse_datetime(row['end_time']), full['route_summary']['end_time'])
+        self.assertEqual(row['rest_stops'], sum(stop['stop_type'] == RouteStop.StopType.REST for stop in full['stops']))
+        self.assertAlmostEqual(row['on_duty_hours'], sum(
+            log['total_driving'] + log['total_on_duty'] for log in full['daily_logs']
+        ), places=1)
+        self.assertEqual(
+            parse_datetime(rows[4]['arrival_time']) - parse_datetime(row['arrival_time']),
+            timezone.timedelta(days=1)
+        )
+
+    @override_settings(TRIP_SCENARIO_MAX_VARIANTS=4)
+    def test_scenario_grid_is_limited(self):
+        response = APIClient().post(reverse('trip-scenarios'), {
+            "current_location": "Los Angeles, CA",
+            "pickup_location": "Phoenix, AZ",
+            "dropoff_location": "Chicago, IL",
+            "cycle_values": [0, 10, 20, 30, 40]
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MAP_PROVIDER='local')
+class TripDepartureTimezoneTests(TestCase):
+    def test_days_split_at_home_terminal_midnight(self):
+        start = parse_datetime('2024-01-01T14:00:00+00:00')
+        entries = [{
+            'duty_status': DutyStatus.DRIVING,
+            'start_time': start,
+            'end_time': start + timezone.timedelta(hours=2),
+            'location': "En route",
+            'notes': None
+        }]
+
+        sheets = utils.generate_daily_log_sheets(entries, 100, tz=ZoneInfo('Asia/Tokyo'))
+
+        # 23:00-01:00 in Tokyo
+        self.assertEqual([sheet['date'].isoformat() for sheet in sheets], ['2024-01-01', '2024-01-02'])
+        self.assertEqual([sheet['total_driving'] for sheet in sheets], [1.0, 1.0])
+        self.assertEqual(sheets[1]['log_entries'][0]['start_time'].isoformat(), '2024-01-02T00:00:00+09:00')
+
+    def test_calculate_uses_departure_time_and_home_terminal_timezone(self):
+        response = APIClient().post(reverse('trip-calculate'), {
+            "current_location": "Los Angeles, CA",
+            "pickup_location": "Phoenix, AZ",
+            "dropoff_location": "Jacksonville, FL",
+            "current_cycle_used": 0,
+            "departure_time": "2024-03-09T18:00:00-05:00",
+            "home_terminal_timezone": "America/New_York"
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        trip = Trip.objects.get(pk=response.data['id'])
+        self.assertEqual(trip.departure_time, parse_datetime('2024-03-09T23:00:00+00:00'))
+        self.assertEqual(trip.home_terminal_timezone, "America/New_York")
+        self.assertEqual(response.data['log_entries'][0]['start_time'], '2024-03-09T17:00:00-06:00')
+
+        sheets = response.data['daily_logs']
+        self.assertEqual(sheets[0]['date'], '2024-03-09')
+        self.assertEqual(sheets[1]['log_entries'][0]['start_time'], '2024-03-10T00:00:00-05:00')
+        # Clocks spring forward on March 10th, so that day is 23 hours long
+        day_hours = [
+            sheet['total_off_duty'] + sheet['total_sleeper'] + sheet['total_driving'] + sheet['total_on_duty']
+            for sheet in sheets
+        ]
+        self.assertEqual(day_hours[1:3], [23.0, 24.0])
+
+    def test_unknown_timezone_is_rejected(self):
+        response = APIClient().post(reverse('trip-calculate'), {
+            "current_location": "Los Angeles, CA",
+            "pickup_location": "Phoenix, AZ",
+            "dropoff_location": "Jacksonville, FL",
+            "current_cycle_used": 0,
+            "home_terminal_timezone": "Mars/Olympus_Mons"
+        }, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('home_terminal_timezone', response.data)
+
+
+class BenchmarkSuiteTests(TestCase):
+    def test_run_reports_stats_and_rolls_back_writes(self):
+        results = benchmarks.run(
+            ['hos.simulator_drive[1d]', 'persistence.trip_input_create'],
+            min_time=0, min_repeat=2, max_repeat=2
+        )
+
+        self.assertEqual(set(results), {'hos.simulator_drive[1d]', 'persistence.trip_input_create'})
+        stats = results['persistence.trip_input_create']
+        self.assertEqual(stats['repeat'], 2)
+        self.assertLessEqual(stats['min'], stats['median'])
+        self.assertLessEqual(stats['median'], stats['p99'])
+        self.assertEqual(Trip.objects.count(), 0)
+
+    def test_batched_samples_report_no_tail_percentiles(self):
+        single = benchmarks.summarize([1_000_000, 3_000_000])
+        batched = benchmarks.summarize([1_000_000, 3_000_000], number=10)
+
+        self.assertEqual((single['median'], single['p99']), (2.0, 3.0))
+        self.assertEqual((batched['median'], batched['p95'], batched['p99']), (2.0, None, None))
+        baseline = {'benchmarks': {'hos.simulator_drive[1d]': {'median': 1.0, 'p99': 1.0}}}
+        self.assertEqual(
+            [row['metric'] for row in benchmarks.compare({'hos.simulator_drive[1d]': batched}, baseline)],
+            ['median']
+        )
+
+    def test_regressions_fail_the_command(self):
+        baseline = {'benchmarks': {'hos.simulator_drive[1d]': {'median': 1e-9, 'p99': 1e6}}}
+        self.assertEqual(
+            [(row['metric'], row['regressed']) for row in benchmarks.compare(
+                {'hos.simulator_drive[1d]': {'median': 1.0, 'p99': 1.0}}, baseline
+            )],
+            [('median', True), ('p99', False)]
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = f"{directory}/baseline.json"
+            with open(path, 'w') as f:
+                json.dump(baseline, f)
+            with self.assertRaises(CommandError):
+                call_command(
+                    'run_benchmarks', '-k', 'simulator_drive[1d]', '--min-time', '0', '--baseline', path,
+                    stdout=io.StringIO(), stderr=io.StringIO()
+                )
+
+            missing = f"{directory}/missing.json"
+            with self.assertRaises(CommandError):
+                call_command(
+                    'run_benchmarks', '-k', 'simulator_drive[1d]', '--min-time', '0', '--baseline', missing,
+                    stdout=io.StringIO(), stderr=io.StringIO()
+                )
+            stderr = io.StringIO()
+            call_command(
+                'run_benchmarks', '-k', 'simulator_drive[1d]', '--min-time', '0', '--baseline', missing,
+                '--allow-missing-baseline', stdout=io.StringIO(), stderr=stderr
+            )
+            self.assertIn('No baseline', stderr.getvalue())
+
+
+class LoadTestHarnessTests(TestCase):
+    def setUp(self):
+        self.stub = loadtest.MapStubServer(seed=0).start()
+        self.addCleanup(self.stub.stop)
+        self.provider = providers.RemoteMapProvider(
+            nominatim_url=self.stub.url + "/search", osrm_url=self.stub.url, user_agent="tests"
+        )
+
+    def test_stub_server_speaks_nominatim_and_osrm(self):
+        phoenix = self.provider.geocode("Phoenix, AZ")
+        dallas = self.provider.geocode("Dallas, TX")
+        los_angeles = self.provider.geocode("Los Angeles, CA")
+        self.assertEqual(phoenix, self.stub.provider.geocode("Phoenix, AZ"))
+        self.assertIsNone(self.provider.geocode("Nowhere, ZZ"))
+
+        coords_list = [(place["lat"], place["lon"]) for place in (los_angeles, phoenix, dallas)]
+        legs = self.provider.route(coords_list)
+        expected = self.stub.provider.route(coords_list)
+        self.assertEqual(len(legs), 2)
+        for leg, local in zip(legs, expected):
+            self.assertAlmostEqual(leg["distance_miles"], local["distance_miles"], places=6)
+            self.assertAlmostEqual(leg["duration_hours"], local["duration_hours"], places=6)
+            self.assertEqual(leg["geometry"]["coordinates"], local["geometry"]["coordinates"])
+
+        table = self.provider.table(coords_list[:2])
+        self.assertAlmostEqual(table["distances_miles"][0][1], expected[0]["distance_miles"], places=6)
+
+    def test_stub_server_injects_failures(self):
+        self.stub.error_rate = 1.0
+        with self.assertRaises(requests.RequestException):
+            self.provider.geocode("Phoenix, AZ")
+        self.assertEqual(self.stub.respond("/search?q=Phoenix")[0], 503)
+
+    @override_settings(QUERY_COUNT_HEADER=True)
+    def test_query_count_header(self):
+        client = APIClient()
+        response = client.get(reverse('trip-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response[loadtest.QUERY_COUNT_HEADER]), 0)
+
+        with override_settings(QUERY_COUNT_HEADER=False):
+            self.assertNotIn(loadtest.QUERY_COUNT_HEADER, APIClient().get(reverse('trip-list')))
+
+    def test_load_test_caches_are_isolated(self):
+        self.addCleanup(reset_caches)
+        for enabled in (False, True):
+            with self.subTest(enabled=enabled), override_settings(**loadtest.map_cache_overrides(enabled=enabled)):
+                reset_caches()
+                route_cache = get_route_cache()
+                route_cache.set("lane", {"distance_miles": 1.0})
+
+                self.assertIsNone(route_cache.backend)
+                self.assertEqual(route_cache.get("lane")[0], enabled)
+
+    def test_summarize_load(self):
+        samples = [('detail', ms / 1000, 200, 4) for ms in range(1, 101)] + [('calculate', 0.5, 503, None)]
+        report = loadtest.summarize_load(samples, duration=10)
+        self.assertEqual(report['detail']['requests'], 100)
+        self.assertEqual(report['detail']['errors'], 0)
+        self.assertAlmostEqual(report['detail']['latency_ms']['p95'], 95)
+        self.assertEqual(report['detail']['db_queries'], {'mean': 4, 'max': 4})
+        self.assertEqual(report['calculate']['errors'], 1)
+        self.assertIsNone(report['calculate']['db_queries']['mean'])
+
+
+@override_settings(MAP_PROVIDER='local')
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.REGISTRY.clear()
+        self.client = APIClient()
+
+    def test_calculate_records_spans_and_request_log(self):
+        with self.assertLogs('driver_hos_logbook.requests', level='INFO') as logs:
+            response = self.client.post(reverse('trip-calculate'), {
+                "current_location": "Los Angeles, CA",
+                "pickup_location": "Phoenix, AZ",
+                "dropoff_location": "Dallas, TX",
+                "current_cycle_used": 0
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        [record] = logs.records
+        self.assertEqual((record.view, record.method, record.status), ('trip-calculate', 'POST', 201))
+        # Geocoding runs on the lookup pool but still counts towards the request
+        for name in ('map.geocode', 'map.route', 'plan.hos_simulation', 'plan.daily_log_sheets', 'db.persist', 'api.serialize'):
+            self.assertIn(name, record.spans)
+            self.assertEqual(metrics.SPAN_SECONDS.count(span=name), 1 if name != 'map.geocode' else 3)
+        self.assertEqual(metrics.REQUEST_SECONDS.count(view='trip-calculate', method='POST', status=201), 1)
+        self.assertEqual(json.loads(metrics.JsonFormatter().format(record))['view'], 'trip-calculate')
+
+    def test_calculate_multi_stop_records_geocode_spans(self):
+        with self.assertLogs('driver_hos_logbook.requests', level='INFO') as logs:
+            response = self.client.post(reverse('trip-calculate-multi-stop'), {
+                "current_location": "Los Angeles, CA",
+                "current_cycle_used": 0,
+                "stops": [
+                    {"location": "Phoenix, AZ", "stop_type": "PICKUP"},
+                    {"location": "Dallas, TX", "stop_type": "DROPOFF"},
+                ]
+            }, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        [record] = logs.records
+        self.assertIn('map.geocode', record.spans)
+        self.assertEqual(metrics.SPAN_SECONDS.count(span='map.geocode'), 3)
+
+    @override_settings(MAP_PROVIDER='remote', MAP_PROVIDER_FALLBACK='local')
+    @patch('driver_hos_logbook.apps.driver_hos_logbook.http_client.get')
+    def test_metrics_endpoint(self, mock_get):
+        providers.reset_providers()
+        self.addCleanup(providers.reset_providers)
+        get_geocode_cache().clear()
+        mock_get.side_effect = ConnectionError("boom")
+        self.assertIsNotNone(utils.geocode_location("Dallas, TX"))
+
+        with override_settings(METRICS_TOKEN='scrape-me'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('hos_map_provider_errors_total{provider="remote",operation="geocode"} 1', body)
+        self.assertIn('hos_span_duration_seconds_count{span="map.geocode.fallback"} 1', body)
+        self.assertIn('hos_map_cache_lookups_total{cache="geocode",result="miss"} 1', body)
+        self.assertIn('hos_map_cache_hit_ratio{cache="geocode"} 0.0', body)
+
+        with override_settings(METRICS_ENABLED=False, METRICS_TOKEN='scrape-me'):
+            response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-me')
+            self.assertEqual(response.status_code, 404)
+
+    def test_metrics_endpoint_requires_token(self):
+        url = reverse('metrics')
+        # Not served at all until a token is configured
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+
+        with override_settings(METRICS_TOKEN='scrape-me'):
+            self.assertEqual(self.client.get(url).status_code, 401)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 401)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Basic scrape-me').status_code, 401)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-me').status_code, 200)
+
+    def test_trip_detail_records_serialize_span(self):
+        trip = Trip.objects.get(pk=self.client.post(reverse('trip-calculate'), {
+            "current_location": "Los Angeles, CA",
+            "pickup_location": "Phoenix, AZ",
+            "dropoff_location": "Dallas, TX",
+            "current_cycle_used": 0
+        }, format='json').data['id'])
+
+        with self.assertLogs('driver_hos_logbook.requests', level='INFO') as logs:
+            response = self.client.get(reverse('trip-detail', kwargs={'pk': trip.pk}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], str(trip.pk))
+        self.assertIn('api.serialize', logs.records[0].spans)
+
+    def test_histogram_rendering(self):
+        registry = metrics.Registry()
+        histogram = registry.histogram("test_seconds", "Test.", ("step",), buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value, step='a"b')
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP test_seconds Test.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{step="a\\"b",le="0.1"} 2',
+            'test_seconds_bucket{step="a\\"b",le="1.0"} 3',
+            'test_seconds_bucket{step="a\\"b",le="+Inf"} 4',
+            'test_seconds_count{step="a\\"b"} 4',
+            'test_seconds_sum{step="a\\"b"} 3.65',
+        ])
@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import TripViewSet
+from .views import TripViewSet, TripCalculationJobViewSet
 
 router = DefaultRouter()
 router.register(r'trips', TripViewSet, basename='trip')
+router.register(r'trip-jobs', TripCalculationJobViewSet, basename='trip-job')
 
 urlpatterns = [
     path('', include(router.urls)),
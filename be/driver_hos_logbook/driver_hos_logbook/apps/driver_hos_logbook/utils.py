@@ -1,240 +1,918 @@
-import requests
-from datetime import timedelta
+import logging
+import math
+import multiprocessing
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+from functools import lru_cache
+import configurations
+from django.conf import settings
+from django.db import close_old_connections
 from django.utils import timezone
+from . import metrics
 from .models import DutyStatus, RouteStop
+from .hos import CYCLE_RESTART_HOURS, HOSSimulator
+from .recap import daily_recap
+from .geometry import haversine_miles
+from .route_index import RouteIndex
+from .stop_order import is_feasible, plan_stop_order
+from .places import get_place_index
+from .cache import get_geocode_cache, get_route_cache, normalize_location, route_cache_key
+from .providers import get_fallback_provider, get_map_provider
+
+
+# Pickup/dropoff handling: (driving location label, log note, stop description)
+STOP_ACTIVITIES = {
+    RouteStop.StopType.PICKUP: ("En route to Pickup", "Loading", "Loading Cargo"),
+    RouteStop.StopType.DROPOFF: ("En route to Dropoff", "Unloading", "Unloading Cargo"),
+}
+
+logger = logging.getLogger(__name__)
 
 
 def geocode_location(location_name):
     """
-    Geocodes a location name using Nominatim API.
+    Geocodes a location name using the configured map provider.
+    Results (including misses) are served from the geocode cache when available.
     """
-    url = "https://nominatim.openstreetmap.org/search"
-    params = {
-        "q": location_name,
-        "format": "json",
-        "limit": 1
-    }
-    headers = {
-        "User-Agent": "DriverHOSLogbook/1.0 (abdulrahman.m.altayeb@gmail.com)"
-    }
+    provider = get_map_provider()
+    cache = get_geocode_cache()
+    cache_key = normalize_location(location_name)
+    if provider.cacheable:
+        hit, cached = cache.get(cache_key)
+        if hit:
+            return cached
+
     try:
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        if data:
-            return {
-                "lat": float(data[0]["lat"]),
-                "lon": float(data[0]["lon"]),
-                "display_name": data[0]["display_name"]
-            }
+        with metrics.span("map.geocode"):
+            result = provider.geocode(location_name)
     except Exception as e:
-        print(f"Geocoding error for {location_name}: {e}")
-    return None
+        # Transient failures are not cached, only definitive answers
+        _record_provider_error(provider, "geocode", e, location=location_name)
+        return _with_fallback_provider("geocode", lambda fallback: fallback.geocode(location_name))
+    if provider.cacheable:
+        cache.set(cache_key, result)
+    return result
 
 
 def get_route_data(origin_coords, dest_coords):
     """
-    Fetches route distance, duration, and geometry from OSRM.
+    Fetches route distance, duration, and geometry from the configured map provider.
     Coords format: (lat, lon)
+    Segments are cached by their endpoints rounded to ``ROUTE_CACHE['PRECISION']``.
     """
-    # OSRM expects {lon},{lat}
-    url = f"https://router.project-osrm.org/route/v1/driving/{origin_coords[1]},{origin_coords[0]};{dest_coords[1]},{dest_coords[0]}"
-    params = {
-        "overview": "full",
-        "geometries": "geojson"
-    }
+    provider = get_map_provider()
+    cache = get_route_cache()
+    cache_key = route_cache_key(origin_coords, dest_coords, settings.ROUTE_CACHE["PRECISION"])
+    if provider.cacheable:
+        hit, cached = cache.get(cache_key)
+        if hit:
+            return cached
+
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        if data["code"] == "Ok":
-            route = data["routes"][0]
-            return {
-                "distance_miles": route["distance"] * 0.000621371,
-                "duration_hours": route["duration"] / 3600,
-                "geometry": route["geometry"]
-            }
+        with metrics.span("map.route"):
+            legs = provider.route([origin_coords, dest_coords])
+    except Exception as e:
+        _record_provider_error(provider, "route", e)
+        legs = _with_fallback_provider("route", lambda fallback: fallback.route([origin_coords, dest_coords]))
+        return legs[0] if legs else None
+    result = legs[0] if legs else None
+    if provider.cacheable:
+        cache.set(cache_key, result)
+    return result
+
+
+def get_multi_leg_route_data(coords_list):
+    """
+    Fetches every leg of a multi-waypoint route in a single provider request.
+    Coords format: [(lat, lon), ...] with at least two waypoints.
+    Returns one dict per leg (distance, duration, geometry), or None on failure.
+    Legs already in the route segment cache are not re-fetched.
+    """
+    provider = get_map_provider()
+    cache = get_route_cache()
+    precision = settings.ROUTE_CACHE["PRECISION"]
+    cache_keys = [
+        route_cache_key(origin, dest, precision)
+        for origin, dest in zip(coords_list, coords_list[1:])
+    ]
+    if provider.cacheable:
+        cached_legs = [cache.get(key) for key in cache_keys]
+        if all(hit and leg for hit, leg in cached_legs):
+            return [leg for _, leg in cached_legs]
+
+    try:
+        with metrics.span("map.route"):
+            legs = provider.route(coords_list)
     except Exception as e:
-        print(f"Routing error: {e}")
-    return None
+        _record_provider_error(provider, "route", e)
+        return _with_fallback_provider("route", lambda fallback: fallback.route(coords_list))
+    if legs and provider.cacheable:
+        for key, leg in zip(cache_keys, legs):
+            cache.set(key, leg)
+    return legs
 
 
 def calculate_route_with_hos(
     current_location, 
     pickup_location, 
     dropoff_location, 
-    current_cycle_used
+    current_cycle_used,
+    duty_history=None,
+    hos_state=None,
+    departure_time=None,
+    home_timezone=None,
+    geocoded=None
 ):
     """
     Main orchestrator for HOS-compliant route planning using real Map APIs.
+    ``duty_history`` feeds the log sheet recaps; see ``generate_daily_log_sheets``.
+    ``hos_state`` is the driver's snapshot from their previous trip
+    (``HOSSimulator.snapshot()``); planning resumes from it, and
+    ``current_cycle_used`` may then be None to take the cycle hours from it.
+    The trip leaves at ``departure_time`` (default: 08:00 today in
+    ``home_timezone``), and its log sheets run midnight to midnight in
+    ``home_timezone`` (default: the current time zone).
+    ``geocoded`` maps normalized location names to already resolved
+    geocodes, which are used instead of looking those locations up again.
+    """
+    # 1. Geocode all locations and fetch real route data concurrently
+    loc_current, stops, segments = _resolve_lane(current_location, pickup_location, dropoff_location, geocoded=geocoded)
+    return _plan_trip(
+        current_location=current_location,
+        current_coords=loc_current,
+        stops=stops,
+        legs=segments,
+        current_cycle_used=current_cycle_used,
+        duty_history=duty_history,
+        hos_state=hos_state,
+        departure_time=departure_time,
+        home_timezone=home_timezone
+    )
+
+
+def compare_trip_scenarios(current_location, pickup_location, dropoff_location, *, start_times, cycle_values):
+    """
+    What-if planning for one lane: simulates the trip for every combination
+    of ``start_times`` and ``cycle_values`` without persisting anything.
+    The lane is geocoded and routed once; the variants only re-run the HOS
+    simulation, on the scenario process pool.
+    Returns the route summary and one row per variant, start times outermost.
+    """
+    loc_current, stops, segments = _resolve_lane(current_location, pickup_location, dropoff_location)
+    # Workers only need what the simulation reads
+    stops = [
+        {"stop_type": stop["stop_type"], "location": stop["location"], "lat": stop["lat"], "lon": stop["lon"]}
+        for stop in stops
+    ]
+    leg_hours = [duration for _, duration, _ in segments]
+    scenarios = [
+        (current_location, stops, leg_hours, start_time, cycle_used)
+        for start_time in start_times
+        for cycle_used in cycle_values
+    ]
+
+    workers = settings.TRIP_SCENARIO_WORKERS
+    if workers > 1 and len(scenarios) > 1:
+        summaries = _get_scenario_executor().map(
+            _simulate_scenario, scenarios,
+            chunksize=max(1, math.ceil(len(scenarios) / workers))
+        )
+    else:
+        summaries = map(_simulate_scenario, scenarios)
+
+    rows = []
+    for (_, _, _, start_time, cycle_used), summary in zip(scenarios, summaries):
+        stop_counts = summary['stop_counts']
+        rows.append({
+            'start_time': start_time,
+            'current_cycle_used': cycle_used,
+            'arrival_time': summary['arrival_time'],
+            'end_time': summary['end_time'],
+            'total_time_hours': round(summary['total_time_hours'], 2),
+            'driving_hours': round(summary['driving_hours'], 2),
+            'on_duty_hours': round(summary['on_duty_hours'], 2),
+            'rest_stops': stop_counts[RouteStop.StopType.REST],
+            'breaks': stop_counts[RouteStop.StopType.BREAK],
+            'fuel_stops': stop_counts[RouteStop.StopType.FUEL]
+        })
+    return {
+        'route': {
+            'total_distance': round(sum(distance for distance, _, _ in segments), 2),
+            'driving_hours': round(sum(leg_hours), 2)
+        },
+        'scenarios': rows
+    }
+
+
+def _simulate_scenario(scenario):
+    current_location, stops, leg_hours, start_time, cycle_used = scenario
+    hos = HOSSimulator(start_time=start_time, cycle_hours=cycle_used)
+    _simulate_stops(hos, current_location=current_location, stops=stops, leg_hours=leg_hours)
+    return hos.summary()
+
+
+def _resolve_lane(current_location, pickup_location, dropoff_location, *, geocoded=None):
+    """
+    Geocodes and routes a current -> pickup -> dropoff lane.
+    Returns (current coords, pickup and dropoff stops, route segments).
+    """
+    locations, segments = _resolve_locations_and_routes(
+        waypoints=[
+            {"location_name": current_location, "default_lat": 34.0522, "default_lon": -118.2437, "geocoded": geocoded},
+            {"location_name": pickup_location, "default_lat": 33.4484, "default_lon": -112.0740, "geocoded": geocoded},
+            {"location_name": dropoff_location, "default_lat": 32.7767, "default_lon": -96.7970, "geocoded": geocoded},
+        ],
+        fallback_dists=[200.0, 1000.0]
+    )
+    loc_current, loc_pickup, loc_dropoff = locations
+    stops = [
+        {"stop_type": RouteStop.StopType.PICKUP, "location": pickup_location, "segment": "to_pickup", **loc_pickup},
+        {"stop_type": RouteStop.StopType.DROPOFF, "location": dropoff_location, "segment": "to_dropoff", **loc_dropoff},
+    ]
+    return loc_current, stops, segments
+
+
+def calculate_multi_stop_route_with_hos(
+    current_location,
+    stops,
+    current_cycle_used,
+    duty_history=None,
+    hos_state=None,
+    optimize=True,
+    departure_time=None,
+    home_timezone=None
+):
+    """
+    Plans a trip through any number of pickups and dropoffs.
+    ``stops`` are {"location", "stop_type", "shipment"} dicts; a dropoff is
+    visited after every pickup of the same shipment, or after every pickup
+    at all when it has no shipment. With ``optimize``, the
+    visiting order is chosen from one travel-time matrix request (nearest
+    insertion + 2-opt); the optimized order is kept only if the HOS
+    simulation finishes no later than the order given. The other arguments
+    are as for ``calculate_route_with_hos``. Raises ValueError when a stop
+    can't be geocoded.
     """
-    # 1. Geocode all locations
-    loc_current = _get_location_coords(location_name=current_location, default_lat=34.0522, default_lon=-118.2437)
-    loc_pickup = _get_location_coords(location_name=pickup_location, default_lat=33.4484, default_lon=-112.0740)
-    loc_dropoff = _get_location_coords(location_name=dropoff_location, default_lat=32.7767, default_lon=-96.7970)
+    names = [current_location] + [stop["location"] for stop in stops]
+    locations = list(_get_lookup_executor().map(
+        metrics.propagate(lambda name: _run_lookup(geocode_location, location_name=name)),
+        names
+    ))
+    missing = [name for name, location in zip(names, locations) if not location]
+    if missing:
+        raise ValueError(f"Could not find: {', '.join(missing)}")
+
+    # Node 0 is the current location, node i + 1 is stops[i]
+    precedence = {}
+    for i, stop in enumerate(stops):
+        if stop["stop_type"] == RouteStop.StopType.DROPOFF:
+            precedence[i + 1] = {
+                j + 1 for j, other in enumerate(stops)
+                if other["stop_type"] == RouteStop.StopType.PICKUP
+                and (not stop.get("shipment") or other.get("shipment") == stop["shipment"])
+            }
+
+    coords_list = [(location["lat"], location["lon"]) for location in locations]
+    order = list(range(1, len(stops) + 1))
+    if optimize and len(stops) > 1:
+        matrix = get_travel_time_matrix(coords_list)
+        durations = matrix["durations_hours"]
+        optimized = plan_stop_order(durations, precedence=precedence)
+        start_time = departure_time or default_start_time(home_timezone)
 
-    # 2. Get real route data
-    dist_to_pickup, dur_to_pickup, geom_to_pickup = _get_segment_route(
-        start_coords=(loc_current["lat"], loc_current["lon"]), 
-        end_coords=(loc_pickup["lat"], loc_pickup["lon"]), 
-        fallback_dist=200.0
+        def hos_elapsed(candidate):
+            hos = _simulate_stops(
+                _start_simulator(current_cycle_used=current_cycle_used, hos_state=hos_state, start_time=start_time),
+                current_location=current_location,
+                stops=[{**stops[node - 1], **locations[node]} for node in candidate],
+                leg_hours=[durations[a][b] for a, b in zip([0] + candidate, candidate)]
+            )
+            return hos.elapsed_us
+
+        if not is_feasible([0] + order, precedence) or hos_elapsed(optimized) <= hos_elapsed(order):
+            order = optimized
+
+    ordered_stops = [
+        {**stops[node - 1], **locations[node], "segment": f"to_stop_{position}"}
+        for position, node in enumerate(order, start=1)
+    ]
+    route_coords = [coords_list[0]] + [coords_list[node] for node in order]
+    legs = _get_multi_leg_route(
+        coords_list=route_coords,
+        fallback_dists=[
+            _estimate_road_miles(start, end)
+            for start, end in zip(route_coords, route_coords[1:])
+        ]
     )
-    dist_to_dropoff, dur_to_dropoff, geom_to_dropoff = _get_segment_route(
-        start_coords=(loc_pickup["lat"], loc_pickup["lon"]), 
-        end_coords=(loc_dropoff["lat"], loc_dropoff["lon"]), 
-        fallback_dist=1000.0
+    result = _plan_trip(
+        current_location=current_location,
+        current_coords=locations[0],
+        stops=ordered_stops,
+        legs=legs,
+        current_cycle_used=current_cycle_used,
+        duty_history=duty_history,
+        hos_state=hos_state,
+        departure_time=departure_time,
+        home_timezone=home_timezone
     )
-    
-    total_distance = dist_to_pickup + dist_to_dropoff
-    
+    result['stop_order'] = [node - 1 for node in order]
+    return result
+
+
+def get_travel_time_matrix(coords_list):
+    """
+    Travel durations (hours) and distances (miles) between every pair of
+    waypoints, from a single provider request. Pairs the provider can't
+    route are filled with great-circle estimates.
+    """
+    provider = get_map_provider()
+    try:
+        with metrics.span("map.table"):
+            table = provider.table(coords_list)
+    except Exception as e:
+        _record_provider_error(provider, "table", e)
+        table = _with_fallback_provider("table", lambda fallback: fallback.table(coords_list))
+
+    durations, distances = [], []
+    for i, start in enumerate(coords_list):
+        duration_row, distance_row = [], []
+        for j, end in enumerate(coords_list):
+            duration = table["durations_hours"][i][j] if table else None
+            distance = table["distances_miles"][i][j] if table else None
+            if duration is None or distance is None:
+                distance = _estimate_road_miles(start, end)
+                duration = _estimate_driving_hours(distance)
+            duration_row.append(duration)
+            distance_row.append(distance)
+        durations.append(duration_row)
+        distances.append(distance_row)
+    return {"durations_hours": durations, "distances_miles": distances}
+
+
+def default_start_time(tz=None):
+    """
+    Trips are planned to start at 08:00 today (in ``tz``, default UTC)
+    unless told otherwise.
+    """
+    return timezone.localtime(timezone=tz or dt_timezone.utc).replace(hour=8, minute=0, second=0, microsecond=0)
+
+
+def _start_simulator(*, current_cycle_used, hos_state, start_time):
+    if hos_state is not None:
+        return HOSSimulator.resume(hos_state, start_time=start_time, cycle_hours=current_cycle_used)
+    return HOSSimulator(start_time=start_time, cycle_hours=current_cycle_used or 0)
+
+
+def _simulate_stops(hos, *, current_location, stops, leg_hours):
+    """
+    Runs the duty day: pre-trip inspection, then driving to each stop (with
+    HOS breaks) and an hour of loading/unloading there, then post-trip.
+    """
+    hos.log(DutyStatus.ON_DUTY_NOT_DRIVING, 0.25, current_location, "Pre-trip inspection")
+    for stop, hours in zip(stops, leg_hours):
+        en_route, notes, description = STOP_ACTIVITIES[stop["stop_type"]]
+        hos.drive(hours, en_route)
+        hos.add_stop(
+            stop["stop_type"], stop["location"],
+            latitude=stop["lat"],
+            longitude=stop["lon"],
+            duration_minutes=60,
+            description=description
+        )
+        hos.log(DutyStatus.ON_DUTY_NOT_DRIVING, 1.0, stop["location"], notes)
+    hos.log(DutyStatus.ON_DUTY_NOT_DRIVING, 0.25, stops[-1]["location"], "Post-trip inspection")
+    return hos
+
+
+def _build_route_index(*, waypoints, legs):
+    """
+    Indexes the trip's legs in order, using the straight line between
+    waypoints for a leg without geometry.
+    """
+    lines = []
+    for (start, end), (distance, duration, geometry) in zip(zip(waypoints, waypoints[1:]), legs):
+        if geometry and len(geometry.get("coordinates", ())) > 1:
+            lines.append((geometry["coordinates"], duration, distance, geometry.get("segment_hours")))
+        else:
+            lines.append(([[start["lon"], start["lat"]], [end["lon"], end["lat"]]], duration, distance))
+    return RouteIndex(lines)
+
+
+def _place_en_route_stops(planned_stops, log_entries, *, progress, route_index):
+    """
+    Gives fuel, break and rest stops their position along the route. A stop
+    near a known place is labelled "Near <place>"; its position stays on the
+    route, since the place isn't where the driver actually stopped.
+    """
+    index = get_place_index()
+    radius = settings.EN_ROUTE_PLACES["LABEL_RADIUS_MILES"]
+    for stop, (driving_hours, entry_index) in zip(planned_stops, progress):
+        if stop["stop_type"] in STOP_ACTIVITIES:
+            continue
+        lat, lon = route_index.position_at_hours(driving_hours)
+        place, _ = index.nearest(lat, lon, radius_miles=radius)
+        if place is not None:
+            stop["location"] = f"Near {place['name']}"
+            log_entries[entry_index]["location"] = stop["location"]
+        stop["latitude"], stop["longitude"] = round(lat, 6), round(lon, 6)
+
+
+def _plan_trip(
+    *,
+    current_location,
+    current_coords,
+    stops,
+    legs,
+    current_cycle_used,
+    duty_history,
+    hos_state,
+    departure_time,
+    home_timezone
+):
+    """
+    Simulates HOS along ``stops`` (in visiting order, with "lat", "lon" and
+    a geometry "segment" name), each reached by the matching
+    (distance, duration, geometry) leg, and builds the planner result.
+    """
+    total_distance = sum(distance for distance, _, _ in legs)
+
     # Always create a valid GeoJSON FeatureCollection
     route_geometry = {
         "type": "FeatureCollection",
-        "features": []
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": geometry,
+                "properties": {"segment": stop["segment"]}
+            }
+            for stop, (_, _, geometry) in zip(stops, legs) if geometry
+        ]
     }
-    if geom_to_pickup:
-        route_geometry["features"].append({
-            "type": "Feature", 
-            "geometry": geom_to_pickup, 
-            "properties": {"segment": "to_pickup"}
-        })
-    if geom_to_dropoff:
-        route_geometry["features"].append({
-            "type": "Feature", 
-            "geometry": geom_to_dropoff, 
-            "properties": {"segment": "to_dropoff"}
-        })
 
-    # State tracking
-    start_time = timezone.now().replace(hour=8, minute=0, second=0, microsecond=0)
-    state = {
-        "current_time": start_time,
-        "cumulative_driving_since_last_10hr_rest": 0.0,
-        "cumulative_duty_since_last_10hr_rest": 0.0,
-        "cumulative_driving_since_last_30min_break": 0.0,
-        "cumulative_cycle_hours": float(current_cycle_used),
-        "miles_since_last_fuel": 0.0,
-        "log_entries": [],
-    }
-    stops = []
-    
-    # Execution
-    _add_hos_log_entry(state=state, status=DutyStatus.ON_DUTY_NOT_DRIVING, duration_hrs=0.25, location=current_location, notes="Pre-trip inspection")
-    _insert_hos_breaks(state=state, needed_driving_hrs=dur_to_pickup, location="En route to Pickup", stops=stops)
-    
-    stops.append({
-        'stop_type': RouteStop.StopType.PICKUP,
-        'location': pickup_location,
-        'latitude': loc_pickup["lat"],
-        'longitude': loc_pickup["lon"],
-        'arrival_time': state['current_time'],
-        'duration_minutes': 60,
-        'description': 'Loading Cargo'
-    })
-    _add_hos_log_entry(state=state, status=DutyStatus.ON_DUTY_NOT_DRIVING, duration_hrs=1.0, location=pickup_location, notes="Loading")
-    
-    _insert_hos_breaks(state=state, needed_driving_hrs=dur_to_dropoff, location="En route to Dropoff", stops=stops)
-    
-    stops.append({
-        'stop_type': RouteStop.StopType.DROPOFF,
-        'location': dropoff_location,
-        'latitude': loc_dropoff["lat"],
-        'longitude': loc_dropoff["lon"],
-        'arrival_time': state['current_time'],
-        'duration_minutes': 60,
-        'description': 'Unloading Cargo'
-    })
-    _add_hos_log_entry(state=state, status=DutyStatus.ON_DUTY_NOT_DRIVING, duration_hrs=1.0, location=dropoff_location, notes="Unloading")
-    _add_hos_log_entry(state=state, status=DutyStatus.ON_DUTY_NOT_DRIVING, duration_hrs=0.25, location=dropoff_location, notes="Post-trip inspection")
-
-    daily_logs = generate_daily_log_sheets(state['log_entries'], total_distance)
-    
+    # Simulation
+    with metrics.span("plan.hos_simulation"):
+        hos = _start_simulator(
+            current_cycle_used=current_cycle_used,
+            hos_state=hos_state,
+            start_time=departure_time or default_start_time(home_timezone)
+        )
+        start_time = hos.start_time
+        start_cycle_hours = hos.cycle_hours
+        _simulate_stops(
+            hos,
+            current_location=current_location,
+            stops=stops,
+            leg_hours=[duration for _, duration, _ in legs]
+        )
+        log_entries = hos.log_entries()
+        planned_stops = hos.stops()
+
+    with metrics.span("plan.stop_placement"):
+        route_index = _build_route_index(waypoints=[current_coords, *stops], legs=legs)
+        _place_en_route_stops(planned_stops, log_entries, progress=hos.stop_progress(), route_index=route_index)
+    end_time = hos.current_time
+    with metrics.span("plan.daily_log_sheets"):
+        daily_logs = generate_daily_log_sheets(
+            log_entries, total_distance,
+            duty_history=duty_history,
+            route_index=route_index,
+            off_duty_before=hos.off_duty_before,
+            tz=home_timezone
+        )
+
+    pickup = next(stop for stop in stops if stop["stop_type"] == RouteStop.StopType.PICKUP)
+    dropoff = stops[-1]
     return {
         'route_summary': {
             'total_distance': total_distance,
-            'total_time_hours': (state['current_time'] - start_time).total_seconds() / 3600,
+            'total_time_hours': (end_time - start_time).total_seconds() / 3600,
             'start_time': start_time,
-            'end_time': state['current_time'],
+            'end_time': end_time,
+            'start_cycle_hours': start_cycle_hours,
             'route_geometry': route_geometry,
-            'current_coords': {"lat": loc_current["lat"], "lon": loc_current["lon"]},
-            'pickup_coords': {"lat": loc_pickup["lat"], "lon": loc_pickup["lon"]},
-            'dropoff_coords': {"lat": loc_dropoff["lat"], "lon": loc_dropoff["lon"]}
+            'current_coords': {"lat": current_coords["lat"], "lon": current_coords["lon"]},
+            'pickup_coords': {"lat": pickup["lat"], "lon": pickup["lon"]},
+            'dropoff_coords': {"lat": dropoff["lat"], "lon": dropoff["lon"]}
         },
-        'stops': stops,
-        'log_entries': state['log_entries'],
-        'daily_logs': daily_logs
+        'stops': planned_stops,
+        'log_entries': log_entries,
+        'daily_logs': daily_logs,
+        'hos_state': hos.snapshot()
     }
 
 
-def generate_daily_log_sheets(log_entries, total_dist):
+def calculate_routes_with_hos_batch(trip_inputs, *, chains=None):
+    """
+    Plans many trips at once. Every distinct location in the batch is
+    geocoded once up front and shared by the trips, which are then planned
+    in parallel. Returns one result per input, in order; a trip that fails
+    to plan yields its exception instead of a result.
+
+    ``chains`` lists groups of input indexes to plan one after another,
+    e.g. one driver's trips: each trip starts from the ``hos_state`` the
+    previous one ended with, and with its days added to ``duty_history``.
+    Inputs in no chain are planned on their own.
+    """
+    unique_locations = {}
+    for trip_input in trip_inputs:
+        for field in ("current_location", "pickup_location", "dropoff_location"):
+            name = trip_input[field]
+            unique_locations.setdefault(normalize_location(name), name)
+    geocoded = dict(zip(unique_locations, _get_lookup_executor().map(
+        metrics.propagate(lambda name: _run_lookup(geocode_location, location_name=name)),
+        unique_locations.values()
+    )))
+
+    chained = {index for chain in chains or () for index in chain}
+    chains = [*(chains or ()), *([index] for index in range(len(trip_inputs)) if index not in chained)]
+
+    def plan(chain):
+        results = []
+        carried = {}
+        for index in chain:
+            trip_input = {**trip_inputs[index], **carried}
+            try:
+                result = calculate_route_with_hos(**trip_input, geocoded=geocoded)
+            except Exception as e:
+                results.append((index, e))
+                continue
+            results.append((index, result))
+            carried = {
+                "hos_state": result["hos_state"],
+                "duty_history": _add_duty_days(trip_input.get("duty_history"), result["daily_logs"])
+            }
+        return results
+
+    results = [None] * len(trip_inputs)
+    for chain_results in _get_planning_executor().map(
+        metrics.propagate(lambda chain: _run_lookup(plan, chain=chain)),
+        chains
+    ):
+        for index, result in chain_results:
+            results[index] = result
+    return results
+
+
+def _add_duty_days(duty_history, daily_sheets):
+    """
+    ``duty_history`` with a planned trip's per-day on-duty hours added, the
+    way ``recap.record_duty_days`` will record them.
+    """
+    duty_days = dict(duty_history or {})
+    for sheet in daily_sheets:
+        hours, cycle_restart = duty_days.get(sheet["date"], (0.0, False))
+        duty_days[sheet["date"]] = (
+            hours + sheet["total_driving"] + sheet["total_on_duty"],
+            cycle_restart or sheet["cycle_restart"]
+        )
+    return duty_days
+
+
+def generate_daily_log_sheets(
+    log_entries,
+    total_dist,
+    *,
+    duty_history=None,
+    route_index=None,
+    off_duty_before=0.0,
+    tz=None
+):
     """
     Groups log entries by calendar day and prepares them for the log sheet format.
     """
-    if not log_entries:
-        return []
-        
-    split_entries = []
+    return list(iter_daily_log_sheets(
+        log_entries, total_dist,
+        duty_history=duty_history,
+        route_index=route_index,
+        off_duty_before=off_duty_before,
+        tz=tz
+    ))
+
+
+def iter_daily_log_sheets(
+    log_entries,
+    total_dist,
+    *,
+    total_driving_hours=None,
+    duty_history=None,
+    route_index=None,
+    off_duty_before=0.0,
+    tz=None
+):
+    """
+    Lazily yields one log sheet per calendar day, in a single pass that
+    splits entries at midnight and accumulates the grid totals as it goes.
+    Days run midnight to midnight in ``tz`` (the driver's home terminal
+    time zone; default the current time zone), and the sheet entries'
+    times are given in it.
+
+    With a ``route_index``, each day's mileage is read off the route for
+    the driving hours before and after that day. Without one, it is the
+    day's share of ``total_dist`` by driving time, so the trip's total
+    driving hours must be known up front: pass ``total_driving_hours`` to
+    stream from a one-shot iterator, otherwise ``log_entries`` must be a
+    sequence (it is read twice).
+
+    ``duty_history`` is the driver's on-duty time on other trips (see
+    ``recap.load_duty_history``); the 70-hour/8-day recap covers it and the
+    trip's own earlier days. ``off_duty_before`` is the driver's off-duty
+    time right before the first entry (e.g. since their last trip), so a
+    34-hour restart spanning the two trips marks the first duty day.
+    """
+    if route_index is not None:
+        def day_miles(day):
+            start_hours = day['driving_before']
+            end_hours = start_hours + day['totals'][DutyStatus.DRIVING]
+            return float(route_index.miles_at_hours(end_hours) - route_index.miles_at_hours(start_hours))
+    else:
+        if total_driving_hours is None:
+            total_driving_hours = sum(
+                (e['end_time'] - e['start_time']).total_seconds() / 3600
+                for e in log_entries if e['duty_status'] == DutyStatus.DRIVING
+            )
+        total_dist = float(total_dist)
+
+        def day_miles(day):
+            if total_driving_hours <= 0:
+                return 0
+            return day['totals'][DutyStatus.DRIVING] / total_driving_hours * total_dist
+    duty_days = dict(duty_history or {})
+
+    day = None
+    off_duty_run = off_duty_before
+    for date, piece in _split_entries_at_midnight(log_entries, tz or timezone.get_current_timezone()):
+        if day is None or date != day['date']:
+            if day is not None:
+                yield _finish_daily_log_sheet(day, day_miles(day), duty_days)
+            day = {
+                'date': date,
+                'number': 1 if day is None else day['number'] + 1,
+                'entries': [],
+                'totals': dict.fromkeys(DutyStatus.values, 0),
+                'driving_before': 0.0 if day is None else day['driving_before'] + day['totals'][DutyStatus.DRIVING],
+                'cycle_restart': False
+            }
+        day['entries'].append(piece)
+        day['totals'][piece['duty_status']] += piece['duration_hours']
+
+        if piece['duty_status'] in (DutyStatus.OFF_DUTY, DutyStatus.SLEEPER_BERTH):
+            off_duty_run += piece['duration_hours']
+        else:
+            if off_duty_run >= CYCLE_RESTART_HOURS:
+                day['cycle_restart'] = True
+            off_duty_run = 0.0
+    if day is not None:
+        yield _finish_daily_log_sheet(day, day_miles(day), duty_days)
+
+
+def _split_entries_at_midnight(log_entries, tz):
+    """
+    Splits entries at midnight in ``tz``, yielding (log date, piece) pairs.
+    Each day's end is looked up once (see ``_next_midnight``) rather than
+    localized per entry, and durations are taken before converting to
+    ``tz`` so they stay exact across DST changes.
+    """
+    date = day_end = None
     for entry in log_entries:
         start = entry['start_time']
         end = entry['end_time']
-        while start.date() < end.date():
-            next_day = start.date() + timedelta(days=1)
-            midnight = timezone.make_aware(timezone.datetime.combine(next_day, timezone.datetime.min.time()))
-            split_entries.append({**entry, 'start_time': start, 'end_time': midnight})
-            start = midnight
-        split_entries.append({**entry, 'start_time': start, 'end_time': end})
-
-    daily_groups = {}
-    for entry in split_entries:
-        d = entry['start_time'].date()
-        if d not in daily_groups: daily_groups[d] = []
-        daily_groups[d].append(entry)
-        
-    result = []
-    sorted_dates = sorted(daily_groups.keys())
-    total_driving_hrs = sum((e['end_time'] - e['start_time']).total_seconds() / 3600 
-                           for e in split_entries if e['duty_status'] == DutyStatus.DRIVING)
-    
-    for i, d in enumerate(sorted_dates):
-        day_entries = daily_groups[d]
-        
-        # Calculate daily aggregates for the 4-line grid
-        total_off = sum((e['end_time'] - e['start_time']).total_seconds() / 3600 for e in day_entries if e['duty_status'] == DutyStatus.OFF_DUTY)
-        total_sleeper = sum((e['end_time'] - e['start_time']).total_seconds() / 3600 for e in day_entries if e['duty_status'] == DutyStatus.SLEEPER_BERTH)
-        total_driving = sum((e['end_time'] - e['start_time']).total_seconds() / 3600 for e in day_entries if e['duty_status'] == DutyStatus.DRIVING)
-        total_on_duty = sum((e['end_time'] - e['start_time']).total_seconds() / 3600 for e in day_entries if e['duty_status'] == DutyStatus.ON_DUTY_NOT_DRIVING)
-
-        day_driving_hrs = total_driving
-        day_miles = (day_driving_hrs / total_driving_hrs * float(total_dist)) if total_driving_hrs > 0 else 0
-        
-        # Calculate Recap
-        on_duty_today = total_driving + total_on_duty
-        
-        result.append({
-            'date': d,
-            'total_miles_driving': round(day_miles, 2),
-            'total_mileage_today': round(day_miles, 2),
-            'total_off_duty': round(total_off, 2),
-            'total_sleeper': round(total_sleeper, 2),
-            'total_driving': round(total_driving, 2),
-            'total_on_duty': round(total_on_duty, 2),
-            'log_entries': day_entries,
-            'remarks': f"Day {i+1} of trip",
-            'recap': {
-                'on_duty_today': round(on_duty_today, 2),
-                # In a real app, we'd look back at previous trips for the 70/8 rule
-                'total_last_8_days': round(on_duty_today, 2), # Simplified
-                'available_tomorrow': round(70.0 - on_duty_today, 2) # Simplified
-            }
-        })
-    return result
+        if day_end is None or start >= day_end:
+            date = start.astimezone(tz).date()
+            day_end = _next_midnight(date, tz)
+        while end > day_end:
+            yield date, _log_entry_piece(entry, start, day_end, tz)
+            start = day_end
+            date += timedelta(days=1)
+            day_end = _next_midnight(date, tz)
+        yield date, _log_entry_piece(entry, start, end, tz)
+
+
+@lru_cache(maxsize=4096)
+def _next_midnight(date, tz):
+    """
+    The (UTC) end of ``date`` in ``tz``. Trips share their days, so the
+    boundaries are computed once per time zone and day.
+    """
+    return datetime.combine(date + timedelta(days=1), time.min, tzinfo=tz).astimezone(dt_timezone.utc)
+
+
+def _log_entry_piece(entry, start, end, tz):
+    return {
+        **entry,
+        'start_time': start.astimezone(tz),
+        'end_time': end.astimezone(tz),
+        'duration_hours': (end - start).total_seconds() / 3600
+    }
+
+
+def _finish_daily_log_sheet(day, day_miles, duty_days):
+    totals = day['totals']
+    total_off = totals[DutyStatus.OFF_DUTY]
+    total_sleeper = totals[DutyStatus.SLEEPER_BERTH]
+    total_driving = totals[DutyStatus.DRIVING]
+    total_on_duty = totals[DutyStatus.ON_DUTY_NOT_DRIVING]
+
+    # Calculate Recap, counting the driver's other trips on the same day
+    other_hours, other_restart = duty_days.get(day['date'], (0.0, False))
+    duty_days[day['date']] = (other_hours + total_driving + total_on_duty, other_restart or day['cycle_restart'])
+
+    return {
+        'date': day['date'],
+        'total_miles_driving': round(day_miles, 2),
+        'total_mileage_today': round(day_miles, 2),
+        'total_off_duty': round(total_off, 2),
+        'total_sleeper': round(total_sleeper, 2),
+        'total_driving': round(total_driving, 2),
+        'total_on_duty': round(total_on_duty, 2),
+        'log_entries': day['entries'],
+        'remarks': f"Day {day['number']} of trip",
+        'cycle_restart': day['cycle_restart'],
+        'recap': daily_recap(day['date'], duty_days)
+    }
+
+
+def _resolve_locations_and_routes(*, waypoints, fallback_dists):
+    """
+    Geocodes all waypoints and routes each consecutive pair on the shared
+    lookup pool. A segment is submitted as soon as both of its endpoints
+    resolve, so routing overlaps with the remaining geocodes.
+    In "multi_leg" routing mode, all legs are fetched in one request once
+    every waypoint is geocoded.
+    Returns (locations, segments) in waypoint order.
+    """
+    executor = _get_lookup_executor()
+    if settings.ROUTING_MODE == "multi_leg":
+        locations = list(executor.map(
+            metrics.propagate(lambda waypoint: _run_lookup(_get_location_coords, **waypoint)),
+            waypoints
+        ))
+        segments = _get_multi_leg_route(
+            coords_list=[(loc["lat"], loc["lon"]) for loc in locations],
+            fallback_dists=fallback_dists
+        )
+        return locations, segments
+
+    geocode_futures = [
+        executor.submit(metrics.propagate(_run_lookup), _get_location_coords, **waypoint)
+        for waypoint in waypoints
+    ]
+    route_futures = [None] * len(fallback_dists)
+    pending = set(geocode_futures)
+
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for i, fallback_dist in enumerate(fallback_dists):
+            start, end = geocode_futures[i], geocode_futures[i + 1]
+            if route_futures[i] is None and start.done() and end.done():
+                start_loc, end_loc = start.result(), end.result()
+                route_futures[i] = executor.submit(
+                    metrics.propagate(_run_lookup),
+                    _get_segment_route,
+                    start_coords=(start_loc["lat"], start_loc["lon"]),
+                    end_coords=(end_loc["lat"], end_loc["lon"]),
+                    fallback_dist=fallback_dist
+                )
+                pending.add(route_futures[i])
+
+    locations = [future.result() for future in geocode_futures]
+    segments = [future.result() for future in route_futures]
+    return locations, segments
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def _get_executor(name, max_workers):
+    """
+    Returns the process-wide thread pool registered under ``name``.
+    """
+    executor = _executors.get(name)
+    if executor is None:
+        with _executors_lock:
+            executor = _executors.get(name)
+            if executor is None:
+                executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+                _executors[name] = executor
+    return executor
+
+
+_scenario_executor = None
+_scenario_executor_lock = threading.Lock()
+
+
+def _get_scenario_executor():
+    """
+    Returns the process pool used for what-if HOS simulations, which are
+    CPU-bound. Forking a threaded web worker can deadlock, so workers start
+    from a fork server (or are spawned) and set Django up from the
+    environment first; they never touch the database.
+    """
+    global _scenario_executor
+    if _scenario_executor is None:
+        with _scenario_executor_lock:
+            if _scenario_executor is None:
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                _scenario_executor = ProcessPoolExecutor(
+                    max_workers=settings.TRIP_SCENARIO_WORKERS,
+                    mp_context=multiprocessing.get_context(method),
+                    initializer=configurations.setup
+                )
+    return _scenario_executor
+
+
+def _get_lookup_executor():
+    """
+    Returns the thread pool used for map provider lookups.
+    """
+    return _get_executor("map-lookup", settings.MAP_LOOKUP_WORKERS)
+
+
+def _get_planning_executor():
+    """
+    Returns the thread pool used to plan batch trips. It is separate from the
+    lookup pool because each plan blocks on lookups submitted there.
+    """
+    return _get_executor("trip-planning", settings.TRIP_BATCH_WORKERS)
+
+
+def _run_lookup(func, **kwargs):
+    """
+    Runs a lookup on a pool thread, releasing that thread's DB connection
+    (used by the persistent cache tier) once it is done.
+    """
+    try:
+        return func(**kwargs)
+    finally:
+        close_old_connections()
 
 
-def _get_location_coords(*, location_name, default_lat, default_lon):
+def _get_multi_leg_route(*, coords_list, fallback_dists):
+    """
+    Fetches all legs in one routing request, falling back per leg like
+    ``_get_segment_route`` if routing fails.
+    """
+    legs = get_multi_leg_route_data(coords_list)
+    if not legs:
+        return [(dist, _estimate_driving_hours(dist), None) for dist in fallback_dists]
+    return [(leg["distance_miles"], leg["duration_hours"], leg.get("geometry")) for leg in legs]
+
+
+def _estimate_road_miles(start, end):
+    """
+    Road miles between two (lat, lon) points estimated from the great-circle
+    distance, for when routing fails.
     """
-    Geocodes a location name with fallback coordinates.
+    return haversine_miles(*start, *end) * settings.MAP_PROVIDER_OPTIONS["ROAD_FACTOR"]
+
+
+def _estimate_driving_hours(miles):
+    """
+    Driving hours for ``miles`` at the configured average speed, for when
+    routing fails.
+    """
+    return miles / settings.MAP_PROVIDER_OPTIONS["AVERAGE_SPEED_MPH"]
+
+
+def _with_fallback_provider(operation, lookup):
     """
-    loc = geocode_location(location_name)
+    Runs ``lookup`` against the fallback provider (if any), for degraded
+    answers when the primary provider fails. These are never cached.
+    """
+    fallback = get_fallback_provider()
+    if fallback is None:
+        return None
+    try:
+        with metrics.span(f"map.{operation}.fallback"):
+            return lookup(fallback)
+    except Exception as e:
+        _record_provider_error(fallback, operation, e)
+        return None
+
+
+def _record_provider_error(provider, operation, error, **context):
+    """
+    Counts and logs a failed map provider call.
+    """
+    name = provider.name or type(provider).__name__
+    metrics.PROVIDER_ERRORS.inc(provider=name, operation=operation)
+    logger.warning(
+        "Map provider %s failed: %s", operation, error,
+        extra={"provider": name, "operation": operation, **context}
+    )
+
+
+def _get_location_coords(*, location_name, default_lat, default_lon, geocoded=None):
+    """
+    Geocodes a location name with fallback coordinates, taking the result
+    from ``geocoded`` (normalized name -> geocode) when it is there.
+    """
+    key = normalize_location(location_name)
+    if geocoded is not None and key in geocoded:
+        loc = geocoded[key]
+    else:
+        loc = geocode_location(location_name)
     if loc:
         return loc
     return {"lat": default_lat, "lon": default_lon}
@@ -246,152 +924,6 @@ def _get_segment_route(*, start_coords, end_coords, fallback_dist):
     """
     route = get_route_data(start_coords, end_coords)
     dist = route["distance_miles"] if route else fallback_dist
-    dur = route["duration_hours"] if route else (dist / 55)
+    dur = route["duration_hours"] if route else _estimate_driving_hours(dist)
     geometry = route.get("geometry") if route else None
     return dist, dur, geometry
-
-
-def _add_hos_log_entry(
-    *, 
-    state, 
-    status, 
-    duration_hrs, 
-    location, 
-    notes=None
-):
-    """
-    Adds a log entry and updates HOS state.
-    """
-    start_time = state['current_time']
-    end_time = start_time + timedelta(hours=duration_hrs)
-    
-    state['log_entries'].append({
-        'duty_status': status,
-        'start_time': start_time,
-        'end_time': end_time,
-        'location': location,
-        'notes': notes
-    })
-    
-    if status == DutyStatus.DRIVING:
-        state['cumulative_driving_since_last_10hr_rest'] += duration_hrs
-        state['cumulative_driving_since_last_30min_break'] += duration_hrs
-        state['cumulative_duty_since_last_10hr_rest'] += duration_hrs
-        state['cumulative_cycle_hours'] += duration_hrs
-    elif status == DutyStatus.ON_DUTY_NOT_DRIVING:
-        state['cumulative_duty_since_last_10hr_rest'] += duration_hrs
-        state['cumulative_cycle_hours'] += duration_hrs
-    
-    if (status in [DutyStatus.OFF_DUTY, DutyStatus.SLEEPER_BERTH]) and duration_hrs >= 10:
-        state['cumulative_driving_since_last_10hr_rest'] = 0
-        state['cumulative_duty_since_last_10hr_rest'] = 0
-        state['cumulative_driving_since_last_30min_break'] = 0
-        if duration_hrs >= 34:
-            state['cumulative_cycle_hours'] = 0
-    
-    if (status in [DutyStatus.OFF_DUTY, DutyStatus.SLEEPER_BERTH, DutyStatus.ON_DUTY_NOT_DRIVING]) and duration_hrs >= 0.5:
-        state['cumulative_driving_since_last_30min_break'] = 0
-
-    state['current_time'] = end_time
-
-
-def _insert_hos_breaks(
-    *, 
-    state, 
-    needed_driving_hrs, 
-    location, 
-    stops
-):
-    """
-    Checks for HOS violations and inserts necessary breaks during driving.
-    """
-    remaining_to_drive = needed_driving_hrs
-    avg_speed = 55 # Used for fuel estimation
-    
-    while remaining_to_drive > 0:
-        # Requirement: 70hrs/8days rule
-        if state['cumulative_cycle_hours'] >= 70:
-            stops.append({
-                'stop_type': RouteStop.StopType.REST,
-                'location': location,
-                'arrival_time': state['current_time'],
-                'duration_minutes': 34 * 60,
-                'description': '34-Hour Cycle Restart'
-            })
-            _add_hos_log_entry(
-                state=state, 
-                status=DutyStatus.OFF_DUTY, 
-                duration_hrs=34, 
-                location=location, 
-                notes="34-Hour Restart"
-            )
-            continue
-
-        avail_driving = 11.0 - state['cumulative_driving_since_last_10hr_rest']
-        avail_duty = 14.0 - state['cumulative_duty_since_last_10hr_rest']
-        avail_before_break = 8.0 - state['cumulative_driving_since_last_30min_break']
-        
-        can_drive = min(remaining_to_drive, avail_driving, avail_duty, avail_before_break)
-        
-        # Requirement: Fueling at least once every 1,000 miles
-        miles_to_fuel = 1000 - state['miles_since_last_fuel']
-        hours_to_fuel = miles_to_fuel / avg_speed
-        can_drive = min(can_drive, hours_to_fuel)
-
-        if can_drive > 0:
-            _add_hos_log_entry(
-                state=state, 
-                status=DutyStatus.DRIVING, 
-                duration_hrs=can_drive, 
-                location=location
-            )
-            remaining_to_drive -= can_drive
-            state['miles_since_last_fuel'] += (can_drive * avg_speed)
-        
-        if remaining_to_drive > 0:
-            if state['miles_since_last_fuel'] >= 1000:
-                stops.append({
-                    'stop_type': RouteStop.StopType.FUEL,
-                    'location': location,
-                    'arrival_time': state['current_time'],
-                    'duration_minutes': 15,
-                    'description': 'Fueling Stop'
-                })
-                _add_hos_log_entry(
-                    state=state, 
-                    status=DutyStatus.ON_DUTY_NOT_DRIVING, 
-                    duration_hrs=0.25, 
-                    location=location, 
-                    notes="Fueling"
-                )
-                state['miles_since_last_fuel'] = 0
-            elif state['cumulative_driving_since_last_30min_break'] >= 8:
-                stops.append({
-                    'stop_type': RouteStop.StopType.BREAK,
-                    'location': location,
-                    'arrival_time': state['current_time'],
-                    'duration_minutes': 30,
-                    'description': '30-Minute Rest Break'
-                })
-                _add_hos_log_entry(
-                    state=state, 
-                    status=DutyStatus.OFF_DUTY, 
-                    duration_hrs=0.5, 
-                    location=location, 
-                    notes="30-Min Break"
-                )
-            elif state['cumulative_driving_since_last_10hr_rest'] >= 11 or state['cumulative_duty_since_last_10hr_rest'] >= 14:
-                stops.append({
-                    'stop_type': RouteStop.StopType.REST,
-                    'location': location,
-                    'arrival_time': state['current_time'],
-                    'duration_minutes': 10 * 60,
-                    'description': '10-Hour Daily Rest'
-                })
-                _add_hos_log_entry(
-                    state=state, 
-                    status=DutyStatus.OFF_DUTY, 
-                    duration_hrs=10, 
-                    location=location, 
-                    notes="10-Hour Rest"
-                )
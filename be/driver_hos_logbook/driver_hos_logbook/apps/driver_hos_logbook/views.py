@@ -1,29 +1,105 @@
-from rest_framework import viewsets, status
+import hashlib
+import hmac
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import parse_etags, quote_etag
+from django.views.decorators.http import require_GET
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Trip
+from rest_framework.reverse import reverse
+from . import jobs, metrics
+from .geometry import iter_route_geometry_json
+from .pagination import TripCursorPagination
+from .models import DailyLog, LogEntry, RouteStop, Trip, TripCalculationJob
 from .serializers import (
     TripInputSerializer, 
     TripListSerializer, 
-    TripDetailSerializer
+    TripListFilterSerializer,
+    TripDetailSerializer,
+    TripBatchInputSerializer,
+    MultiStopTripInputSerializer,
+    TripScenarioInputSerializer,
+    TripScenarioComparisonSerializer,
+    RouteGeometryParamsSerializer,
+    TripCalculationJobSerializer
 )
 
 
+def trip_detail_prefetches(prefix=''):
+    """
+    Ordered prefetches for everything TripDetailSerializer renders.
+    """
+    return [
+        Prefetch(f'{prefix}log_entries', queryset=LogEntry.objects.order_by('start_time')),
+        Prefetch(f'{prefix}stops', queryset=RouteStop.objects.order_by('arrival_time')),
+        Prefetch(f'{prefix}daily_logs', queryset=DailyLog.objects.order_by('log_date')),
+    ]
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for this process's metrics (latency
+    histograms, provider errors, map cache hit ratios). Scrapers
+    authenticate with ``Authorization: Bearer <METRICS_TOKEN>``.
+
+    Only the process that accepts the scrape is reported; with several
+    gunicorn workers on one socket, that is an arbitrary worker.
+    """
+    if not settings.METRICS_ENABLED or not settings.METRICS_TOKEN:
+        raise Http404
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        response = HttpResponse('Unauthorized', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 class TripViewSet(viewsets.ModelViewSet):
     """
     ViewSet for handling Trip-related operations, including HOS calculations and history.
     """
-    queryset = Trip.objects.all().order_by('-created_at')
+    queryset = Trip.objects.all().order_by('-created_at', '-id')
+    pagination_class = TripCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            filters = TripListFilterSerializer(data=self.request.query_params)
+            filters.is_valid(raise_exception=True)
+            # Never load the (large) route geometry for history rows
+            return filters.filter_queryset(queryset).only(*TripListSerializer.Meta.fields)
+        if self.action == 'retrieve':
+            return queryset.prefetch_related(*trip_detail_prefetches())
+        if self.action == 'geometry':
+            # Enough to answer conditional requests; the geometry is loaded on demand
+            return queryset.only('id', 'updated_at')
+        return queryset
     
     def get_serializer_class(self):
         if self.action == 'list':
             return TripListSerializer
         if self.action == 'retrieve':
             return TripDetailSerializer
-        if self.action == 'calculate':
+        if self.action in ('calculate', 'calculate_async'):
             return TripInputSerializer
+        if self.action == 'calculate_batch':
+            return TripBatchInputSerializer
+        if self.action == 'calculate_multi_stop':
+            return MultiStopTripInputSerializer
+        if self.action == 'scenarios':
+            return TripScenarioInputSerializer
         return TripListSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        trip = self.get_object()
+        with metrics.span('api.serialize'):
+            data = self.get_serializer(trip).data
+        return Response(data)
+
     @action(
         detail=False,
         url_path='calculate',
@@ -39,5 +115,139 @@ class TripViewSet(viewsets.ModelViewSet):
      
         trip = serializer.save()
             
-        response_serializer = TripDetailSerializer(trip)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        with metrics.span('api.serialize'):
+            data = TripDetailSerializer(trip, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=True,
+        url_path='geometry',
+        url_name='geometry',
+        methods=['get'],
+    )
+    def geometry(self, request, pk=None):
+        """
+        Streams the trip's route geometry as GeoJSON (``?encoding=geojson``) or
+        encoded polylines (``?encoding=polyline``), optionally simplified.
+        A trip's route never changes after calculation, so responses carry a
+        strong ETag and may be cached indefinitely by browsers and CDNs.
+        """
+        trip = self.get_object()
+        params = RouteGeometryParamsSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        encoding = params.validated_data['encoding']
+        tolerance = params.get_tolerance()
+
+        etag = quote_etag(hashlib.sha256(
+            f'{trip.pk}:{trip.updated_at.isoformat()}:{encoding}:{tolerance!r}'.encode()
+        ).hexdigest())
+        headers = {
+            'ETag': etag,
+            'Cache-Control': 'public, max-age=31536000, immutable',
+        }
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        trip.refresh_from_db(fields=['route_geometry_compact', 'route_geometry'])
+        chunks = iter_route_geometry_json(
+            compact=trip.route_geometry_compact,
+            feature_collection=trip.route_geometry,
+            encoding=encoding,
+            tolerance=tolerance
+        )
+        response = StreamingHttpResponse(chunks, content_type='application/json')
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    @action(
+        detail=False,
+        url_path='calculate-multi-stop',
+        url_name='calculate-multi-stop',
+        methods=['post'],
+    )
+    def calculate_multi_stop(self, request):
+        """
+        Plans a trip through several pickups and dropoffs, persists it, and
+        returns the saved trip with its stops in the visiting order.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        trip = serializer.save()
+
+        with metrics.span('api.serialize'):
+            data = TripDetailSerializer(trip, context=self.get_serializer_context()).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        url_path='scenarios',
+        url_name='scenarios',
+        methods=['post'],
+    )
+    def scenarios(self, request):
+        """
+        Compares one lane across start times and cycle values: ETAs, stop
+        counts and on-duty hours per variant. The route is looked up once
+        and nothing is saved.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        comparison = serializer.compare()
+        return Response(TripScenarioComparisonSerializer(comparison).data)
+
+    @action(
+        detail=False,
+        url_path='calculate-async',
+        url_name='calculate-async',
+        methods=['post'],
+    )
+    def calculate_async(self, request):
+        """
+        Validates the trip input and queues the calculation for a worker.
+        Poll the returned status URL for the finished trip.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        job = jobs.enqueue_trip_calculation(serializer.validated_data)
+
+        status_url = reverse('trip-job-detail', kwargs={'pk': job.pk}, request=request)
+        return Response(
+            {'id': job.id, 'status': job.status, 'status_url': status_url},
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': status_url}
+        )
+
+    @action(
+        detail=False,
+        url_path='calculate-batch',
+        url_name='calculate-batch',
+        methods=['post'],
+    )
+    def calculate_batch(self, request):
+        """
+        Calculates and persists many trips at once, reporting errors per item.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        summary = serializer.save()
+
+        if not summary['failed']:
+            response_status = status.HTTP_201_CREATED
+        elif summary['created']:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response(summary, status=response_status)
+
+
+class TripCalculationJobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Status of queued trip calculations. Succeeded jobs embed the saved trip.
+    """
+    queryset = TripCalculationJob.objects.select_related('trip').prefetch_related(
+        *trip_detail_prefetches(prefix='trip__')
+    )
+    serializer_class = TripCalculationJobSerializer
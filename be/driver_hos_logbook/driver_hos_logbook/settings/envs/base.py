@@ -29,6 +29,8 @@ class Base(configurations.Configuration):
 
     MIDDLEWARE = [
         'corsheaders.middleware.CorsMiddleware',
+        'driver_hos_logbook.apps.driver_hos_logbook.middleware.MetricsMiddleware',
+        'driver_hos_logbook.apps.driver_hos_logbook.middleware.QueryCountMiddleware',
         'django.middleware.security.SecurityMiddleware',
         'django.contrib.sessions.middleware.SessionMiddleware',
         'django.middleware.common.CommonMiddleware',
@@ -63,6 +65,135 @@ class Base(configurations.Configuration):
 
     DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+        # Persistent tier for map provider lookups (geocodes, routes)
+        'maps': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'map_cache',
+        },
+    }
+
+    # Geocode cache: in-process LRU in front of the persistent 'maps' cache.
+    # TTLs are in seconds; NEGATIVE_TTL applies to locations that had no match.
+    GEOCODE_CACHE = {
+        'MAXSIZE': int(os.environ.get('GEOCODE_CACHE_MAXSIZE', 2048)),
+        'TTL': int(os.environ.get('GEOCODE_CACHE_TTL', 30 * 24 * 3600)),
+        'NEGATIVE_TTL': int(os.environ.get('GEOCODE_CACHE_NEGATIVE_TTL', 3600)),
+        'BACKEND': os.environ.get('GEOCODE_CACHE_BACKEND', 'maps') or None,
+    }
+
+    # Map provider used for geocoding and routing: "remote" (Nominatim + OSRM),
+    # "local" (bundled gazetteer + great-circle routing) or a dotted path to a
+    # MapProvider factory. MAP_PROVIDER_FALLBACK answers when the primary fails.
+    MAP_PROVIDER = os.environ.get('MAP_PROVIDER', 'remote')
+    MAP_PROVIDER_FALLBACK = os.environ.get('MAP_PROVIDER_FALLBACK', 'local')
+    MAP_PROVIDER_OPTIONS = {
+        'NOMINATIM_URL': os.environ.get('NOMINATIM_URL', 'https://nominatim.openstreetmap.org/search'),
+        'OSRM_URL': os.environ.get('OSRM_URL', 'https://router.project-osrm.org'),
+        'USER_AGENT': 'DriverHOSLogbook/1.0 (abdulrahman.m.altayeb@gmail.com)',
+        'GAZETTEER_PATH': os.environ.get(
+            'MAP_GAZETTEER_PATH',
+            str(BASE_DIR / 'driver_hos_logbook' / 'apps' / 'driver_hos_logbook' / 'data' / 'gazetteer.json')
+        ),
+        'ROAD_FACTOR': float(os.environ.get('MAP_ROAD_FACTOR', 1.2)),
+        'AVERAGE_SPEED_MPH': float(os.environ.get('MAP_AVERAGE_SPEED_MPH', 55)),
+        'VERTEX_SPACING_MILES': float(os.environ.get('MAP_VERTEX_SPACING_MILES', 10)),
+    }
+
+    # Threads used to run geocoding and routing lookups concurrently
+    MAP_LOOKUP_WORKERS = int(os.environ.get('MAP_LOOKUP_WORKERS', 8))
+
+    # Shared HTTP client for map providers. Timeouts are in seconds; retries
+    # back off exponentially (BACKOFF_FACTOR) with up to BACKOFF_JITTER of random delay.
+    # POOL_MAXSIZE caps keep-alive connections per host.
+    MAP_HTTP = {
+        'CONNECT_TIMEOUT': float(os.environ.get('MAP_HTTP_CONNECT_TIMEOUT', 3.05)),
+        'READ_TIMEOUT': float(os.environ.get('MAP_HTTP_READ_TIMEOUT', 10)),
+        'RETRIES': int(os.environ.get('MAP_HTTP_RETRIES', 2)),
+        'BACKOFF_FACTOR': float(os.environ.get('MAP_HTTP_BACKOFF_FACTOR', 0.3)),
+        'BACKOFF_JITTER': float(os.environ.get('MAP_HTTP_BACKOFF_JITTER', 0.3)),
+        'POOL_CONNECTIONS': int(os.environ.get('MAP_HTTP_POOL_CONNECTIONS', 4)),
+        'POOL_MAXSIZE': int(os.environ.get('MAP_HTTP_POOL_MAXSIZE', 8)),
+    }
+
+    # "multi_leg" fetches all legs of a trip in one OSRM request;
+    # "per_segment" issues one request per leg as soon as its endpoints resolve.
+    ROUTING_MODE = os.environ.get('ROUTING_MODE', 'multi_leg')
+
+    # Request latency and planning step histograms, provider error counts and
+    # map cache hit ratios, served at /metrics for Prometheus, plus one
+    # structured log line per request. Metrics are kept per process: behind
+    # gunicorn's shared socket a scrape reads whichever worker accepts it, so
+    # scrape a single-process deployment (threads are fine) or rely on the logs.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # Bearer token scrapers must send to /metrics; without one it isn't served
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'json': {
+                '()': 'driver_hos_logbook.apps.driver_hos_logbook.metrics.JsonFormatter',
+            },
+        },
+        'handlers': {
+            'console': {
+                'class': 'logging.StreamHandler',
+                'formatter': 'json',
+            },
+        },
+        'loggers': {
+            'driver_hos_logbook': {
+                'handlers': ['console'],
+                'level': os.environ.get('LOG_LEVEL', 'INFO'),
+                'propagate': False,
+            },
+            'driver_hos_logbook.requests': {
+                'level': os.environ.get('REQUEST_LOG_LEVEL', 'INFO'),
+            },
+        },
+    }
+
+    # Report each request's database query count in an X-DB-Query-Count header
+    QUERY_COUNT_HEADER = os.environ.get('QUERY_COUNT_HEADER', '').lower() in ('1', 'true', 'yes')
+
+    # Batch planning: maximum trips per request and threads used to plan them
+    TRIP_BATCH_MAX_SIZE = int(os.environ.get('TRIP_BATCH_MAX_SIZE', 1000))
+    TRIP_BATCH_WORKERS = int(os.environ.get('TRIP_BATCH_WORKERS', 8))
+
+    # What-if planning: maximum start time x cycle value variants per request,
+    # and worker processes that simulate them (1, the default, runs them in-process)
+    TRIP_SCENARIO_MAX_VARIANTS = int(os.environ.get('TRIP_SCENARIO_MAX_VARIANTS', 200))
+    TRIP_SCENARIO_WORKERS = int(os.environ.get('TRIP_SCENARIO_WORKERS', 1))
+
+    # Bundled towns that en-route fuel, break and rest stops are labelled by
+    # ("Near <town>") when one is within LABEL_RADIUS_MILES of the stop
+    EN_ROUTE_PLACES = {
+        'PATH': os.environ.get(
+            'EN_ROUTE_PLACES_PATH',
+            str(BASE_DIR / 'driver_hos_logbook' / 'apps' / 'driver_hos_logbook' / 'data' / 'places.json')
+        ),
+        'CELL_DEGREES': float(os.environ.get('EN_ROUTE_PLACES_CELL_DEGREES', 0.5)),
+        'LABEL_RADIUS_MILES': float(os.environ.get('EN_ROUTE_PLACES_LABEL_RADIUS_MILES', 25)),
+    }
+
+    # Multi-stop planning: maximum pickups + dropoffs per trip
+    MULTI_STOP_MAX_STOPS = int(os.environ.get('MULTI_STOP_MAX_STOPS', 25))
+
+    # Route segment cache, keyed by endpoint coordinates rounded to PRECISION
+    # decimal places (4 ~= 11 m). Set ROUTE_CACHE_BACKEND to '' to keep it in-process only.
+    ROUTE_CACHE = {
+        'PRECISION': int(os.environ.get('ROUTE_CACHE_PRECISION', 4)),
+        'MAXSIZE': int(os.environ.get('ROUTE_CACHE_MAXSIZE', 512)),
+        'TTL': int(os.environ.get('ROUTE_CACHE_TTL', 7 * 24 * 3600)),
+        'NEGATIVE_TTL': int(os.environ.get('ROUTE_CACHE_NEGATIVE_TTL', 600)),
+        'BACKEND': os.environ.get('ROUTE_CACHE_BACKEND', 'maps') or None,
+    }
+
     REST_FRAMEWORK = {
         'DEFAULT_PERMISSION_CLASSES': [
             'rest_framework.permissions.AllowAny',
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
+from driver_hos_logbook.apps.driver_hos_logbook.views import metrics_view
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularSwaggerView,
@@ -20,6 +21,9 @@ urlpatterns = [
 ]
 
 urlpatterns += [
+    # Prometheus scrape endpoint
+    path("metrics", metrics_view, name="metrics"),
+
     path(
         "secured-admin/",
         admin.site.urls
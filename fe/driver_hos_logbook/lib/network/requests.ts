@@ -3,29 +3,42 @@
 import { revalidatePath } from "next/cache";
 import { API_ROUTES } from "./routes";
 import { apiFetch } from "./client";
+import type { TripDetail } from "@/types/common";
 
 type TripInputPayload = {
   current_location: string;
   pickup_location: string;
   dropoff_location: string;
   current_cycle_used: number;
+  departure_time?: string;
+  home_terminal_timezone?: string;
 };
 
 export async function requestListTrips() {
-  return apiFetch<
-    Array<{
+  // The trip history is cursor-paginated; the dashboard shows the newest page
+  const page = await apiFetch<{
+    next: string | null;
+    previous: string | null;
+    results: Array<{
       id: string;
       current_location: string;
       pickup_location: string;
       dropoff_location: string;
       current_cycle_used: string;
       created_at: string;
-    }>
-  >(API_ROUTES.TRIPS);
+    }>;
+  }>(API_ROUTES.TRIPS);
+  return page.results;
 }
 
 export async function requestGetTrip(id: string) {
-  return apiFetch(API_ROUTES.TRIP_DETAIL(id));
+  const trip = await apiFetch<TripDetail>(API_ROUTES.TRIP_DETAIL(id));
+  // The route never changes once calculated, so its geometry is served
+  // separately with long-lived caching headers
+  const route_geometry = await apiFetch(API_ROUTES.TRIP_GEOMETRY(id), {
+    cache: "force-cache",
+  }).catch(() => null);
+  return { ...trip, route_geometry };
 }
 
 export async function requestCalculateTrip(
@@ -2,4 +2,5 @@ export const API_ROUTES = {
   CALCULATE_TRIP: "logbook/trips/calculate/",
   TRIPS: "logbook/trips/",
   TRIP_DETAIL: (id: string) => `logbook/trips/${id}/`,
+  TRIP_GEOMETRY: (id: string) => `logbook/trips/${id}/geometry/`,
 } as const;
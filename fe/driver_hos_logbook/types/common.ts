@@ -1,6 +1,9 @@
 export type TripDetail = {
     id: string;
     route_geometry?: unknown;
+    route_geometry_url?: string;
+    departure_time?: string | null;
+    home_terminal_timezone?: string;
     log_entries?: Array<{
         duty_status: string;
         start_time: string;